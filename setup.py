@@ -38,6 +38,12 @@ setup(
     packages=['woodpecker'],
     package_data={'': ['*.sql']},
     install_requires=requirements(),
+    extras_require={
+        # CSS and XPath extractors
+        'html': ['lxml', 'cssselect'],
+        # HTTP/2 transport
+        'http2': ['h2']
+    },
     include_package_data=True,
     zip_safe=False
 )
@@ -0,0 +1,166 @@
+import json
+import multiprocessing
+import socket
+import threading
+
+import pytest
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.parse import quote
+
+
+ROUTES = {
+    '/html': b'<html><body><h1>Herman Melville - Moby Dick</h1>'
+             b'<p>Ahab\'s leg</p></body></html>',
+    '/json': b'{"author": {"name": "Herman", "surname": "Melville"}, '
+             b'"books": [{"title": "Moby Dick"}, {"title": "Typee"}]}'
+}
+
+
+def _route(path):
+    body = ROUTES.get(path.split('?')[0], None)
+    if body is None:
+        return 404, b'Not found'
+    return 200, body
+
+
+class LocalRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self):
+        status, body = _route(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > 0:
+            self.rfile.read(length)
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Woodpecker-Context', 'UnitTest')
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalHttpServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class LocalUnixHttpServer(socketserver.ThreadingMixIn,
+                          socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        # Unix sockets have no client address, which the handler expects
+        request, _ = socketserver.UnixStreamServer.get_request(self)
+        return request, ('local', 0)
+
+
+def _serve(address_queue, unix_socket_path=None):
+    if unix_socket_path is None:
+        server = LocalHttpServer(('127.0.0.1', 0), LocalRequestHandler)
+    else:
+        server = LocalUnixHttpServer(unix_socket_path, LocalRequestHandler)
+    address_queue.put(server.server_address)
+    server.serve_forever()
+
+
+def _handle_h2c_connection(sock):
+    import h2.config
+    import h2.connection
+    import h2.events
+
+    connection = h2.connection.H2Connection(
+        config=h2.config.H2Configuration(client_side=False,
+                                         header_encoding='utf-8')
+    )
+    connection.initiate_connection()
+    sock.sendall(connection.data_to_send())
+    paths = {}
+    # Stream weights received on this connection, by path
+    weights = {}
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            break
+        for event in connection.receive_data(data):
+            if isinstance(event, h2.events.RequestReceived):
+                paths[event.stream_id] = dict(event.headers)[':path']
+                if event.priority_updated is not None:
+                    weights[paths[event.stream_id]] = \
+                        event.priority_updated.weight
+            elif isinstance(event, h2.events.DataReceived):
+                connection.acknowledge_received_data(
+                    event.flow_controlled_length, event.stream_id
+                )
+            elif isinstance(event, h2.events.StreamEnded):
+                path = paths.pop(event.stream_id)
+                if path == '/weights':
+                    status, body = 200, json.dumps(weights).encode('utf-8')
+                else:
+                    status, body = _route(path)
+                connection.send_headers(event.stream_id, [
+                    (':status', str(status)),
+                    ('content-type', 'text/html; charset=utf-8'),
+                    ('content-length', str(len(body))),
+                    ('x-woodpecker-context', 'UnitTest')
+                ])
+                connection.send_data(event.stream_id, body, end_stream=True)
+        sock.sendall(connection.data_to_send())
+    sock.close()
+
+
+def _serve_h2c(address_queue):
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(16)
+    address_queue.put(server.getsockname())
+    while True:
+        sock, _ = server.accept()
+        thread = threading.Thread(target=_handle_h2c_connection,
+                                  args=(sock,))
+        thread.daemon = True
+        thread.start()
+
+
+def _start_server(unix_socket_path=None, target=_serve):
+    # The server runs in a fresh interpreter, so that it is not affected
+    # by the gevent monkey patching done by the tested code
+    context = multiprocessing.get_context('spawn')
+    address_queue = context.Queue()
+    args = (address_queue,) if target is _serve_h2c \
+        else (address_queue, unix_socket_path)
+    process = context.Process(target=target, args=args)
+    process.daemon = True
+    process.start()
+    return process, address_queue.get(timeout=10)
+
+
+@pytest.fixture(scope='session')
+def local_http_server():
+    process, (host, port) = _start_server()
+    yield 'http://{host}:{port}'.format(host=host, port=port)
+    process.terminate()
+    process.join()
+
+
+@pytest.fixture(scope='session')
+def local_unix_http_server(tmp_path_factory):
+    str_path = str(tmp_path_factory.mktemp('sockets') / 'http.sock')
+    process, _ = _start_server(str_path)
+    yield 'http+unix://{path}'.format(path=quote(str_path, safe=''))
+    process.terminate()
+    process.join()
+
+
+@pytest.fixture(scope='session')
+def local_h2c_server():
+    # HTTP/2 with prior knowledge, served with the optional h2 library
+    pytest.importorskip('h2')
+    process, (host, port) = _start_server(target=_serve_h2c)
+    yield 'http://{host}:{port}'.format(host=host, port=port)
+    process.terminate()
+    process.join()
@@ -0,0 +1,140 @@
+import gevent
+import msgpack
+import six
+
+from woodpecker.io.aggregator import StreamingAggregator
+from woodpecker.io.logcollector import LogCollector
+from woodpecker.io.logrecords import END_STOPWATCH_EVENT, \
+    HTTP_ERROR_EVENT, HTTP_REQUEST_STEP, schemas
+from woodpecker.settings.coresettings import CoreSettings
+
+SECOND = 1767261600 * 10 ** 9
+
+
+def _step(second, url, elapsed, status='200 OK'):
+    return (HTTP_REQUEST_STEP.tag, SECOND + second * 10 ** 9, 'pecker-0',
+            'Sequence', 0, [], url, 'GET', None, {}, url, status, 84,
+            elapsed, False)
+
+
+def test_url_statistics():
+    aggregator = StreamingAggregator()
+    aggregator.write_batch(
+        [_step(0, 'http://localhost/html?id={id}'.format(id=index), 10.0)
+         for index in range(98)] +
+        [_step(1, 'http://localhost/html', 100.0, '500 Server Error'),
+         msgpack.packb(_step(1, 'http://localhost/html', 200.0))]
+    )
+    # A request failed without response, in the next iteration
+    aggregator.write_batch([(
+        HTTP_ERROR_EVENT.tag, SECOND + 2 * 10 ** 9, 'pecker-0', 'Sequence',
+        1, 'Sequence', 1, 'pecker-0', 'http://localhost/html', 'Timeout'
+    )])
+
+    summary = aggregator.summary()['urls']['http://localhost/html']
+    assert summary['count'] == 101
+    assert summary['errors'] == 2
+    assert summary['max'] == 200000
+    percentiles = aggregator.percentiles('http://localhost/html')
+    assert abs(percentiles[50] - 10000) <= 100
+    assert abs(percentiles[99.9] - 200000) <= 2000
+
+    # One rollup per closed second
+    rollups = list(aggregator.urls['http://localhost/html'].rollups)
+    assert [rollup['count'] for rollup in rollups] == [98, 2]
+    assert rollups[1]['errors'] == 1
+
+
+def test_failed_steps_counted_once():
+    aggregator = StreamingAggregator()
+    aggregator.write_batch([
+        _step(0, 'http://localhost/html', 10.0, '404 Not Found'),
+        # Logged with the failed step, on the status
+        (HTTP_ERROR_EVENT.tag, SECOND, 'pecker-0', 'Sequence', 0,
+         'Sequence', 0, 'pecker-0', 'http://localhost/html', '404'),
+        # Logged without step, on a connection error
+        (HTTP_ERROR_EVENT.tag, SECOND, 'pecker-0', 'Sequence', 0,
+         'Sequence', 0, 'pecker-0', 'http://localhost/html', 'Refused'),
+        _step(0, 'http://localhost/json', 10.0, 'Garbled'),
+        _step(0, 'http://localhost/json', 10.0, None)
+    ])
+    summary = aggregator.summary()['urls']
+    assert summary['http://localhost/html']['count'] == 2
+    assert summary['http://localhost/html']['errors'] == 2
+    assert summary['http://localhost/json']['count'] == 2
+    assert summary['http://localhost/json']['errors'] == 2
+
+
+def test_stopwatches_from_dict_records():
+    aggregator = StreamingAggregator()
+    record = schemas.expand((END_STOPWATCH_EVENT.tag, SECOND, 'pecker-0',
+                             'Sequence', 0, 'login', SECOND, 1500000000))
+    aggregator.write_batch([record, msgpack.packb(record)])
+    summary = aggregator.summary()['stopwatches']['login']
+    assert summary['count'] == 2
+    assert summary['error_rate'] == 0.0
+    assert abs(summary['percentiles'][50] - 1500000) <= 15000
+
+
+def test_bounded_urls():
+    aggregator = StreamingAggregator(max_urls=2)
+    aggregator.write_batch([
+        _step(0, 'http://localhost/{index}'.format(index=index), 1.0)
+        for index in range(5)
+    ])
+    assert sorted(aggregator.urls) == ['http://localhost/0',
+                                       'http://localhost/1',
+                                       StreamingAggregator.other_urls_key]
+    assert aggregator.urls[StreamingAggregator.other_urls_key].count == 3
+
+
+def test_live_percentiles_from_collector():
+    settings = CoreSettings()
+    settings['logging']['max_interval_before_flush'] = 0.0
+    log_queue = six.moves.queue.Queue()
+    aggregator = StreamingAggregator()
+    collector = LogCollector(log_queue, [], settings,
+                             polling_interval=0.01, aggregator=aggregator)
+    collector.start()
+    for _ in range(10):
+        log_queue.put(_step(0, 'http://localhost/json', 5.0))
+    gevent.sleep(0.1)
+    # Available while the collector is running
+    assert aggregator.urls['http://localhost/json'].count == 10
+    collector.stop()
+
+
+def test_user_steps_not_aggregated():
+    aggregator = StreamingAggregator()
+    aggregator.write_batch([{
+        'message_type': 'step',
+        'timestamp': SECOND,
+        'pecker_id': 'pecker-0',
+        'sequence': 'Sequence',
+        'iteration': 0,
+        'message_content': {
+            'step_type': 'custom_step',
+            'step_content': {'elapsed': 10.0}
+        }
+    }, schemas.expand(_step(0, 'http://localhost/html', 10.0))])
+    assert list(aggregator.urls.keys()) == ['http://localhost/html']
+    assert aggregator.records == 2
+
+
+def test_failing_aggregator_keeps_collecting():
+    class FailingAggregator(StreamingAggregator):
+        def write_batch(self, records):
+            raise ValueError('Failed on purpose')
+
+    settings = CoreSettings()
+    settings['logging']['max_interval_before_flush'] = 0.0
+    log_queue = six.moves.queue.Queue()
+    collector = LogCollector(log_queue, [], settings, polling_interval=0.01,
+                             aggregator=FailingAggregator())
+    collector.start()
+    for _ in range(2):
+        log_queue.put(_step(0, 'http://localhost/json', 5.0))
+        gevent.sleep(0.05)
+    assert collector.is_running()
+    collector.stop()
+    assert collector.records == 2
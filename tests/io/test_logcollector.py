@@ -0,0 +1,93 @@
+import gevent
+import gevent.queue
+import msgpack
+import six
+
+from woodpecker.io.logcollector import LogCollector, drain_queue
+from woodpecker.io.sinks.basesink import BaseSink
+from woodpecker.settings.coresettings import CoreSettings
+
+
+class ListSink(BaseSink):
+    def __init__(self, settings, delay=0.0):
+        super(ListSink, self).__init__(settings)
+        self.delay = delay
+        self.batches = []
+        self.closed = False
+
+    def write_batch(self, records):
+        gevent.sleep(self.delay)
+        self.batches.append([self.decode(record) for record in records])
+
+    def close(self):
+        self.closed = True
+
+
+def _settings(max_entries, max_interval, max_pending=0):
+    settings = CoreSettings()
+    settings['logging']['max_entries_before_flush'] = max_entries
+    settings['logging']['max_interval_before_flush'] = max_interval
+    settings['logging']['max_pending_entries'] = max_pending
+    return settings
+
+
+def test_drain_queue():
+    log_queue = six.moves.queue.Queue()
+    for index in range(5):
+        log_queue.put(index)
+    assert drain_queue(log_queue, 2) == [0, 1]
+    assert drain_queue(log_queue) == [2, 3, 4]
+    assert drain_queue(log_queue) == []
+
+
+def test_batches_bounded_by_entries():
+    settings = _settings(4, 60.0)
+    log_queue = six.moves.queue.Queue()
+    sink = ListSink(settings)
+    for index in range(10):
+        log_queue.put(msgpack.packb({'index': index}))
+    collector = LogCollector(log_queue, [sink], settings)
+    collector.start()
+    # Records are marked as done once written
+    gevent.sleep(0.5)
+    assert [len(batch) for batch in sink.batches] == [4, 4]
+    collector.stop()
+    log_queue.join()
+    assert [len(batch) for batch in sink.batches] == [4, 4, 2]
+    assert sink.batches[0][0] == {'index': 0}
+    assert sink.closed
+    assert collector.records == 10
+
+
+def test_batches_bounded_by_interval():
+    settings = _settings(1000, 0.2)
+    log_queue = six.moves.queue.Queue()
+    sink = ListSink(settings)
+    collector = LogCollector(log_queue, [sink], settings,
+                             polling_interval=0.05)
+    collector.start()
+    log_queue.put({'index': 0})
+    gevent.sleep(0.5)
+    assert sink.batches == [[{'index': 0}]]
+    collector.stop()
+
+
+def test_backpressure():
+    settings = _settings(2, 0.0)
+    log_queue = gevent.queue.JoinableQueue(maxsize=2)
+    sink = ListSink(settings, delay=0.1)
+    collector = LogCollector(log_queue, [sink], settings,
+                             polling_interval=0.01)
+    collector.start()
+
+    def _produce():
+        for index in range(10):
+            log_queue.put({'index': index})
+
+    producer = gevent.spawn(_produce)
+    # The producer has to wait for the slow sink
+    assert not producer.join(timeout=0.2)
+    producer.join()
+    collector.stop()
+    log_queue.join()
+    assert sum(len(batch) for batch in sink.batches) == 10
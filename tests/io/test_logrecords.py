@@ -0,0 +1,96 @@
+import msgpack
+import pytest
+
+from woodpecker.io.logrecords import HTTP_REQUEST_STEP, SchemaRegistry, \
+    decode_record, schemas
+
+STEP = {
+    'message_type': 'step',
+    'timestamp': 1767261600250000000,
+    'pecker_id': 'spawner-0',
+    'sequence': 'Sequence',
+    'iteration': 3,
+    'message_content': {
+        'step_type': 'http_request',
+        'active_stopwatches': ['login'],
+        'step_content': {
+            'url': 'http://localhost/html',
+            'method': 'GET',
+            'body': None,
+            'headers': {'Accept': '*/*'},
+            'response_url': 'http://localhost/html',
+            'response_status': '200 OK',
+            'response_size': 84,
+            'elapsed': 1.5,
+            'async': False
+        }
+    }
+}
+
+
+def _compact(record):
+    return schemas.compact(record['message_type'],
+                           record['timestamp'],
+                           record['pecker_id'],
+                           record['sequence'],
+                           record['iteration'],
+                           record['message_content'])
+
+
+def test_round_trip():
+    record = _compact(STEP)
+    assert record[0] == HTTP_REQUEST_STEP.tag
+    assert 'step_content' not in record
+    assert decode_record(record) == STEP
+    # Through msgpack, tuples become arrays
+    assert decode_record(msgpack.packb(record)) == STEP
+    assert len(msgpack.packb(record)) < len(msgpack.packb(STEP)) / 2
+
+
+@pytest.mark.parametrize('message_content', [
+    {'event_type': 'error', 'event_content': {'message': 'Failed'}},
+    {'event_type': 'custom', 'event_content': {'value': 1}},
+    'plain message'
+])
+def test_generic_round_trip(message_content):
+    record = dict(STEP, message_type='event', message_content=message_content)
+    compact_record = _compact(record)
+    assert compact_record[0] == SchemaRegistry.generic_tag
+    assert decode_record(compact_record) == record
+
+
+
+def test_unicode_values_round_trip():
+    # Unicode values are only interned when they are native strings
+    step_content = dict(STEP['message_content']['step_content'],
+                        method=u'GET',
+                        response_status=u'200 Caf\u00e9')
+    record = dict(STEP,
+                  pecker_id=u'spawner-\u00e9',
+                  sequence=u'S\u00e9quence',
+                  message_content=dict(STEP['message_content'],
+                                       step_content=step_content))
+    packed_record = msgpack.packb(_compact(record))
+    first_record = decode_record(packed_record)
+    assert first_record == record
+    second_record = decode_record(packed_record)
+    if isinstance(u'', str):
+        assert first_record['pecker_id'] is second_record['pecker_id']
+        assert first_record['message_content']['step_content'][
+            'response_status'] is second_record['message_content'][
+            'step_content']['response_status']
+
+def test_dict_records_unchanged():
+    assert decode_record(STEP) is STEP
+    assert decode_record(msgpack.packb(STEP)) == STEP
+
+
+def test_registry():
+    registry = SchemaRegistry()
+    schema = registry.register('event', 'custom', fields=('value',))
+    assert schema.tag == 1
+    assert registry.by_tag(1) is schema
+    assert registry.by_kind('event', 'custom') is schema
+    assert len(registry) == 1
+    with pytest.raises(ValueError):
+        registry.register('event', 'custom', fields=('value',))
@@ -0,0 +1,47 @@
+from woodpecker.io.responseview import ResponseView
+
+
+class CountingResponse(object):
+    url = 'http://localhost/html'
+    encoding = None
+    headers = {'Content-Type': 'text/html'}
+
+    def __init__(self):
+        self.content_reads = 0
+
+    @property
+    def content(self):
+        self.content_reads += 1
+        return u'<p>Ahab’s leg</p>'.encode('utf-8')
+
+
+def test_view_shared_and_lazy():
+    response = CountingResponse()
+    view = ResponseView.of(response)
+    assert ResponseView.of(response) is view
+    assert view.target('url') == 'http://localhost/html'
+    assert response.content_reads == 0
+
+    assert view.text == u'<p>Ahab’s leg</p>'
+    assert view.target('body') is view.text
+    assert view.target('headers') == 'Content-Type: text/html'
+    assert view.target('all') == '\n'.join(('http://localhost/html',
+                                            'Content-Type: text/html',
+                                            view.text))
+    assert response.content_reads == 1
+
+
+def test_raw_target():
+    response = CountingResponse()
+    assert ResponseView.of(response).target('raw') == response.content
+
+
+class JsonResponse(object):
+    encoding = 'utf-8'
+    content = b'{"title": "Moby Dick"}'
+
+
+def test_json_parsed_once():
+    view = ResponseView.of(JsonResponse())
+    assert view.json() == {'title': 'Moby Dick'}
+    assert view.json() is view.json()
@@ -0,0 +1,126 @@
+import sqlite3
+import time
+
+import msgpack
+
+from woodpecker.io.sinks.sqlitesink import SqliteSink
+from woodpecker.settings.coresettings import CoreSettings
+
+
+def _record(message_type, content, pecker_id='pecker-0', iteration=0,
+            timestamp=1767261600250000000):
+    return msgpack.packb({
+        'message_type': message_type,
+        'timestamp': timestamp,
+        'pecker_id': pecker_id,
+        'sequence': 'Sequence',
+        'iteration': iteration,
+        'message_content': content
+    })
+
+
+def _step(url='http://localhost/html', status='200 OK'):
+    return _record('step', {
+        'step_type': 'http_request',
+        'active_stopwatches': ['login'],
+        'step_content': {
+            'url': url,
+            'method': 'GET',
+            'body': None,
+            'headers': {'Accept': '*/*'},
+            'response_url': url,
+            'response_status': status,
+            'response_size': 84,
+            'elapsed': 1.5,
+            'async': False
+        }
+    })
+
+
+def test_results_file(tmpdir):
+    str_results_file = str(tmpdir.join('results.sqlite'))
+    sink = SqliteSink(CoreSettings(), results_file=str_results_file)
+    sink.open()
+    sink.write_batch([
+        _record('event', {'event_type': 'start_stopwatch',
+                          'event_content': {
+                              'stopwatch_name': 'login',
+                              'timestamp': 1767261600000000000}}),
+        _step(),
+        _step(status='404 Not Found')
+    ])
+    sink.write_batch([
+        _record('event', {'event_type': 'end_stopwatch',
+                          'event_content': {
+                              'stopwatch_name': 'login',
+                              'timestamp': 1767261601500000000,
+                              'duration': 1500000000}}),
+        _record('event', {'event_type': 'error',
+                          'event_content': {'url': 'http://localhost/',
+                                            'error': 'Timeout'}}),
+        _record('event', {'event_type': 'connection_pool_statistics',
+                          'event_content': {'hits': 2}})
+    ])
+    sink.close()
+
+    connection = sqlite3.connect(str_results_file)
+    assert connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert connection.execute(
+        'SELECT id, status_code, reason, method FROM steps'
+    ).fetchall() == [(1, 200, 'OK', 'GET'), (2, 404, 'Not Found', 'GET')]
+    assert connection.execute(
+        'SELECT step_id, stopwatch FROM step_stopwatches'
+    ).fetchall() == [(1, 'login'), (2, 'login')]
+    assert connection.execute(
+        'SELECT pecker_id, name, start, duration FROM stopwatches'
+    ).fetchall() == [('pecker-0', 'login', 1767261600000000000, 1500000000)]
+    assert connection.execute(
+        'SELECT url, message FROM errors'
+    ).fetchall() == [('http://localhost/', 'Timeout')]
+    assert connection.execute(
+        'SELECT event_type, content FROM events'
+    ).fetchall() == [('connection_pool_statistics', '{"hits": 2}')]
+    # Indexes are created at the end
+    assert connection.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'index'"
+    ).fetchone()[0] > 0
+
+
+def test_incomplete_stopwatch(tmpdir):
+    str_results_file = str(tmpdir.join('results.sqlite'))
+    sink = SqliteSink(CoreSettings(), results_file=str_results_file)
+    sink.open()
+    sink.write_batch([
+        _record('event', {'event_type': 'end_stopwatch',
+                          'event_content': {'stopwatch_name': 'login',
+                                            'timestamp': None}}),
+        _step()
+    ])
+    sink.close()
+
+    # The rest of the batch is not lost
+    connection = sqlite3.connect(str_results_file)
+    assert connection.execute(
+        'SELECT name, start, duration FROM stopwatches'
+    ).fetchall() == [('login', None, None)]
+    assert connection.execute('SELECT COUNT(*) FROM steps').fetchone()[0] == 1
+
+
+def test_bulk_insert(tmpdir):
+    str_results_file = str(tmpdir.join('results.sqlite'))
+    sink = SqliteSink(CoreSettings(), results_file=str_results_file)
+    sink.open()
+    # Uncompressed records, to time the inserts only. A tenth of the
+    # million rows of a long run, with a bound scaled accordingly,
+    # to keep the test suite fast
+    batch = [msgpack.unpackb(_step(), raw=False) for _ in range(1000)]
+    dbl_start = time.time()
+    for _ in range(100):
+        sink.write_batch(batch)
+    sink.close()
+    assert time.time() - dbl_start < 10.0
+
+    connection = sqlite3.connect(str_results_file)
+    assert connection.execute(
+        'SELECT COUNT(*), MAX(id) FROM steps'
+    ).fetchone() == (100000, 100000)
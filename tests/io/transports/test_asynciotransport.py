@@ -0,0 +1,81 @@
+import asyncio
+import multiprocessing
+import sys
+
+import pytest
+import requests
+
+from woodpecker.settings.httpsequencesettings import HttpSequenceSettings
+
+if sys.version_info < (3, 5):
+    pytest.skip('The asyncio transport needs Python 3.5 or later',
+                allow_module_level=True)
+
+from woodpecker.io.transports.asynciotransport import AsyncioTransport  # noqa
+
+
+@pytest.fixture
+def transport():
+    obj_transport = AsyncioTransport(HttpSequenceSettings())
+    yield obj_transport
+    obj_transport.close()
+
+
+def test_request(transport, local_http_server):
+    hooked = []
+    response = transport.request('GET', local_http_server + '/html',
+                                 hooks={'response': [hooked.append]})
+    assert response.status_code == 200
+    assert response.ok
+    assert b'Moby Dick' in response.content
+    assert response.encoding == 'utf-8'
+    assert response.headers.get('x-woodpecker-context') == 'UnitTest'
+    assert response.request.method == 'GET'
+    assert response.elapsed.total_seconds() > 0
+    assert hooked == [response]
+
+
+def test_keep_alive_and_post(transport, local_http_server):
+    transport.request('GET', local_http_server + '/html')
+    response = transport.request('POST', local_http_server + '/json',
+                                 json={'whale': 'white'})
+    assert response.json()['author']['surname'] == 'Melville'
+    assert response.request.body == b'{"whale": "white"}'
+    assert transport.statistics.misses == 1
+    assert transport.statistics.hits == 1
+
+
+def test_not_found(transport, local_http_server):
+    response = transport.request('GET', local_http_server + '/missing')
+    assert response.status_code == 404
+    with pytest.raises(requests.exceptions.HTTPError):
+        response.raise_for_status()
+
+
+def test_connection_error(transport):
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.request('GET', 'http://127.0.0.1:1/', timeout=2)
+
+
+def test_unix_socket(transport, local_unix_http_server):
+    response = transport.request('GET', local_unix_http_server + '/html')
+    assert response.status_code == 200
+    assert response.url.startswith('http+unix://')
+
+
+def _forked_loop_result(results_queue):
+    future = asyncio.run_coroutine_threadsafe(asyncio.sleep(0, 'forked'),
+                                              AsyncioTransport.event_loop())
+    results_queue.put(future.result(timeout=5))
+
+
+def test_event_loop_after_fork():
+    # Started in the parent before forking
+    AsyncioTransport.event_loop()
+    context = multiprocessing.get_context('fork')
+    results_queue = context.Queue()
+    worker = context.Process(target=_forked_loop_result,
+                             args=(results_queue,))
+    worker.start()
+    assert results_queue.get(timeout=10) == 'forked'
+    worker.join()
@@ -0,0 +1,60 @@
+from woodpecker.io.transports.http11 import ResponseParser, serialize_request
+
+
+def test_serialize_request():
+    bytes_request = serialize_request('POST', 'localhost:8080', '/path?a=1',
+                                      [('User-Agent', 'Woodpecker')],
+                                      b'body')
+    assert bytes_request == b'POST /path?a=1 HTTP/1.1\r\n' \
+                            b'Host: localhost:8080\r\n' \
+                            b'User-Agent: Woodpecker\r\n' \
+                            b'Content-Length: 4\r\n\r\nbody'
+
+
+def test_parser_content_length_split():
+    parser = ResponseParser()
+    parser.expect('GET')
+    assert parser.feed(b'HTTP/1.1 200 OK\r\nContent-Le') == []
+    assert parser.feed(b'ngth: 5\r\n\r\nhel') == []
+    responses = parser.feed(b'lo')
+    assert len(responses) == 1
+    assert responses[0].status_code == 200
+    assert responses[0].reason == 'OK'
+    assert responses[0].body == b'hello'
+    assert responses[0].keep_alive()
+
+
+def test_parser_chunked():
+    parser = ResponseParser()
+    parser.expect('GET')
+    responses = parser.feed(b'HTTP/1.1 200 OK\r\n'
+                            b'Transfer-Encoding: chunked\r\n\r\n'
+                            b'4\r\nMoby\r\n5;ext=1\r\n Dick\r\n0\r\n\r\n')
+    assert responses[0].body == b'Moby Dick'
+
+
+def test_parser_many_chunks():
+    parser = ResponseParser()
+    parser.expect('GET')
+    parser.expect('GET')
+    # All the chunks (and the next response) in a single buffer
+    responses = parser.feed(b'HTTP/1.1 200 OK\r\n'
+                            b'Transfer-Encoding: chunked\r\n\r\n' +
+                            b'1\r\nx\r\n' * 5000 + b'0\r\n\r\n'
+                            b'HTTP/1.1 204 No Content\r\n\r\n')
+    assert responses[0].body == b'x' * 5000
+    assert responses[1].status_code == 204
+
+
+def test_parser_pipelined_head_and_close():
+    parser = ResponseParser()
+    parser.expect('HEAD')
+    parser.expect('GET')
+    responses = parser.feed(b'HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\n'
+                            b'HTTP/1.0 404 Not Found\r\n\r\ngone')
+    assert len(responses) == 1
+    assert responses[0].body == b''
+    responses = parser.feed_eof()
+    assert responses[0].status_code == 404
+    assert responses[0].body == b'gone'
+    assert not responses[0].keep_alive()
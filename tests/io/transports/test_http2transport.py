@@ -0,0 +1,90 @@
+import socket
+
+import pytest
+
+from woodpecker.settings.httpsequencesettings import HttpSequenceSettings
+
+pytest.importorskip('h2')
+
+from woodpecker.io.transports.http2transport import Http2Connection, \
+    Http2Transport  # noqa
+
+
+@pytest.fixture
+def transport():
+    obj_transport = Http2Transport(HttpSequenceSettings())
+    yield obj_transport
+    obj_transport.close()
+
+
+def test_request(transport, local_h2c_server):
+    response = transport.request('GET', local_h2c_server + '/html')
+    assert response.status_code == 200
+    assert response.reason == 'OK'
+    assert b'Moby Dick' in response.content
+    assert response.headers.get('X-Woodpecker-Context') == 'UnitTest'
+    response = transport.request('POST', local_h2c_server + '/json',
+                                 json={'whale': 'white'})
+    assert response.json()['author']['name'] == 'Herman'
+    assert transport.statistics.misses == 1
+    assert transport.statistics.hits == 1
+
+
+def test_multiplexed_with_priorities(transport, local_h2c_server):
+    hooked = []
+    pending_requests = [
+        transport.prepare_async('GET',
+                                local_h2c_server + path,
+                                hooks={'response': [hooked.append]})
+        for path in ('/html', '/json', '/style.css', '/logo.png')
+    ]
+    transport.send_multiplexed(pending_requests)
+    assert [pending_request.response.status_code
+            for pending_request in pending_requests] == [200, 200, 404, 404]
+    assert len(hooked) == 4
+
+    # All the streams went over the same connection
+    weights = transport.request('GET', local_h2c_server + '/weights').json()
+    assert weights == {'/html': 16, '/json': 16,
+                       '/style.css': 220, '/logo.png': 32,
+                       '/weights': transport.document_weight}
+    assert transport.statistics.misses == 1
+
+
+def test_push_disabled_and_untracked_streams():
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.settings
+
+    client_sock, server_sock = socket.socketpair()
+    connection = Http2Connection(client_sock)
+    server = h2.connection.H2Connection(
+        config=h2.config.H2Configuration(client_side=False)
+    )
+    server.initiate_connection()
+    events = server.receive_data(server_sock.recv(65536))
+    remote_settings = [event for event in events
+                       if isinstance(event, h2.events.RemoteSettingsChanged)]
+    assert remote_settings[0].changed_settings[
+        h2.settings.SettingCodes.ENABLE_PUSH
+    ].new_value == 0
+
+    headers = [(':method', 'GET'), (':path', '/'),
+               (':scheme', 'http'), (':authority', 'localhost')]
+    tracked = connection.open_stream(headers)
+    untracked = connection.open_stream(headers)
+    # e.g. popped after a reset, while the server still answers
+    del connection.streams[untracked]
+    server.receive_data(server_sock.recv(65536))
+    for int_stream_id in (untracked, tracked):
+        server.send_headers(int_stream_id, [(':status', '200')])
+        server.send_data(int_stream_id, b'Moby Dick', end_stream=True)
+    server_sock.sendall(server.data_to_send())
+
+    connection.wait([tracked])
+    response, _ = connection.pop_response(tracked)
+    assert response.status_code == 200
+    assert response.body == b'Moby Dick'
+    connection.close()
+    server_sock.close()
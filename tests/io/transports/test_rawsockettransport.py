@@ -0,0 +1,162 @@
+import re
+import socket
+import threading
+
+import pytest
+import requests
+
+from woodpecker.io.transports.rawsockettransport import RawSocketTransport
+from woodpecker.settings.httpsequencesettings import HttpSequenceSettings
+
+
+@pytest.fixture
+def closing_server():
+    # Answers only the first request of each connection, then closes it
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(4)
+    received = []
+
+    def serve():
+        while True:
+            try:
+                sock, _ = server.accept()
+            except (IOError, OSError):
+                return
+            data = sock.recv(65536)
+            received.append(re.findall(br'^([A-Z]+) /', data, re.M))
+            sock.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n'
+                         b'Connection: close\r\n\r\nok')
+            sock.close()
+
+    thread = threading.Thread(target=serve)
+    thread.daemon = True
+    thread.start()
+    yield 'http://{0}:{1}'.format(*server.getsockname()), received
+    server.close()
+
+
+@pytest.fixture
+def transport():
+    obj_transport = RawSocketTransport(HttpSequenceSettings())
+    yield obj_transport
+    obj_transport.close()
+
+
+def test_keep_alive_requests(transport, local_http_server):
+    for _ in range(3):
+        response = transport.request('GET', local_http_server + '/html',
+                                     headers={'User-Agent': 'Woodpecker'})
+        assert response.status_code == 200
+        assert b'Ahab' in response.content
+    assert transport.statistics.misses == 1
+    assert transport.statistics.hits == 2
+    # The same request is serialized only once
+    assert len(transport._serialized_requests) == 1
+
+
+def test_post_form(transport, local_http_server):
+    response = transport.request('POST', local_http_server + '/json',
+                                 data={'whale': 'white'})
+    assert response.request.body == b'whale=white'
+    assert response.json()['books'][0]['title'] == 'Moby Dick'
+
+
+def test_stale_connection_retried(transport, local_http_server):
+    transport.request('GET', local_http_server + '/html')
+    # Simulate a keep-alive connection dropped by the server
+    for idle_sockets in transport._idle_sockets.values():
+        for sock in idle_sockets:
+            sock.close()
+    response = transport.request('GET', local_http_server + '/html')
+    assert response.status_code == 200
+
+
+def test_timeout(transport):
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.request('GET', 'http://127.0.0.1:1/', timeout=1)
+
+
+def test_unix_socket(transport, local_unix_http_server):
+    response = transport.request('GET', local_unix_http_server + '/json')
+    assert response.status_code == 200
+    assert response.json()['author']['name'] == 'Herman'
+    assert response.request.headers is not None
+
+
+def test_pipelining(transport, local_http_server):
+    hooked = []
+    pending_requests = [
+        transport.prepare_async('GET',
+                                local_http_server + path,
+                                hooks={'response': [hooked.append]})
+        for path in ('/html', '/json', '/missing', '/html', '/json')
+    ]
+    transport.send_pipelined(pending_requests, 3)
+    assert [pending_request.response.status_code
+            for pending_request in pending_requests] == \
+        [200, 200, 404, 200, 200]
+    assert pending_requests[1].response.json()['books'][1]['title'] == \
+        'Typee'
+    assert len(hooked) == 5
+    # Two batches on the same keep-alive connection
+    assert transport.statistics.misses == 1
+    assert transport.statistics.hits == 1
+
+
+def test_pipelining_resends_idempotent_only(transport, closing_server):
+    str_url, received = closing_server
+    pending_requests = [
+        transport.prepare_async(str_method, str_url + '/')
+        for str_method in ('GET', 'POST', 'GET')
+    ]
+    transport.send_pipelined(pending_requests, 3)
+    assert pending_requests[0].response.status_code == 200
+    assert isinstance(pending_requests[1].exception,
+                      requests.exceptions.ConnectionError)
+    assert pending_requests[2].response.status_code == 200
+    # The unanswered POST was not sent again
+    assert received == [[b'GET', b'POST', b'GET'], [b'GET']]
+
+
+@pytest.fixture
+def cookie_server():
+    # Sets a cookie scoped to /sea and records the Cookie headers received
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(4)
+    received = []
+
+    def serve():
+        while True:
+            try:
+                sock, _ = server.accept()
+            except (IOError, OSError):
+                return
+            data = sock.recv(65536)
+            received.append(re.findall(br'^Cookie: (.*)\r$', data, re.M))
+            sock.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n'
+                         b'Set-Cookie: whale=white; Path=/sea\r\n'
+                         b'Connection: close\r\n\r\nok')
+            sock.close()
+
+    thread = threading.Thread(target=serve)
+    thread.daemon = True
+    thread.start()
+    yield server.getsockname()[1], received
+    server.close()
+
+
+def test_cookies_scoped_by_host_and_path(transport, cookie_server):
+    int_port, received = cookie_server
+    for str_url in ('http://127.0.0.1:{0}/sea/first',
+                    'http://127.0.0.1:{0}/sea/second',
+                    'http://127.0.0.1:{0}/land',
+                    'http://localhost:{0}/sea/third'):
+        assert transport.request('GET', str_url.format(int_port)) \
+            .status_code == 200
+    assert received == [[], [b'whale=white'], [], []]
+    # Cookies set by hand are sent to every host
+    transport.set_cookie('captain', 'ahab')
+    transport.request('GET', 'http://localhost:{0}/'.format(int_port))
+    assert received[-1] == [b'captain=ahab']
@@ -0,0 +1,21 @@
+import time
+
+from woodpecker.misc.clock import Clock, VirtualClock
+
+
+def test_timestamps_anchored_to_wall_clock():
+    clock = Clock()
+    int_first = clock.timestamp_ns()
+    int_second = clock.timestamp_ns()
+    assert isinstance(int_first, int)
+    assert 0 <= int_second - int_first < 10 ** 9
+    assert abs(int_first / 1e9 - time.time()) < 1.0
+    assert abs((clock.now() - Clock.to_datetime(int_first))
+               .total_seconds()) < 1.0
+
+
+def test_virtual_timestamps():
+    clock = VirtualClock()
+    int_start = clock.timestamp_ns()
+    clock.sleep(2.5)
+    assert clock.timestamp_ns() - int_start >= 2500000000
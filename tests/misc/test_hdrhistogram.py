@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+from woodpecker.misc.hdrhistogram import HdrHistogram
+
+
+def test_percentiles_within_precision():
+    histogram = HdrHistogram(significant_figures=2)
+    values = sorted(random.randint(1, 10 ** 7) for _ in range(20000))
+    for value in values:
+        histogram.record(value)
+    assert len(histogram) == 20000
+    assert histogram.min_value == values[0]
+    assert histogram.max_value == values[-1]
+    for percentile, value in histogram.values_at_percentiles(
+            (50, 90, 99, 99.9)).items():
+        exact = values[int(round(percentile / 100.0 * len(values))) - 1]
+        assert abs(value - exact) <= exact * 0.01
+
+
+def test_small_values_exact():
+    histogram = HdrHistogram()
+    for value in range(1, 101):
+        histogram.record(value)
+    assert histogram.values_at_percentiles((50, 99, 100)) == \
+        {50: 50, 99: 99, 100: 100}
+    assert histogram.mean() == 50.5
+
+
+def test_clamp_and_reset():
+    histogram = HdrHistogram(highest_value=1000)
+    histogram.record(10 ** 9)
+    assert histogram.value_at_percentile(100) == 1000
+    histogram.reset()
+    assert histogram.value_at_percentile(50) is None
+    assert histogram.mean() is None
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        HdrHistogram(lowest_value=0)
+    with pytest.raises(ValueError):
+        HdrHistogram(significant_figures=6)
@@ -0,0 +1,31 @@
+import pytest
+
+from woodpecker.misc.jsonpath import JsonPath
+
+DOCUMENT = {
+    'author': {'name': 'Herman', 'surname': 'Melville'},
+    'books': [{'title': 'Moby Dick', 'year': 1851},
+              {'title': 'Typee', 'year': 1846}]
+}
+
+
+@pytest.mark.parametrize('path, expected', [
+    ('$', [DOCUMENT]),
+    ('$.author.name', ['Herman']),
+    ('author.surname', ['Melville']),
+    ("$['author']['name']", ['Herman']),
+    ('$.books[1].title', ['Typee']),
+    ('$.books[-1].year', [1846]),
+    ('$.books[*].title', ['Moby Dick', 'Typee']),
+    ('$.author.*', ['Herman', 'Melville']),
+    ('$..title', ['Moby Dick', 'Typee']),
+    ('$.books[2].title', []),
+    ('$.missing', [])
+])
+def test_find(path, expected):
+    assert JsonPath(path).find(DOCUMENT) == expected
+
+
+def test_invalid_path():
+    with pytest.raises(ValueError):
+        JsonPath('$.books[one]')
@@ -0,0 +1,37 @@
+import multiprocessing
+
+import pytest
+
+from woodpecker.misc.randombuffer import RandomBuffer
+
+
+def _draw(random_buffer, results_queue):
+    results_queue.put([random_buffer.uniform(0.0, 1.0) for _ in range(10)])
+
+
+def test_seeded_samples():
+    first = RandomBuffer(size=16, seed=42)
+    second = RandomBuffer(size=16, seed=42)
+    assert [first.gauss(0.0, 1.0) for _ in range(40)] == \
+        [second.gauss(0.0, 1.0) for _ in range(40)]
+
+
+@pytest.mark.skipif(not hasattr(multiprocessing, 'get_context'),
+                    reason='Fork context not available')
+def test_reseeded_after_fork():
+    context = multiprocessing.get_context('fork')
+    random_buffer = RandomBuffer(size=64)
+    # Samples already drawn by the parent are not inherited
+    random_buffer.uniform(0.0, 1.0)
+    results_queue = context.Queue()
+    workers = [context.Process(target=_draw,
+                               args=(random_buffer, results_queue))
+               for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    samples = [results_queue.get(timeout=10) for _ in workers]
+    for worker in workers:
+        worker.join()
+    parent_samples = [random_buffer.uniform(0.0, 1.0) for _ in range(10)]
+    assert samples[0] != samples[1]
+    assert parent_samples not in samples
@@ -0,0 +1,48 @@
+from string import Template
+
+import pytest
+
+from woodpecker.misc.templatecache import TemplateCache
+
+
+@pytest.mark.parametrize('source', [
+    'http://localhost/plain',
+    'http://$host/${path}?id=$id',
+    'Price: $$5 for $missing and ${missing}',
+    'Invalid $ and $1 placeholders',
+    '$id$id'
+])
+def test_same_result_as_safe_substitute(source):
+    mapping = {'host': 'localhost', 'path': 'books', 'id': 42}
+    assert TemplateCache().render(source, mapping) == \
+        Template(source).safe_substitute(mapping)
+
+
+def test_cache():
+    cache = TemplateCache(max_size=2)
+    assert cache.compile('no placeholders') is None
+    template = cache.compile('$one')
+    assert cache.compile('$one') is template
+    assert len(cache) == 2
+    # The cache is emptied when full
+    cache.compile('$two')
+    assert len(cache) == 1
+
+
+def test_render_structure():
+    cache = TemplateCache()
+    constant = {'title': 'Typee'}
+    body = {'author': {'name': '$name', 'surname': 'Melville'},
+            'books': [constant, {'title': '$title'}],
+            'year': 1851}
+    rendered = cache.render_structure(body, {'name': 'Herman',
+                                             'title': 'Moby Dick'})
+    assert rendered == {'author': {'name': 'Herman', 'surname': 'Melville'},
+                        'books': [{'title': 'Typee'},
+                                  {'title': 'Moby Dick'}],
+                        'year': 1851}
+    # The original is never changed, the parts without placeholders
+    # are not copied
+    assert body['author']['name'] == '$name'
+    assert rendered['books'][0] is constant
+    assert cache.render_structure(constant, {}) is constant
@@ -0,0 +1,50 @@
+import pytest
+
+from woodpecker.profiles.loadprofile import LoadProfile, Hold
+
+
+@pytest.fixture
+def peckers_profile():
+    return LoadProfile().ramp_up(4, 8).hold(2).spike(1, 20).ramp_down(2)
+
+
+def test_profile_duration(peckers_profile):
+    assert peckers_profile.duration() == 9
+
+
+def test_compiled_peckers_profile(peckers_profile):
+    compiled = peckers_profile.compile()
+    assert list(compiled.values) == [0, 2, 4, 6, 8, 8, 20, 8, 4]
+    assert compiled.max() == 20
+    assert compiled.duration() == 9
+
+
+def test_compiled_profile_lookup(peckers_profile):
+    compiled = peckers_profile.compile(resolution=0.5)
+    assert len(compiled) == 18
+    assert compiled.at(1.0) == 2
+    assert compiled.at(6.2) == 20
+    assert compiled.at(9.0) is None
+
+
+def test_compiled_rate_profile():
+    compiled = LoadProfile(kind='rate').step(2, 0.5).ramp_up(2, 1.5) \
+        .compile()
+    assert list(compiled.values) == [0.5, 0.5, 0.5, 1.0]
+
+
+def test_unknown_profile_kind():
+    with pytest.raises(ValueError):
+        LoadProfile(kind='users')
+
+
+def test_bad_profile_element():
+    with pytest.raises(TypeError):
+        LoadProfile().add((10, 100))
+    with pytest.raises(ValueError):
+        Hold(-1)
+
+
+def test_negative_profile_level():
+    with pytest.raises(ValueError):
+        LoadProfile().step(2, 10).step(1, -3).compile()
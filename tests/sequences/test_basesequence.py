@@ -1,9 +1,13 @@
 import pytest
 import re
+import time
 
+import six
 from six import StringIO
 
+from woodpecker.io.logrecords import decode_record
 from woodpecker.sequences.basesequence import BaseSequence
+from woodpecker.settings.coresettings import CoreSettings
 
 
 @pytest.fixture
@@ -93,3 +97,150 @@ def test_gaussian_random_think_time(random_gaussian_think_time_sequence):
         r"Think time: (\d+\.\d{,3}) s \(gaussian\)", output_string
     )[0])
     assert think_time >= 0
+
+
+@pytest.fixture
+def paced_sequence():
+    class PacedSequence(BaseSequence):
+        def steps(self):
+            self.think_time(0.1)
+
+    return PacedSequence
+
+
+@pytest.fixture
+def pacing_settings():
+    settings = CoreSettings()
+    settings['timing']['iteration_pacing'] = 0.3
+    return settings
+
+
+def test_given_settings_not_overridden(paced_sequence, pacing_settings):
+    sequence = paced_sequence(settings=pacing_settings)
+    assert sequence.settings['timing']['iteration_pacing'] == 0.3
+    assert sequence.settings['runtime']['each_sequence_is_stopwatch']
+
+
+def test_iteration_pacing(paced_sequence, pacing_settings):
+    output_stream = StringIO()
+    sequence = paced_sequence(
+        settings=pacing_settings,
+        debug=True,
+        inline_log_sinks=(output_stream,)
+    )
+    start = time.time()
+    sequence.run_steps()
+    elapsed = time.time() - start
+    assert 0.3 <= elapsed < 0.4
+    assert re.search(r'Pacing: waited 0\.\d+ s to keep a 0\.300 s interval',
+                     output_stream.getvalue()) is not None
+
+
+def test_iteration_pacing_exceeded(paced_sequence, pacing_settings):
+    output_stream = StringIO()
+    pacing_settings['timing']['iteration_pacing'] = 0.05
+    sequence = paced_sequence(
+        settings=pacing_settings,
+        inline_log_sinks=(output_stream,)
+    )
+    sequence.run_steps()
+    assert 'Pacing interval of 0.050 s exceeded' in output_stream.getvalue()
+
+
+@pytest.fixture
+def think_time_settings():
+    settings = CoreSettings()
+    settings['timing']['max_think_time'] = 0.2
+    return settings
+
+
+@pytest.mark.parametrize('kind', ['uniform', 'exponential', 'lognormal'])
+def test_random_think_time_kinds(kind, think_time_settings):
+    class RandomThinkTimeSequence(BaseSequence):
+        def steps(self):
+            self.think_time(0.1, kind=kind)
+
+    output_stream = StringIO()
+    sequence = RandomThinkTimeSequence(
+        settings=think_time_settings,
+        debug=True,
+        inline_log_sinks=(output_stream,)
+    )
+    sequence.run_steps()
+    think_time = float(re.findall(
+        r"Think time: (\d+\.\d{,3}) s \(" + kind + r"\)",
+        output_stream.getvalue()
+    )[0])
+    assert 0 <= think_time <= 0.2
+
+
+def test_think_time_clamped(fixed_think_time_sequence, think_time_settings):
+    output_stream = StringIO()
+    sequence = fixed_think_time_sequence(
+        settings=think_time_settings,
+        debug=True,
+        inline_log_sinks=(output_stream,)
+    )
+    sequence.run_steps()
+    assert 'Think time: 0.2 s (fixed)' in output_stream.getvalue()
+
+
+def test_skip_think_time(fixed_think_time_sequence, think_time_settings):
+    output_stream = StringIO()
+    think_time_settings['timing']['skip_think_time'] = True
+    sequence = fixed_think_time_sequence(
+        settings=think_time_settings,
+        debug=True,
+        inline_log_sinks=(output_stream,)
+    )
+    start = time.time()
+    sequence.run_steps()
+    assert time.time() - start < 0.1
+    assert 'Think time skipped' in output_stream.getvalue()
+
+
+def test_think_time_after_setup(paced_sequence, think_time_settings):
+    output_stream = StringIO()
+    think_time_settings['timing']['think_time_after_setup'] = 0.05
+    sequence = paced_sequence(
+        settings=think_time_settings,
+        debug=True,
+        inline_log_sinks=(output_stream,)
+    )
+    sequence.run_steps()
+    assert 'Think time: 0.05 s (fixed)' in output_stream.getvalue()
+
+
+@pytest.fixture
+def long_journey_sequence():
+    class LongJourneySequence(BaseSequence):
+        def steps(self):
+            self.think_time(60, kind='fixed')
+            self.think_time(60, kind='exponential')
+
+    return LongJourneySequence
+
+
+def test_virtual_clock(long_journey_sequence):
+    settings = CoreSettings()
+    settings['timing']['virtual_clock'] = True
+    settings['timing']['max_think_time'] = 0.0
+    log_queue = six.moves.queue.Queue()
+    sequence = long_journey_sequence(
+        settings=settings,
+        log_queue=log_queue,
+        inline_log_sinks=tuple()
+    )
+    start = time.time()
+    sequence.run_steps()
+    assert time.time() - start < 1
+    assert sequence.clock.offset >= 60
+
+    start_event, end_event = [
+        decode_record(log_queue.get())['message_content']['event_content']
+        for _ in range(2)
+    ]
+    # Timestamps and durations are in nanoseconds
+    assert end_event['timestamp'] - start_event['timestamp'] >= 60 * 10 ** 9
+    assert end_event['duration'] == \
+        end_event['timestamp'] - start_event['timestamp']
@@ -1,9 +1,14 @@
 import pytest
 import requests
+import six
 
 from six import StringIO
 
+from woodpecker.io.logrecords import decode_record
+from woodpecker.io.responseview import ResponseView
+from woodpecker.io.variablejar import VariableJar
 from woodpecker.sequences.httpsequence import HttpSequence
+from woodpecker.settings.httpsequencesettings import HttpSequenceSettings
 
 
 @pytest.fixture
@@ -452,3 +457,391 @@ def test_http_assert_elapsed_ko(http_assert_elapsed_ko_sequence):
     )
     with pytest.raises(AssertionError):
         sequence.run_steps()
+
+
+def test_local_async_pool_reused(local_http_server):
+    class LocalAsyncPoolSequence(HttpSequence):
+        def steps(self):
+            self.start_async_pool()
+            for _ in range(5):
+                self.async_get(local_http_server + '/html')
+            self.end_async_pool()
+            self.async_get(local_http_server + '/html')
+
+    output_stream = StringIO()
+    sequence = LocalAsyncPoolSequence(
+        debug=True,
+        inline_log_sinks=(output_stream,)
+    )
+    greenlet_pool = sequence._async_greenlet_pool
+    sequence.run_steps()
+    sequence.run_steps()
+    assert sequence._async_greenlet_pool is greenlet_pool
+    assert len(greenlet_pool) == 0
+    assert output_stream.getvalue().count('HTTP Request (async)') == 12
+
+
+def test_local_connection_pool_statistics(local_http_server):
+    class LocalPoolSequence(HttpSequence):
+        def steps(self):
+            self.get(local_http_server + '/html')
+            self.get(local_http_server + '/html')
+            self.start_async_pool()
+            for _ in range(8):
+                self.async_get(local_http_server + '/html')
+            self.end_async_pool()
+
+    settings = HttpSequenceSettings()
+    settings['http']['max_connections_per_host'] = 2
+    sequence = LocalPoolSequence(settings=settings,
+                                 variables=VariableJar(),
+                                 inline_log_sinks=tuple())
+    sequence.steps()
+    statistics = sequence.connection_pool_statistics()
+    assert statistics['hits'] + statistics['misses'] == 10
+    assert 1 <= statistics['misses'] <= 2
+    assert statistics['waits'] > 0
+    adapter = sequence.variables.get('__http_transport').session.get_adapter(
+        'http://'
+    )
+    assert adapter._pool_maxsize == 2
+
+
+def test_local_asyncio_transport(local_http_server):
+    class LocalAsyncioSequence(HttpSequence):
+        def steps(self):
+            self.get(local_http_server + '/html',
+                     response_hooks=[
+                         self.assert_http_status(200),
+                         self.assert_body_has_text('Moby Dick'),
+                         self.assert_header_value('X-Woodpecker-Context',
+                                                  'UnitTest'),
+                         self.var_from_regex('leg', r'Ahab\'s (\w+)')
+                     ],
+                     with_resources=(local_http_server + '/json',
+                                     local_http_server + '/html'))
+
+    settings = HttpSequenceSettings()
+    settings['http']['transport'] = 'asyncio'
+    output_stream = StringIO()
+    sequence = LocalAsyncioSequence(settings=settings,
+                                    variables=VariableJar(),
+                                    debug=True,
+                                    inline_log_sinks=(output_stream,))
+    sequence.run_steps()
+    assert sequence.variables.get('leg') == 'leg'
+    assert output_stream.getvalue().count('HTTP Request (async)') == 2
+    assert sequence.connection_pool_statistics() is not None
+
+
+def test_local_raw_transport_step_records(local_http_server):
+    class LocalStepSequence(HttpSequence):
+        def steps(self):
+            self.get(local_http_server + '/html',
+                     response_hooks=[self.assert_body_has_text('Moby')])
+
+    step_records = []
+    for str_transport in ('requests', 'raw'):
+        settings = HttpSequenceSettings()
+        settings['http']['transport'] = str_transport
+        log_queue = six.moves.queue.Queue()
+        sequence = LocalStepSequence(settings=settings,
+                                     log_queue=log_queue,
+                                     variables=VariableJar(),
+                                     inline_log_sinks=tuple())
+        sequence.steps()
+        step_records.append(decode_record(log_queue.get_nowait()))
+
+    requests_step, raw_step = step_records
+    assert raw_step['message_type'] == 'step'
+    assert sorted(raw_step['message_content']['step_content']) == \
+        sorted(requests_step['message_content']['step_content'])
+    assert raw_step['message_content']['step_content']['response_status'] \
+        == '200 OK'
+    assert raw_step['message_content']['step_content']['response_size'] \
+        == requests_step['message_content']['step_content']['response_size']
+
+
+def test_local_pipelined_resources(local_http_server):
+    class LocalPipelinedSequence(HttpSequence):
+        def steps(self):
+            self.get(local_http_server + '/html',
+                     with_resources=tuple(
+                         local_http_server + '/json' for _ in range(6)
+                     ))
+
+    settings = HttpSequenceSettings()
+    settings['http']['transport'] = 'raw'
+    settings['http']['pipelining_depth'] = 4
+    output_stream = StringIO()
+    sequence = LocalPipelinedSequence(settings=settings,
+                                      variables=VariableJar(),
+                                      debug=True,
+                                      inline_log_sinks=(output_stream,))
+    sequence.steps()
+    assert output_stream.getvalue().count('HTTP Request (async)') == 6
+    statistics = sequence.connection_pool_statistics()
+    assert statistics['misses'] == 1
+    assert statistics['hits'] == 2
+
+
+def test_local_http2_resources(local_h2c_server):
+    class LocalHttp2Sequence(HttpSequence):
+        def steps(self):
+            self.get(local_h2c_server + '/html',
+                     response_hooks=[self.assert_body_has_text('Ahab')],
+                     with_resources=tuple(
+                         local_h2c_server + '/json' for _ in range(6)
+                     ))
+
+    settings = HttpSequenceSettings()
+    settings['http']['transport'] = 'http2'
+    output_stream = StringIO()
+    sequence = LocalHttp2Sequence(settings=settings,
+                                  variables=VariableJar(),
+                                  debug=True,
+                                  inline_log_sinks=(output_stream,))
+    sequence.steps()
+    assert output_stream.getvalue().count('HTTP Request (async)') == 6
+    assert sequence.connection_pool_statistics()['misses'] == 1
+
+
+def test_local_variables_injected_in_request(local_http_server):
+    class LocalInjectionSequence(HttpSequence):
+        def steps(self):
+            self.variables.set('path', 'json')
+            self.variables.set('token', 'abc123')
+            self.variables.set('book', 'Moby Dick')
+            self.post(local_http_server + '/$path',
+                      headers={'X-Token': '$token'},
+                      params={'q': '${book}'},
+                      json={'books': [{'title': '$book'}]})
+
+    sequence = LocalInjectionSequence(variables=VariableJar(),
+                                      inline_log_sinks=tuple())
+    sequence.steps()
+    response = sequence.variables.get('__last_response')
+    assert response.request.url.endswith('/json?q=Moby+Dick')
+    assert response.request.headers['X-Token'] == 'abc123'
+    assert response.request.body == b'{"books": [{"title": "Moby Dick"}]}'
+
+
+def test_request_profile(http_200_sequence, monkeypatch):
+    settings = HttpSequenceSettings()
+    settings['http']['default_timeout'] = 2.5
+    sequence = http_200_sequence(settings=settings,
+                                 variables=VariableJar(),
+                                 inline_log_sinks=tuple())
+    profile = sequence.request_profile()
+    assert sequence.request_profile() is profile
+    assert profile.timeout == 2.5
+    assert profile.headers == (('User-Agent', 'Google Chrome 58'),)
+
+    kwargs = {'timeout': 1.0}
+    sequence._patch_kwargs(kwargs)
+    assert kwargs['timeout'] == 1.0
+    assert kwargs['headers'] == {'User-Agent': 'Google Chrome 58'}
+    assert kwargs['proxies'] == {}
+    # Each call gets its own headers
+    kwargs['headers']['X-Requested-With'] = 'XMLHttpRequest'
+    other_kwargs = {}
+    sequence._patch_kwargs(other_kwargs)
+    assert 'X-Requested-With' not in other_kwargs['headers']
+
+    # Settings changed later on are applied to the next requests
+    settings['http']['default_timeout'] = 3.0
+    settings['http']['user_agent'] = 'Woodpecker'
+    profile = sequence.request_profile()
+    assert profile.timeout == 3.0
+    assert profile.headers == (('User-Agent', 'Woodpecker'),)
+    assert sequence.request_profile() is profile
+    settings['http'].update({'http_proxy': 'http://127.0.0.1:3128'})
+    profile = sequence.request_profile()
+    assert profile.proxies == (('http', 'http://127.0.0.1:3128'),)
+    del settings['http']['http_proxy']
+    settings['http']['http_proxy'] = None
+    assert sequence.request_profile().proxies == ()
+    # Only the change counter is read while the settings stay the same
+    profile = sequence.request_profile()
+    monkeypatch.setattr(type(settings['http']), '__getitem__', None)
+    assert sequence.request_profile() is profile
+    monkeypatch.undo()
+    sequence.refresh_request_profile()
+    assert sequence.request_profile() is not profile
+
+
+def test_local_hooks_share_response_view(local_http_server):
+    class LocalViewSequence(HttpSequence):
+        def steps(self):
+            self.get(local_http_server + '/html',
+                     response_hooks=[
+                         self.assert_body_has_text('Moby Dick'),
+                         self.assert_body_has_regex(r'Ahab\'s \w+'),
+                         self.var_from_regex('author', r'<h1>(\w+)'),
+                         self.var_from_regex('context',
+                                             r'Context: (\w+)',
+                                             target='headers')
+                     ])
+
+    sequence = LocalViewSequence(variables=VariableJar(),
+                                 inline_log_sinks=tuple())
+    sequence.steps()
+    response = sequence.variables.get('__last_response')
+    view = ResponseView.of(response)
+    assert view._text is not None
+    assert view._all_text is None
+    assert sequence.variables.get('author') == 'Herman'
+    assert sequence.variables.get('context') == 'UnitTest'
+
+
+def test_local_regex_instances(local_http_server):
+    class LocalRegexSequence(HttpSequence):
+        def steps(self):
+            self.get(local_http_server + '/json',
+                     response_hooks=[
+                         self.var_from_regex('first', r'"title": "([^"]+)"'),
+                         self.var_from_regex('second', r'"title": "([^"]+)"',
+                                             instances=2),
+                         self.var_from_regex('last', r'"title": "([^"]+)"',
+                                             instances='last'),
+                         self.var_from_regex('random', r'"title": "([^"]+)"',
+                                             instances='random'),
+                         self.var_from_regex('all', r'"title": "([^"]+)"',
+                                             instances='all'),
+                         self.var_from_regex('surname',
+                                             r'"(name|surname)": "(\w+)"',
+                                             instances=2,
+                                             group=1)
+                     ])
+
+    sequence = LocalRegexSequence(variables=VariableJar(),
+                                  inline_log_sinks=tuple())
+    sequence.steps()
+    assert sequence.variables.get('first') == 'Moby Dick'
+    assert sequence.variables.get('second') == 'Typee'
+    assert sequence.variables.get('last') == 'Typee'
+    assert sequence.variables.get('random') in ('Moby Dick', 'Typee')
+    assert sequence.variables.get('all') == ['Moby Dick', 'Typee']
+    assert sequence.variables.get('surname') == 'Melville'
+
+
+def test_local_regex_ordinal_not_found(local_http_server):
+    class LocalRegexSequence(HttpSequence):
+        def steps(self):
+            self.get(local_http_server + '/json',
+                     response_hooks=[
+                         self.var_from_regex('third', r'"title": "([^"]+)"',
+                                             instances=3)
+                     ])
+
+    sequence = LocalRegexSequence(variables=VariableJar(),
+                                  inline_log_sinks=tuple())
+    with pytest.raises(IOError):
+        sequence.steps()
+    with pytest.raises(ValueError):
+        sequence.var_from_regex('none', 'title', instances=0)
+
+
+def test_local_var_from_boundaries(local_http_server):
+    class LocalBoundariesSequence(HttpSequence):
+        def steps(self):
+            self.get(local_http_server + '/html',
+                     response_hooks=[
+                         self.var_from_boundaries('title', '<h1>', '</h1>'),
+                         self.var_from_boundaries('charset',
+                                                  'charset=', '\n',
+                                                  target='headers')
+                     ])
+            self.get(local_http_server + '/json',
+                     response_hooks=[
+                         self.var_from_boundaries('second', '"title": "',
+                                                  '"', instances=2),
+                         self.var_from_boundaries('titles', '"title": "',
+                                                  '"', instances='all')
+                     ])
+
+    sequence = LocalBoundariesSequence(variables=VariableJar(),
+                                       inline_log_sinks=tuple())
+    sequence.steps()
+    assert sequence.variables.get('title') == 'Herman Melville - Moby Dick'
+    assert sequence.variables.get('charset') == 'utf-8'
+    assert sequence.variables.get('second') == 'Typee'
+    assert sequence.variables.get('titles') == ['Moby Dick', 'Typee']
+    # The body was never decoded as a whole
+    response = sequence.variables.get('__last_response')
+    assert ResponseView.of(response)._text is None
+
+
+def test_local_var_from_boundaries_not_found(local_http_server):
+    class LocalBoundariesSequence(HttpSequence):
+        def steps(self):
+            self.get(local_http_server + '/html',
+                     response_hooks=[
+                         self.var_from_boundaries('title', '<h2>', '</h2>')
+                     ])
+
+    sequence = LocalBoundariesSequence(variables=VariableJar(),
+                                       inline_log_sinks=tuple())
+    with pytest.raises(IOError):
+        sequence.steps()
+
+
+def test_local_var_from_json(local_http_server):
+    class LocalJsonSequence(HttpSequence):
+        def steps(self):
+            self.get(local_http_server + '/json',
+                     response_hooks=[
+                         self.var_from_json('name', '$.author.name'),
+                         self.var_from_json('titles', '$..title',
+                                            instances='all'),
+                         self.var_from_json('last', '$.books[*].title',
+                                            instances='last')
+                     ])
+
+    sequence = LocalJsonSequence(variables=VariableJar(),
+                                 inline_log_sinks=tuple())
+    sequence.steps()
+    assert sequence.variables.get('name') == 'Herman'
+    assert sequence.variables.get('titles') == ['Moby Dick', 'Typee']
+    assert sequence.variables.get('last') == 'Typee'
+    # Selectors are compiled once per sequence class
+    selector = LocalJsonSequence._compiled_selector('json', '$.author.name')
+    sequence.steps()
+    assert LocalJsonSequence._compiled_selector(
+        'json', '$.author.name') is selector
+    assert '_selectors' not in HttpSequence.__dict__
+
+
+def test_local_var_from_css_and_xpath(local_http_server):
+    pytest.importorskip('lxml')
+    pytest.importorskip('cssselect')
+
+    class LocalHtmlSequence(HttpSequence):
+        def steps(self):
+            self.get(local_http_server + '/html',
+                     response_hooks=[
+                         self.var_from_css('title', 'body > h1'),
+                         self.var_from_xpath('leg', '//p/text()'),
+                         self.var_from_xpath('paragraphs', 'count(//p)')
+                     ])
+
+    sequence = LocalHtmlSequence(variables=VariableJar(),
+                                 inline_log_sinks=tuple())
+    sequence.steps()
+    assert sequence.variables.get('title') == 'Herman Melville - Moby Dick'
+    assert sequence.variables.get('leg') == 'Ahab\'s leg'
+    assert sequence.variables.get('paragraphs') == 1.0
+
+
+def test_local_var_from_json_not_found(local_http_server):
+    class LocalJsonSequence(HttpSequence):
+        def steps(self):
+            self.get(local_http_server + '/json',
+                     response_hooks=[
+                         self.var_from_json('missing', '$.publisher')
+                     ])
+
+    sequence = LocalJsonSequence(variables=VariableJar(),
+                                 inline_log_sinks=tuple())
+    with pytest.raises(IOError):
+        sequence.steps()
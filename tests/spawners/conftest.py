@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def results_directory(tmpdir):
+    # Spawners write their results file in the working directory by default
+    with tmpdir.as_cwd():
+        yield tmpdir
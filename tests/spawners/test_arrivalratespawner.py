@@ -0,0 +1,93 @@
+import pytest
+
+from six import StringIO
+
+from woodpecker.profiles.loadprofile import LoadProfile
+from woodpecker.sequences.basesequence import BaseSequence
+from woodpecker.spawners.arrivalratespawner import ArrivalRateSpawner
+
+
+@pytest.fixture
+def slow_sequence():
+    class SlowSequence(BaseSequence):
+        def steps(self):
+            self.think_time(0.2)
+
+    return SlowSequence
+
+
+def test_constant_arrival_offsets(slow_sequence):
+    spawner = ArrivalRateSpawner(slow_sequence, 4, inline_log_sinks=tuple())
+    offsets = spawner.arrival_offsets()
+    assert [next(offsets) for _ in range(3)] == [0.0, 0.25, 0.5]
+
+
+def test_steps_arrival_offsets(slow_sequence):
+    spawner = ArrivalRateSpawner(slow_sequence,
+                                 [(1, 2), (1, 0), (1, 4)],
+                                 arrival_kind='steps',
+                                 inline_log_sinks=tuple())
+    assert list(spawner.arrival_offsets()) == \
+        [0.0, 0.5, 2.0, 2.25, 2.5, 2.75]
+
+
+def test_poisson_arrival_offsets(slow_sequence):
+    spawner = ArrivalRateSpawner(slow_sequence,
+                                 100,
+                                 arrival_kind='poisson',
+                                 inline_log_sinks=tuple())
+    offsets = spawner.arrival_offsets()
+    samples = [next(offsets) for _ in range(1000)]
+    assert samples == sorted(samples)
+    assert 5 < samples[-1] < 15
+
+
+@pytest.mark.parametrize('arrival_kind', ['constant', 'poisson'])
+def test_zero_arrival_rate(slow_sequence, arrival_kind):
+    spawner = ArrivalRateSpawner(slow_sequence,
+                                 0,
+                                 arrival_kind=arrival_kind,
+                                 duration=1,
+                                 inline_log_sinks=tuple())
+    assert list(spawner.arrival_offsets()) == []
+    spawner.run()
+    assert spawner.report['scheduled'] == 0
+
+
+def test_unknown_arrival_kind(slow_sequence):
+    with pytest.raises(ValueError):
+        ArrivalRateSpawner(slow_sequence, 1, arrival_kind='burst')
+
+
+def test_arrival_rate_kept(slow_sequence):
+    spawner = ArrivalRateSpawner(slow_sequence,
+                                 20,
+                                 peckers=10,
+                                 iterations=10,
+                                 inline_log_sinks=tuple())
+    spawner.run()
+    assert spawner.report['started'] == 10
+    assert spawner.report['missed'] == 0
+
+
+def test_arrival_rate_missed(slow_sequence):
+    output_stream = StringIO()
+    spawner = ArrivalRateSpawner(slow_sequence,
+                                 20,
+                                 peckers=1,
+                                 iterations=10,
+                                 inline_log_sinks=(output_stream,))
+    spawner.run()
+    assert spawner.report['scheduled'] == 10
+    assert spawner.report['missed'] > 0
+    assert 'Arrival schedule not kept' in output_stream.getvalue()
+
+
+def test_profile_arrival_offsets(slow_sequence):
+    spawner = ArrivalRateSpawner(slow_sequence,
+                                 LoadProfile(kind='rate').step(1, 2)
+                                 .step(1, 0).step(1, 4),
+                                 arrival_kind='profile',
+                                 inline_log_sinks=tuple())
+    assert list(spawner.arrival_offsets()) == \
+        [0.0, 0.5, 2.0, 2.25, 2.5, 2.75]
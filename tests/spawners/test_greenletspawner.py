@@ -0,0 +1,141 @@
+import sqlite3
+
+import pytest
+import six
+
+from six import StringIO
+
+from woodpecker.misc.functions import import_spawner
+from woodpecker.sequences.basesequence import BaseSequence
+from woodpecker.sequences.httpsequence import HttpSequence
+from woodpecker.settings.coresettings import CoreSettings
+from woodpecker.spawners.greenletspawner import GreenletSpawner
+
+
+@pytest.fixture
+def counting_sequence():
+    class CountingSequence(BaseSequence):
+        executions = []
+
+        def steps(self):
+            self.executions.append((
+                self.variables.get_pecker_id(),
+                self.variables.get_current_iteration()
+            ))
+            self.think_time(0.01)
+
+    return CountingSequence
+
+
+@pytest.fixture
+def logging_sequence():
+    class LoggingSequence(BaseSequence):
+        def steps(self):
+            for index in range(3):
+                self.log('event', {
+                    'event_type': 'logging_test',
+                    'event_content': {'index': index}
+                })
+
+    return LoggingSequence
+
+
+@pytest.fixture
+def failing_sequence():
+    class FailingSequence(BaseSequence):
+        def steps(self):
+            raise AssertionError('Failed on purpose')
+
+    return FailingSequence
+
+
+def test_import_greenlet_spawner():
+    assert import_spawner('greenlets') is GreenletSpawner
+
+
+def test_import_unknown_spawner():
+    with pytest.raises(ValueError):
+        import_spawner('fibers')
+
+
+def test_greenlet_spawner_iterations(counting_sequence):
+    spawner = GreenletSpawner(counting_sequence,
+                              peckers=50,
+                              iterations=3,
+                              spawner_id='test',
+                              inline_log_sinks=tuple())
+    spawner.run()
+    assert len(counting_sequence.executions) == 150
+    assert len(set(
+        pecker_id for pecker_id, _ in counting_sequence.executions
+    )) == 50
+    assert not spawner.is_running()
+
+
+def test_greenlet_spawner_own_variable_jar(counting_sequence):
+    spawner = GreenletSpawner(counting_sequence,
+                              peckers=2,
+                              iterations=1,
+                              inline_log_sinks=tuple())
+    first, second = [spawner._new_pecker(spawner.pecker_id(index))[0]
+                     for index in range(2)]
+    assert first.variables is not second.variables
+
+
+def test_greenlet_spawner_failing_iterations(failing_sequence):
+    output_stream = StringIO()
+    spawner = GreenletSpawner(failing_sequence,
+                              peckers=2,
+                              iterations=2,
+                              debug=True,
+                              inline_log_sinks=(output_stream,))
+    spawner.run()
+    assert output_stream.getvalue().count('Failed on purpose') == 4
+
+
+def test_greenlet_spawner_collects_logs(logging_sequence, tmpdir):
+    settings = CoreSettings()
+    settings['logging']['max_pending_entries'] = 20
+    settings['logging']['results_file'] = str(tmpdir.join('results.sqlite'))
+    spawner = GreenletSpawner(logging_sequence,
+                              peckers=4,
+                              iterations=5,
+                              settings=settings,
+                              inline_log_sinks=tuple())
+    # More records than the queue can hold, drained while running
+    spawner.run()
+    assert spawner.log_queue.qsize() == 0
+    assert not spawner.log_collector.is_running()
+    connection = sqlite3.connect(settings['logging']['results_file'])
+    assert connection.execute(
+        "SELECT COUNT(*) FROM events WHERE event_type = 'logging_test'"
+    ).fetchone()[0] == 60
+    connection.close()
+
+
+def test_greenlet_spawner_aggregates_logs(local_http_server):
+    class MissingPageSequence(HttpSequence):
+        def steps(self):
+            self.get(local_http_server + '/missing')
+
+    spawner = GreenletSpawner(MissingPageSequence,
+                              peckers=1,
+                              iterations=1,
+                              log_sinks=tuple(),
+                              inline_log_sinks=tuple())
+    assert spawner.log_collector.aggregator is spawner.aggregator
+    spawner.run()
+    # The failed step and its error event count as one failed request
+    summary = spawner.aggregator.summary()['urls'][
+        local_http_server + '/missing'
+    ]
+    assert summary['count'] == 1
+    assert summary['errors'] == 1
+
+
+def test_greenlet_spawner_caller_log_queue(counting_sequence):
+    spawner = GreenletSpawner(counting_sequence,
+                              log_queue=six.moves.queue.Queue(),
+                              inline_log_sinks=tuple())
+    assert spawner.log_collector is None
+    assert spawner.aggregator is None
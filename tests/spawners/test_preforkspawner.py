@@ -0,0 +1,83 @@
+import gc
+import sys
+
+import pytest
+import six
+
+from woodpecker.io.logrecords import decode_record
+from woodpecker.sequences.basesequence import BaseSequence
+from woodpecker.settings.coresettings import CoreSettings
+from woodpecker.spawners.preforkspawner import PreforkSpawner
+
+
+@pytest.fixture
+def empty_sequence():
+    class EmptySequence(BaseSequence):
+        def steps(self):
+            pass
+
+    return EmptySequence
+
+
+@pytest.fixture
+def prefork_settings():
+    settings = CoreSettings()
+    settings['spawning']['worker_processes'] = 2
+    settings['spawning']['pecker_status_active_polling_interval'] = 0.01
+    settings['spawning']['preloaded_modules'] = ['json']
+    return settings
+
+
+def test_prefork_spawner_preload(empty_sequence, prefork_settings):
+    spawner = PreforkSpawner(empty_sequence,
+                             settings=prefork_settings,
+                             inline_log_sinks=tuple())
+    spawner.preload()
+    assert spawner.preloaded_modules['json'] is sys.modules['json']
+
+
+def test_prefork_spawner_sequence_specs(empty_sequence, prefork_settings):
+    spec = ('checkout.py', 'CheckoutSequence')
+    spawner = PreforkSpawner(spec,
+                             settings=prefork_settings,
+                             inline_log_sinks=tuple())
+    assert spawner._sequences == (spec,)
+    spawner = PreforkSpawner([spec, empty_sequence],
+                             settings=prefork_settings,
+                             inline_log_sinks=tuple())
+    assert spawner._sequences == (spec, empty_sequence)
+
+
+def test_prefork_spawner_run(empty_sequence, prefork_settings):
+    log_queue = six.moves.queue.Queue()
+    spawner = PreforkSpawner(empty_sequence,
+                             peckers=2,
+                             iterations=2,
+                             settings=prefork_settings,
+                             log_queue=log_queue,
+                             inline_log_sinks=tuple())
+    spawner.run()
+    assert log_queue.qsize() == 2 * 2 * 2
+
+
+def test_prefork_spawner_gc_in_workers(prefork_settings):
+    class GcSequence(BaseSequence):
+        def steps(self):
+            self.log('event', {'event_type': 'gc',
+                               'event_content': {'enabled': gc.isenabled()}})
+
+    log_queue = six.moves.queue.Queue()
+    spawner = PreforkSpawner(GcSequence,
+                             peckers=2,
+                             iterations=1,
+                             settings=prefork_settings,
+                             log_queue=log_queue,
+                             inline_log_sinks=tuple())
+    spawner.run()
+    records = [decode_record(log_queue.get()) for _ in
+               range(log_queue.qsize())]
+    assert [record['message_content']['event_content']['enabled']
+            for record in records
+            if record['message_content'].get('event_type') == 'gc'] == \
+        [True, True]
+    assert gc.isenabled()
@@ -0,0 +1,58 @@
+import pytest
+import six
+
+from woodpecker.sequences.basesequence import BaseSequence
+from woodpecker.settings.coresettings import CoreSettings
+from woodpecker.spawners.processspawner import ProcessSpawner
+
+
+@pytest.fixture
+def empty_sequence():
+    class EmptySequence(BaseSequence):
+        def steps(self):
+            self.think_time(0.01)
+
+    return EmptySequence
+
+
+@pytest.fixture
+def two_workers_settings():
+    settings = CoreSettings()
+    settings['spawning']['worker_processes'] = 2
+    settings['spawning']['pecker_status_active_polling_interval'] = 0.01
+    return settings
+
+
+def test_process_spawner_shards(empty_sequence, two_workers_settings):
+    spawner = ProcessSpawner(empty_sequence,
+                             peckers=5,
+                             settings=two_workers_settings,
+                             inline_log_sinks=tuple())
+    assert spawner.shards() == [(0, 3), (3, 2)]
+
+
+def test_process_spawner_no_idle_workers(empty_sequence):
+    spawner = ProcessSpawner(empty_sequence,
+                             peckers=1,
+                             inline_log_sinks=tuple())
+    assert spawner.worker_count() == 1
+
+
+def test_process_spawner_forks_workers(empty_sequence):
+    spawner = ProcessSpawner(empty_sequence, inline_log_sinks=tuple())
+    # Local sequence classes and inline sinks are inherited, not pickled
+    assert spawner._context.get_start_method() == 'fork'
+
+
+def test_process_spawner_collects_logs(empty_sequence, two_workers_settings):
+    log_queue = six.moves.queue.Queue()
+    spawner = ProcessSpawner(empty_sequence,
+                             peckers=4,
+                             iterations=3,
+                             settings=two_workers_settings,
+                             log_queue=log_queue,
+                             inline_log_sinks=tuple())
+    spawner.run()
+    # Each iteration logs the start and the end of the sequence stopwatch
+    assert log_queue.qsize() == 4 * 3 * 2
+    assert not spawner.is_running()
@@ -0,0 +1,46 @@
+import pytest
+
+from woodpecker.profiles.loadprofile import LoadProfile
+from woodpecker.sequences.basesequence import BaseSequence
+from woodpecker.settings.coresettings import CoreSettings
+from woodpecker.spawners.profilespawner import ProfileSpawner
+
+
+@pytest.fixture
+def tracking_sequence():
+    class TrackingSequence(BaseSequence):
+        peckers = set()
+
+        def steps(self):
+            self.peckers.add(self.variables.get_pecker_id())
+            self.think_time(0.01)
+
+    return TrackingSequence
+
+
+@pytest.fixture
+def fast_settings():
+    settings = CoreSettings()
+    settings['spawning']['profile_resolution'] = 0.05
+    return settings
+
+
+def test_profile_spawner_follows_profile(tracking_sequence, fast_settings):
+    spawner = ProfileSpawner(tracking_sequence,
+                             LoadProfile().step(0.1, 2).step(0.1, 5)
+                             .ramp_down(0.1),
+                             spawner_id='test',
+                             settings=fast_settings,
+                             inline_log_sinks=tuple())
+    assert spawner.peckers == 5
+    spawner.run()
+    assert tracking_sequence.peckers == \
+        set('test-{index}'.format(index=index) for index in range(5))
+    assert not spawner.is_running()
+
+
+def test_profile_spawner_rejects_rate_profile(tracking_sequence):
+    with pytest.raises(ValueError):
+        ProfileSpawner(tracking_sequence,
+                       LoadProfile(kind='rate').hold(1),
+                       inline_log_sinks=tuple())
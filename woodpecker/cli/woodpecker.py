@@ -5,6 +5,7 @@ from pkg_resources import iter_entry_points
 from click_plugins import with_plugins
 
 from .._version import get_versions
+from ..misc.functions import patch_gevent
 
 from .commands.init import init
 from .commands.update import update
@@ -25,6 +26,8 @@ def woodpecker(ctx, workdir):
     """
     Lightweight, Python based load test tool 
     """
+    # Patched before any sequence (and requests) is imported
+    patch_gevent()
     ctx.obj['WORKDIR'] = workdir
 
 woodpecker.add_command(init)
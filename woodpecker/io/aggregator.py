@@ -0,0 +1,253 @@
+import collections
+
+import msgpack
+import six
+
+from woodpecker.io.logrecords import END_STOPWATCH_EVENT, \
+    HTTP_ERROR_EVENT, HTTP_REQUEST_STEP, decode_record
+from woodpecker.misc.hdrhistogram import HdrHistogram
+
+
+# Percentiles reported by default
+PERCENTILES = (50, 90, 99, 99.9)
+
+# Positions of the aggregated values in the compact records
+_STEP_URL = HTTP_REQUEST_STEP.index('url')
+_STEP_STATUS = HTTP_REQUEST_STEP.index('response_status')
+_STEP_ELAPSED = HTTP_REQUEST_STEP.index('elapsed')
+_STOPWATCH_NAME = END_STOPWATCH_EVENT.index('stopwatch_name')
+_STOPWATCH_DURATION = END_STOPWATCH_EVENT.index('duration')
+_ERROR_URL = HTTP_ERROR_EVENT.index('url')
+
+
+class Metric(object):
+    """
+    Streaming statistics of a stopwatch or URL: durations (in microseconds)
+    are counted in an HDR histogram for the whole run and in one for the
+    current second, closed into a rollup when the next second begins.
+    Only the last rollup_seconds rollups are kept
+    """
+    def __init__(self, rollup_seconds=300):
+        self.count = 0
+        self.errors = 0
+        self.histogram = HdrHistogram()
+        self.rollups = collections.deque(maxlen=rollup_seconds)
+        self._second = None
+        self._second_count = 0
+        self._second_errors = 0
+        self._second_histogram = HdrHistogram()
+
+    def record(self, second, duration=None, error=False):
+        # Records of seconds already closed (e.g. shipped late by a worker)
+        # are counted in the current one
+        if self._second is None:
+            self._second = second
+        elif second > self._second:
+            self._close_second(second)
+
+        self.count += 1
+        self._second_count += 1
+        if error:
+            self.errors += 1
+            self._second_errors += 1
+        if duration is not None:
+            self.histogram.record(duration)
+            self._second_histogram.record(duration)
+
+    def _close_second(self, next_second):
+        values = self._second_histogram.values_at_percentiles(PERCENTILES)
+        self.rollups.append({
+            'second': self._second,
+            'count': self._second_count,
+            'errors': self._second_errors,
+            'mean': self._second_histogram.mean(),
+            'max': self._second_histogram.max_value,
+            'percentiles': values
+        })
+        self._second = next_second
+        self._second_count = 0
+        self._second_errors = 0
+        self._second_histogram.reset()
+
+    def error_rate(self):
+        if self.count == 0:
+            return 0.0
+        return float(self.errors) / self.count
+
+    def summary(self, percentiles=PERCENTILES):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'error_rate': self.error_rate(),
+            'mean': self.histogram.mean(),
+            'min': self.histogram.min_value,
+            'max': self.histogram.max_value,
+            'percentiles': self.histogram.values_at_percentiles(percentiles)
+        }
+
+
+class StreamingAggregator(object):
+    """
+    Aggregates the log records as they are collected (see LogCollector),
+    keeping counts, error rates and duration histograms per stopwatch
+    and per URL, so that percentiles are available at any time during
+    the run without keeping the records.
+
+    Durations are in microseconds. URLs are keyed without their
+    query string; beyond max_urls, new URLs are counted
+    together under other_urls_key, so that memory stays bounded.
+
+    A request failing on its HTTP status logs both a step and an error
+    event: the error events matching a failed step of the same pecker
+    iteration are not counted again
+    """
+    other_urls_key = 'other'
+
+    def __init__(self, max_urls=1000, rollup_seconds=300):
+        self.max_urls = max_urls
+        self.rollup_seconds = rollup_seconds
+        self.stopwatches = {}
+        self.urls = {}
+        self.records = 0
+        # Per pecker, the (sequence, iteration) and the URL keys
+        # of the failed steps not yet matched by an error event
+        self._failed_steps = {}
+
+    def _metric(self, metrics, key, max_keys=0):
+        metric = metrics.get(key)
+        if metric is None:
+            if 0 < max_keys <= len(metrics):
+                key = self.other_urls_key
+                metric = metrics.get(key)
+            if metric is None:
+                metric = Metric(self.rollup_seconds)
+                metrics[key] = metric
+        return metric
+
+    @staticmethod
+    def url_key(url):
+        return url.split('?', 1)[0]
+
+    def write_batch(self, records):
+        for record in records:
+            if isinstance(record, six.binary_type):
+                record = msgpack.unpackb(record, raw=False)
+            # Compact records are read in place, other ones expanded
+            if isinstance(record, (list, tuple)) and \
+                    record[0] in (HTTP_REQUEST_STEP.tag,
+                                  END_STOPWATCH_EVENT.tag,
+                                  HTTP_ERROR_EVENT.tag):
+                self._add_compact(record)
+            else:
+                self._add(decode_record(record))
+            self.records += 1
+
+    def _add_compact(self, record):
+        int_second = record[1] // 1000000000
+        if record[0] == HTTP_REQUEST_STEP.tag:
+            self._add_step(int_second,
+                           record[_STEP_URL],
+                           record[_STEP_STATUS],
+                           record[_STEP_ELAPSED],
+                           record[2:5])
+        elif record[0] == END_STOPWATCH_EVENT.tag:
+            self._add_stopwatch(int_second,
+                                record[_STOPWATCH_NAME],
+                                record[_STOPWATCH_DURATION])
+        else:
+            self._add_error(int_second, record[_ERROR_URL], record[2:5])
+
+    def _add(self, record):
+        content = record.get('message_content')
+        if not isinstance(content, dict):
+            return
+        int_second = (record.get('timestamp') or 0) // 1000000000
+        origin = (record.get('pecker_id'),
+                  record.get('sequence'),
+                  record.get('iteration'))
+        if record.get('message_type') == 'step':
+            # Only HTTP requests have a URL and a status
+            step_content = content.get('step_content') or {}
+            if content.get('step_type') == HTTP_REQUEST_STEP.kind and \
+                    step_content.get('url') is not None:
+                self._add_step(int_second,
+                               step_content.get('url'),
+                               step_content.get('response_status'),
+                               step_content.get('elapsed'),
+                               origin)
+            return
+
+        event_content = content.get('event_content') or {}
+        if content.get('event_type') == 'end_stopwatch':
+            self._add_stopwatch(int_second,
+                                event_content.get('stopwatch_name'),
+                                event_content.get('duration'))
+        elif content.get('event_type') == 'error' and \
+                event_content.get('url') is not None:
+            self._add_error(int_second, event_content.get('url'), origin)
+
+    def _failed_urls(self, origin):
+        # Only the failed steps of the current iteration of the pecker
+        # are kept (resources failing on their status log no error event)
+        pecker_id, sequence, iteration = origin
+        failed_urls = self._failed_steps.get(pecker_id)
+        if failed_urls is None or failed_urls[0] != (sequence, iteration):
+            failed_urls = ((sequence, iteration), collections.Counter())
+            self._failed_steps[pecker_id] = failed_urls
+        return failed_urls[1]
+
+    def _add_step(self, second, url, status, elapsed, origin):
+        # Status is logged as "code reason" (anything else is an error),
+        # elapsed in milliseconds
+        try:
+            bool_error = int(status.split(' ', 1)[0]) >= 400
+        except (AttributeError, ValueError):
+            bool_error = True
+        str_key = self.url_key(url)
+        self._metric(self.urls, str_key, self.max_urls).record(
+            second,
+            int(elapsed * 1000) if elapsed is not None else None,
+            bool_error
+        )
+        if bool_error:
+            self._failed_urls(origin)[str_key] += 1
+
+    def _add_stopwatch(self, second, name, duration):
+        # Duration is logged in nanoseconds
+        self._metric(self.stopwatches, name).record(
+            second, duration // 1000 if duration is not None else None
+        )
+
+    def _add_error(self, second, url, origin):
+        # Requests failed before getting a response have no step
+        # (and no duration), the other ones are already counted
+        str_key = self.url_key(url)
+        failed_urls = self._failed_urls(origin)
+        if failed_urls[str_key] > 0:
+            failed_urls[str_key] -= 1
+            return
+        self._metric(self.urls, str_key, self.max_urls).record(
+            second, error=True
+        )
+
+    def percentiles(self, key, percentiles=PERCENTILES):
+        """
+        Returns the live percentiles (in microseconds) of a stopwatch name
+        or a URL key (see url_key)
+        """
+        metric = self.stopwatches.get(key) or self.urls.get(key)
+        if metric is None:
+            raise KeyError('No statistics for "{key}"'.format(key=key))
+        return metric.histogram.values_at_percentiles(percentiles)
+
+    def summary(self, percentiles=PERCENTILES):
+        return {
+            'stopwatches': dict(
+                (key, metric.summary(percentiles))
+                for key, metric in six.iteritems(self.stopwatches)
+            ),
+            'urls': dict(
+                (key, metric.summary(percentiles))
+                for key, metric in six.iteritems(self.urls)
+            )
+        }
@@ -0,0 +1,168 @@
+import logging
+
+import gevent
+import six
+
+from woodpecker.misc.functions import monotonic
+
+
+def drain_queue(log_queue, max_entries=0):
+    """
+    Removes and returns all the records of the queue (at most max_entries,
+    if greater than 0) without blocking. Standard queues are drained
+    in bulk under their lock, instead of one get at a time
+
+    :return: the list of the drained records
+    """
+    if hasattr(log_queue, 'mutex'):
+        with log_queue.mutex:
+            queued = log_queue.queue
+            if max_entries <= 0 or max_entries >= len(queued):
+                batch = list(queued)
+                queued.clear()
+            else:
+                batch = [queued.popleft() for _ in range(max_entries)]
+            if len(batch) > 0:
+                log_queue.not_full.notify_all()
+        return batch
+
+    batch = []
+    try:
+        while max_entries <= 0 or len(batch) < max_entries:
+            batch.append(log_queue.get_nowait())
+    except six.moves.queue.Empty:
+        pass
+    return batch
+
+
+def mark_done(log_queue, count):
+    """
+    Marks count drained records as done, waking up the log_queue.join
+    callers once all the records have been handled
+    """
+    if count == 0:
+        return
+    if hasattr(log_queue, 'all_tasks_done'):
+        with log_queue.all_tasks_done:
+            log_queue.unfinished_tasks = \
+                max(log_queue.unfinished_tasks - count, 0)
+            if log_queue.unfinished_tasks == 0:
+                log_queue.all_tasks_done.notify_all()
+    elif hasattr(log_queue, 'task_done'):
+        for _ in range(count):
+            log_queue.task_done()
+
+
+class LogCollector(object):
+    """
+    Greenlet draining the log queue in batches and handing them to the
+    aggregator (if any, see StreamingAggregator) and to the sinks.
+    A batch is flushed as soon as it holds max_entries_before_flush
+    records or its oldest record has waited max_interval_before_flush
+    seconds (0 disables either bound).
+
+    Records are marked as done on the queue only once written, so that
+    log_queue.join() waits for them to reach the sinks. When the log queue
+    is bounded (see the max_pending_entries setting), sinks falling
+    behind block the producers (backpressure)
+    """
+    def __init__(self,
+                 log_queue,
+                 sinks,
+                 settings,
+                 polling_interval=0.1,
+                 aggregator=None):
+        self.log_queue = log_queue
+        self.sinks = tuple(sinks)
+        self.aggregator = aggregator
+        self.max_entries = settings['logging']['max_entries_before_flush']
+        self.max_interval = settings['logging']['max_interval_before_flush']
+        self.polling_interval = polling_interval
+
+        # Counters
+        self.batches = 0
+        self.records = 0
+
+        self._running = False
+        self._greenlet = None
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def start(self):
+        for sink in self.sinks:
+            sink.open()
+        self._running = True
+        self._greenlet = gevent.spawn(self._run)
+
+    def stop(self, timeout=None):
+        """
+        Flushes the records still queued and closes the sinks
+        """
+        self._running = False
+        if self._greenlet is not None:
+            self._greenlet.join(timeout)
+            self._greenlet = None
+
+    def is_running(self):
+        return self._greenlet is not None and not self._greenlet.dead
+
+    def _room(self, batch):
+        # Records still fitting in the batch (0 means no limit)
+        if self.max_entries > 0:
+            return self.max_entries - len(batch)
+        return 0
+
+    def _run(self):
+        batch = []
+        dbl_deadline = None
+        try:
+            while self._running:
+                # The queue is polled without blocking, so that the
+                # collector works with any kind of queue
+                records = drain_queue(self.log_queue, self._room(batch))
+                if len(records) > 0:
+                    batch.extend(records)
+                    if dbl_deadline is None:
+                        dbl_deadline = monotonic() + self.max_interval
+
+                if len(batch) > 0 and (0 < self.max_entries <= len(batch) or
+                                       monotonic() >= dbl_deadline):
+                    self._flush(batch)
+                    batch = []
+                    dbl_deadline = None
+                    # Let the producers run before draining again
+                    gevent.sleep(0)
+                elif dbl_deadline is not None:
+                    gevent.sleep(min(self.polling_interval,
+                                     max(dbl_deadline - monotonic(), 0.0)))
+                else:
+                    gevent.sleep(self.polling_interval)
+
+            # Stopped: flush everything left
+            batch.extend(drain_queue(self.log_queue))
+            while len(batch) > 0:
+                int_size = self.max_entries if self.max_entries > 0 \
+                    else len(batch)
+                self._flush(batch[:int_size])
+                batch = batch[int_size:]
+        finally:
+            for sink in self.sinks:
+                sink.close()
+
+    def _flush(self, batch):
+        # Aggregated first, so that live statistics are never late
+        writers = (self.aggregator,) if self.aggregator is not None \
+            else tuple()
+        for writer in writers + self.sinks:
+            try:
+                writer.write_batch(batch)
+            except Exception as error:
+                # A failing sink (or aggregator) must not stop the collection
+                self._logger.error(
+                    '{writer} failed to write {records} records: '
+                    '{error}'.format(writer=writer.__class__.__name__,
+                                     records=len(batch),
+                                     error=str(error))
+                )
+        self.batches += 1
+        self.records += len(batch)
+        mark_done(self.log_queue, len(batch))
@@ -0,0 +1,219 @@
+import msgpack
+import six
+
+
+class RecordSchema(object):
+    """
+    Fixed field order of a kind of log record (e.g. the http_request steps
+    or the start_stopwatch events).
+
+    Compact records are tuples of the integer tag of their schema,
+    the common fields and the values in schema order:
+    (tag, timestamp, pecker_id, sequence, iteration, values...)
+    """
+    __slots__ = ('tag', 'message_type', 'kind', 'kind_key', 'content_key',
+                 'outer_fields', 'fields', 'interned_fields', '_field_set')
+
+    def __init__(self,
+                 tag,
+                 message_type,
+                 kind,
+                 fields,
+                 outer_fields=tuple(),
+                 interned_fields=tuple()):
+        self.tag = tag
+        self.message_type = message_type
+        self.kind = kind
+        self.kind_key = '{message_type}_type'.format(message_type=message_type)
+        self.content_key = '{message_type}_content'.format(
+            message_type=message_type
+        )
+        # Fields of the message content, outside the step or event content
+        self.outer_fields = tuple(outer_fields)
+        self.fields = tuple(fields)
+        # Low cardinality fields, interned when decoded
+        self.interned_fields = tuple(
+            len(self.outer_fields) + self.fields.index(field)
+            for field in interned_fields
+        )
+        self._field_set = frozenset(self.fields)
+
+    def __repr__(self):
+        return 'RecordSchema({tag}, {message_type!r}, {kind!r})'.format(
+            tag=self.tag, message_type=self.message_type, kind=self.kind
+        )
+
+    def matches(self, message_content):
+        """
+        Returns whether the message content has exactly the schema fields,
+        so that it survives the round trip
+        """
+        content = message_content.get(self.content_key)
+        return isinstance(content, dict) and \
+            len(message_content) == len(self.outer_fields) + 2 and \
+            all(field in message_content for field in self.outer_fields) and \
+            six.viewkeys(content) == self._field_set
+
+    def index(self, field):
+        """
+        Returns the position of a field (or outer field)
+        in the compact records of the schema
+        """
+        if field in self.outer_fields:
+            return 5 + self.outer_fields.index(field)
+        return 5 + len(self.outer_fields) + self.fields.index(field)
+
+    def values(self, message_content):
+        content = message_content[self.content_key]
+        return tuple(message_content[field] for field in self.outer_fields) + \
+            tuple(content[field] for field in self.fields)
+
+    def content(self, values):
+        """
+        Returns the message content (in the dict format) of the values
+        """
+        int_outer = len(self.outer_fields)
+        message_content = {self.kind_key: self.kind}
+        for field, value in zip(self.outer_fields, values):
+            message_content[field] = value
+        message_content[self.content_key] = dict(
+            zip(self.fields, values[int_outer:])
+        )
+        return message_content
+
+
+class SchemaRegistry(object):
+    """
+    Registry of the compact record schemas. Tags are assigned in
+    registration order, so producers and consumers of the records
+    must register the same schemas in the same order.
+
+    Tag 0 is reserved for the records of kinds not registered,
+    stored as (0, timestamp, pecker_id, sequence, iteration,
+    message_type, message_content)
+    """
+    generic_tag = 0
+
+    def __init__(self):
+        self._by_tag = [None]
+        self._by_kind = {}
+
+    def __len__(self):
+        return len(self._by_tag) - 1
+
+    def register(self, message_type, kind, fields, outer_fields=tuple(),
+                 interned_fields=tuple()):
+        key = (message_type, kind)
+        if key in self._by_kind:
+            raise ValueError(
+                'Schema for {message_type} "{kind}" already registered'.format(
+                    message_type=message_type, kind=kind
+                )
+            )
+        schema = RecordSchema(len(self._by_tag), message_type, kind, fields,
+                              outer_fields, interned_fields)
+        self._by_tag.append(schema)
+        self._by_kind[key] = schema
+        return schema
+
+    def by_tag(self, tag):
+        return self._by_tag[tag]
+
+    def by_kind(self, message_type, kind):
+        return self._by_kind.get((message_type, kind))
+
+    def compact(self,
+                message_type,
+                timestamp,
+                pecker_id,
+                sequence,
+                iteration,
+                message_content):
+        """
+        Returns the compact record of a message
+        """
+        schema = None
+        if isinstance(message_content, dict):
+            schema = self._by_kind.get((
+                message_type,
+                message_content.get(
+                    '{message_type}_type'.format(message_type=message_type)
+                )
+            ))
+        if schema is not None and schema.matches(message_content):
+            return (schema.tag, timestamp, pecker_id, sequence, iteration) + \
+                schema.values(message_content)
+        return (self.generic_tag, timestamp, pecker_id, sequence, iteration,
+                message_type, message_content)
+
+    def expand(self, record):
+        """
+        Returns the dict format of a record, as logged by log():
+        compact records (as tuples or msgpack arrays) are expanded,
+        msgpack-encoded records unpacked and dicts returned as they are
+        """
+        if isinstance(record, six.binary_type):
+            record = msgpack.unpackb(record, raw=False)
+        if isinstance(record, dict):
+            return record
+
+        int_tag, timestamp, pecker_id, sequence, iteration = record[:5]
+        if isinstance(pecker_id, str):
+            pecker_id = six.moves.intern(pecker_id)
+        if isinstance(sequence, str):
+            sequence = six.moves.intern(sequence)
+        if int_tag == self.generic_tag:
+            message_type, message_content = record[5:]
+        else:
+            schema = self._by_tag[int_tag]
+            values = list(record[5:])
+            for int_index in schema.interned_fields:
+                if isinstance(values[int_index], str):
+                    values[int_index] = six.moves.intern(values[int_index])
+            message_type = schema.message_type
+            message_content = schema.content(values)
+        return {
+            'message_type': message_type,
+            'timestamp': timestamp,
+            'pecker_id': pecker_id,
+            'sequence': sequence,
+            'iteration': iteration,
+            'message_content': message_content
+        }
+
+
+# Schemas of the records logged by woodpecker itself
+schemas = SchemaRegistry()
+
+HTTP_REQUEST_STEP = schemas.register(
+    'step', 'http_request',
+    outer_fields=('active_stopwatches',),
+    fields=('url', 'method', 'body', 'headers', 'response_url',
+            'response_status', 'response_size', 'elapsed', 'async'),
+    interned_fields=('method', 'response_status')
+)
+START_STOPWATCH_EVENT = schemas.register(
+    'event', 'start_stopwatch',
+    fields=('stopwatch_name', 'timestamp'),
+    interned_fields=('stopwatch_name',)
+)
+END_STOPWATCH_EVENT = schemas.register(
+    'event', 'end_stopwatch',
+    fields=('stopwatch_name', 'timestamp', 'duration'),
+    interned_fields=('stopwatch_name',)
+)
+HTTP_ERROR_EVENT = schemas.register(
+    'event', 'error',
+    fields=('sequence', 'iteration', 'pecker_id', 'url', 'error')
+)
+POOL_STATISTICS_EVENT = schemas.register(
+    'event', 'connection_pool_statistics',
+    fields=('hits', 'misses', 'waits', 'wait_time', 'max_wait_time')
+)
+
+
+def decode_record(record):
+    """
+    Returns the dict format of a record in any of the logged formats
+    """
+    return schemas.expand(record)
@@ -0,0 +1,195 @@
+import sys
+import threading
+
+import requests
+import six
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.connectionpool import HTTPConnectionPool, \
+    HTTPSConnectionPool
+from requests.packages.urllib3.poolmanager import PoolManager
+
+from woodpecker.misc.functions import monotonic
+
+
+class PoolStatistics(object):
+    """
+    Connection pool counters: hits (reused connections), misses (new
+    connections opened) and time spent waiting for a free connection
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def __repr__(self):
+        return '{classname} - {hits} hits - {misses} misses - ' \
+               '{waits} waits'.format(classname=self.__class__.__name__,
+                                      hits=self.hits,
+                                      misses=self.misses,
+                                      waits=self.waits)
+
+    def record_connection(self, reused):
+        if reused:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def record_wait(self, wait_time):
+        if wait_time > 0.0005:
+            self.waits += 1
+        self.wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+
+    def as_dict(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'waits': self.waits,
+            'wait_time': self.wait_time,
+            'max_wait_time': self.max_wait_time
+        }
+
+    def reset(self):
+        self.__init__()
+
+
+class _InstrumentedPoolMixin(object):
+    # Set by the pool manager when the pool is created
+    statistics = None
+
+    def _get_conn(self, timeout=None):
+        conn = super(_InstrumentedPoolMixin, self)._get_conn(timeout=timeout)
+        if self.statistics is not None:
+            # Brand new (or dropped and reset) connections have no socket yet
+            self.statistics.record_connection(
+                getattr(conn, 'sock', None) is not None
+            )
+        return conn
+
+
+class InstrumentedHTTPConnectionPool(_InstrumentedPoolMixin,
+                                     HTTPConnectionPool):
+    pass
+
+
+class InstrumentedHTTPSConnectionPool(_InstrumentedPoolMixin,
+                                      HTTPSConnectionPool):
+    pass
+
+
+class InstrumentedPoolManager(PoolManager):
+    def __init__(self, statistics, **kwargs):
+        super(InstrumentedPoolManager, self).__init__(**kwargs)
+        self.statistics = statistics
+        self.pool_classes_by_scheme = {
+            'http': InstrumentedHTTPConnectionPool,
+            'https': InstrumentedHTTPSConnectionPool
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super(InstrumentedPoolManager, self)._new_pool(
+            scheme, host, port, request_context=request_context
+        )
+        pool.statistics = self.statistics
+        return pool
+
+
+class PoolAdapter(HTTPAdapter):
+    """
+    HTTP adapter with a per-host limit of concurrent connections
+    (as browsers do) and connection pool statistics.
+
+    The limit is enforced with a semaphore per host instead of a blocking
+    urllib3 pool, so that waiting requests yield to the other greenlets
+    """
+    def __init__(self,
+                 pool_connections=10,
+                 max_connections_per_host=6,
+                 max_retries=0):
+        # Statistics must exist before the pool manager is initialized
+        self.statistics = PoolStatistics()
+        self.max_connections_per_host = max_connections_per_host
+        self._host_semaphores = {}
+        # A limit of 0 disables the per-host limit (default pool size)
+        super(PoolAdapter, self).__init__(
+            pool_connections=pool_connections,
+            pool_maxsize=max_connections_per_host or 10,
+            max_retries=max_retries
+        )
+
+    def init_poolmanager(self, connections, maxsize, block=False,
+                         **pool_kwargs):
+        # Save these values for pickling (as the base adapter does)
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+
+        self.poolmanager = InstrumentedPoolManager(self.statistics,
+                                                   num_pools=connections,
+                                                   maxsize=maxsize,
+                                                   block=block,
+                                                   **pool_kwargs)
+
+    def _host_semaphore(self, url):
+        str_host = six.moves.urllib.parse.urlsplit(url).netloc
+        semaphore = self._host_semaphores.get(str_host)
+        if semaphore is None:
+            # Greenlets must wait on a cooperative semaphore
+            if 'gevent' in sys.modules:
+                import gevent.lock
+                semaphore = gevent.lock.BoundedSemaphore(
+                    self.max_connections_per_host
+                )
+            else:
+                semaphore = threading.BoundedSemaphore(
+                    self.max_connections_per_host
+                )
+            self._host_semaphores[str_host] = semaphore
+        return semaphore
+
+    def send(self, request, **kwargs):
+        if self.max_connections_per_host <= 0:
+            return super(PoolAdapter, self).send(request, **kwargs)
+
+        semaphore = self._host_semaphore(request.url)
+        dbl_start = monotonic()
+        semaphore.acquire()
+        self.statistics.record_wait(monotonic() - dbl_start)
+        try:
+            response = super(PoolAdapter, self).send(request, **kwargs)
+            # The connection goes back to the pool only once the body
+            # has been read, so read it while still holding the slot
+            if not kwargs.get('stream', False):
+                response.content
+            return response
+        finally:
+            semaphore.release()
+
+
+def mount_pool_adapter(session, settings):
+    """
+    Mounts a PoolAdapter sized by the given HTTP settings on the session
+
+    :return: the mounted adapter
+    """
+    adapter = PoolAdapter(
+        pool_connections=settings['http']['max_pooled_hosts'],
+        max_connections_per_host=settings['http']['max_connections_per_host']
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return adapter
+
+
+def pool_statistics(session):
+    """
+    Returns the statistics of the PoolAdapter mounted on the session,
+    or None if no such adapter is mounted
+    """
+    try:
+        adapter = session.get_adapter('http://')
+    except requests.exceptions.InvalidSchema:
+        return None
+    return getattr(adapter, 'statistics', None)
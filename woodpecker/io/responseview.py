@@ -0,0 +1,101 @@
+import json
+
+import six
+
+
+class ResponseView(object):
+    """
+    Lazy view of a response shared by all the hooks run on it:
+    the body is decoded (or parsed), the headers joined and the 'all'
+    string built at most once, and only when a hook asks for them
+    """
+    # Attribute caching the view on the response object
+    _attribute_name = '_woodpecker_view'
+
+    def __init__(self, response):
+        self.response = response
+        self._text = None
+        self._headers_text = None
+        self._all_text = None
+        self._json = None
+        self._html_tree = None
+
+    @classmethod
+    def of(cls, response):
+        """
+        Returns the view of the response, creating it on the first call
+        """
+        view = getattr(response, cls._attribute_name, None)
+        if view is None:
+            view = cls(response)
+            setattr(response, cls._attribute_name, view)
+        return view
+
+    @property
+    def encoding(self):
+        # Responses of unknown content type may have no encoding at all
+        return self.response.encoding or 'utf-8'
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = self.response.content.decode(self.encoding)
+        return self._text
+
+    @property
+    def headers_text(self):
+        if self._headers_text is None:
+            self._headers_text = '\n'.join(
+                [': '.join((str(key), str(value)))
+                 for key, value in six.iteritems(self.response.headers)]
+            )
+        return self._headers_text
+
+    @property
+    def all_text(self):
+        if self._all_text is None:
+            self._all_text = '\n'.join((self.response.url,
+                                        self.headers_text,
+                                        self.text))
+        return self._all_text
+
+    def json(self):
+        """
+        Returns the body parsed as JSON, parsing it on the first call
+        """
+        if self._json is None:
+            self._json = (json.loads(self.text),)
+        return self._json[0]
+
+    def html_tree(self):
+        """
+        Returns the lxml tree of the body, parsing it on the first call.
+
+        It requires the lxml library
+        (installed with the woodpecker[html] extra)
+        """
+        if self._html_tree is None:
+            import lxml.html
+
+            self._html_tree = lxml.html.document_fromstring(
+                self.response.content,
+                parser=lxml.html.HTMLParser(encoding=self.encoding)
+            )
+        return self._html_tree
+
+    def target(self, name):
+        """
+        Returns the part of the response to be searched
+
+        :param name: url, body, headers or all (any other name
+                     returns the raw body)
+        """
+        if name == 'body':
+            return self.text
+        elif name == 'url':
+            return self.response.url
+        elif name == 'headers':
+            return self.headers_text
+        elif name == 'all':
+            return self.all_text
+        return self.response.content
@@ -0,0 +1,39 @@
+import abc
+
+from woodpecker.io.logrecords import decode_record
+
+
+class BaseSink(object):
+    """
+    Destination of the log records drained by the LogCollector.
+    Records are handed over in batches, as they were put on the log queue
+    (compact and msgpack-encoded, depending on the settings, see decode)
+    """
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self, settings):
+        self.settings = settings
+
+    @staticmethod
+    def decode(record):
+        """
+        Returns the dict format of a log record, whatever its format
+        """
+        return decode_record(record)
+
+    def open(self):
+        """Called by the collector before the first batch"""
+        pass
+
+    @abc.abstractmethod
+    def write_batch(self, records):
+        """
+        Writes a batch of log records. The collector does not drain
+        the log queue while a batch is being written, so a slow sink
+        slows the producers down instead of piling up records in memory
+        """
+        pass
+
+    def close(self):
+        """Called by the collector after the last batch"""
+        pass
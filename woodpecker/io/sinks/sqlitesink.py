@@ -0,0 +1,221 @@
+import json
+import sqlite3
+
+import six
+
+from woodpecker.io.sinks.basesink import BaseSink
+
+
+# Timestamps and durations are integer nanoseconds (see Clock)
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS steps (
+        id INTEGER PRIMARY KEY,
+        timestamp INTEGER,
+        pecker_id TEXT,
+        sequence TEXT,
+        iteration INTEGER,
+        step_type TEXT,
+        method TEXT,
+        url TEXT,
+        response_url TEXT,
+        status_code INTEGER,
+        reason TEXT,
+        response_size INTEGER,
+        elapsed REAL,
+        async INTEGER,
+        content TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS step_stopwatches (
+        step_id INTEGER NOT NULL,
+        stopwatch TEXT NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS stopwatches (
+        id INTEGER PRIMARY KEY,
+        pecker_id TEXT,
+        sequence TEXT,
+        iteration INTEGER,
+        name TEXT,
+        start INTEGER,
+        end INTEGER,
+        duration INTEGER
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY,
+        timestamp INTEGER,
+        pecker_id TEXT,
+        sequence TEXT,
+        iteration INTEGER,
+        event_type TEXT,
+        content TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS errors (
+        id INTEGER PRIMARY KEY,
+        timestamp INTEGER,
+        pecker_id TEXT,
+        sequence TEXT,
+        iteration INTEGER,
+        url TEXT,
+        message TEXT
+    )
+    '''
+)
+
+# Created at the end of the run, so that inserts never update them
+INDEXES = (
+    'CREATE INDEX IF NOT EXISTS steps_url ON steps (url)',
+    'CREATE INDEX IF NOT EXISTS steps_pecker ON steps (pecker_id, iteration)',
+    'CREATE INDEX IF NOT EXISTS step_stopwatches_step '
+    'ON step_stopwatches (step_id)',
+    'CREATE INDEX IF NOT EXISTS step_stopwatches_stopwatch '
+    'ON step_stopwatches (stopwatch)',
+    'CREATE INDEX IF NOT EXISTS stopwatches_name ON stopwatches (name)',
+    'CREATE INDEX IF NOT EXISTS events_type ON events (event_type)',
+    'CREATE INDEX IF NOT EXISTS errors_pecker ON errors (pecker_id, iteration)'
+)
+
+INSERT_STEP = 'INSERT INTO steps VALUES ' \
+              '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+INSERT_STEP_STOPWATCH = 'INSERT INTO step_stopwatches VALUES (?, ?)'
+INSERT_STOPWATCH = 'INSERT INTO stopwatches ' \
+                   '(pecker_id, sequence, iteration, name, start, end, ' \
+                   'duration) VALUES (?, ?, ?, ?, ?, ?, ?)'
+INSERT_EVENT = 'INSERT INTO events ' \
+               '(timestamp, pecker_id, sequence, iteration, event_type, ' \
+               'content) VALUES (?, ?, ?, ?, ?, ?)'
+INSERT_ERROR = 'INSERT INTO errors ' \
+               '(timestamp, pecker_id, sequence, iteration, url, message) ' \
+               'VALUES (?, ?, ?, ?, ?, ?)'
+
+
+class SqliteSink(BaseSink):
+    """
+    Writes the log records to the SQLite results file, in WAL mode.
+    Each batch is inserted in a single transaction, with one executemany
+    per table, and the indexes are created only when the sink is closed.
+
+    Stopwatches are stored once ended, with the duration they logged
+    """
+    def __init__(self, settings, results_file=None):
+        super(SqliteSink, self).__init__(settings)
+        self.results_file = results_file or \
+            settings['logging']['results_file']
+        self.connection = None
+        self._next_step_id = 1
+
+    def open(self):
+        self.connection = sqlite3.connect(self.results_file)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            for str_statement in SCHEMA:
+                self.connection.execute(str_statement)
+        # Steps ids are assigned here, to link them to their stopwatches
+        self._next_step_id = self.connection.execute(
+            'SELECT COALESCE(MAX(id), 0) + 1 FROM steps'
+        ).fetchone()[0]
+
+    def write_batch(self, records):
+        steps = []
+        step_stopwatches = []
+        stopwatches = []
+        events = []
+        errors = []
+        for record in records:
+            record = self.decode(record)
+            context = (record.get('timestamp'),
+                       record.get('pecker_id'),
+                       record.get('sequence'),
+                       record.get('iteration'))
+            content = record.get('message_content') or {}
+            if record.get('message_type') == 'step':
+                steps.append(self._step_row(context, content))
+                for str_stopwatch in content.get('active_stopwatches', ()):
+                    step_stopwatches.append((self._next_step_id,
+                                             str_stopwatch))
+                self._next_step_id += 1
+                continue
+
+            str_event_type = content.get('event_type')
+            event_content = content.get('event_content') or {}
+            if str_event_type == 'start_stopwatch':
+                # Stopwatches are stored when ended
+                continue
+            elif str_event_type == 'end_stopwatch':
+                int_end = event_content.get('timestamp')
+                int_duration = event_content.get('duration')
+                # Incomplete stopwatches are stored without a start,
+                # not to fail the whole batch
+                int_start = None
+                if isinstance(int_end, six.integer_types) and \
+                        isinstance(int_duration, six.integer_types):
+                    int_start = int_end - int_duration
+                stopwatches.append(context[1:] + (
+                    event_content.get('stopwatch_name'),
+                    int_start,
+                    int_end,
+                    int_duration
+                ))
+            elif str_event_type == 'error':
+                errors.append(context + (
+                    event_content.get('url'),
+                    event_content.get('error') or
+                    event_content.get('message')
+                ))
+            else:
+                events.append(context + (
+                    str_event_type,
+                    json.dumps(event_content, default=str)
+                ))
+
+        with self.connection:
+            for str_statement, rows in ((INSERT_STEP, steps),
+                                        (INSERT_STEP_STOPWATCH,
+                                         step_stopwatches),
+                                        (INSERT_STOPWATCH, stopwatches),
+                                        (INSERT_EVENT, events),
+                                        (INSERT_ERROR, errors)):
+                if len(rows) > 0:
+                    self.connection.executemany(str_statement, rows)
+
+    def _step_row(self, context, content):
+        step_content = dict(content.get('step_content') or {})
+        int_status_code = None
+        str_reason = None
+        str_status = step_content.pop('response_status', None)
+        if str_status:
+            str_code, _, str_reason = str_status.partition(' ')
+            if str_code.isdigit():
+                int_status_code = int(str_code)
+        url = step_content.pop('url', None)
+        return (self._next_step_id,) + context + (
+            content.get('step_type'),
+            step_content.pop('method', None),
+            url,
+            step_content.pop('response_url', None),
+            int_status_code,
+            str_reason,
+            step_content.pop('response_size', None),
+            step_content.pop('elapsed', None),
+            step_content.pop('async', None),
+            # Anything else (as the request headers) is kept as JSON
+            json.dumps(step_content, default=str)
+        )
+
+    def close(self):
+        if self.connection is None:
+            return
+        with self.connection:
+            for str_statement in INDEXES:
+                self.connection.execute(str_statement)
+        self.connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        self.connection.close()
+        self.connection = None
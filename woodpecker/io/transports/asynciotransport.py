@@ -0,0 +1,171 @@
+import asyncio
+import os
+import ssl
+import threading
+
+from woodpecker.io.pooladapter import PoolStatistics
+from woodpecker.io.transports.basetransport import WireTransport, wait_future
+from woodpecker.io.transports.http11 import ResponseParser, serialize_request
+from woodpecker.misc.functions import monotonic
+
+
+class AsyncioTransport(WireTransport):
+    """
+    HTTP/1.1 transport running on a single asyncio event loop, shared by
+    all the peckers of the process and driven by a dedicated thread.
+
+    The calling pecker waits for the result cooperatively (see wait_future),
+    so any number of greenlet peckers can share the loop.
+
+    It requires Python 3.5 or later
+    """
+    _loop = None
+    _loop_thread = None
+    _loop_lock = threading.Lock()
+    # Process owning the loop: forked children start their own one,
+    # since the thread driving the inherited loop does not exist there
+    _loop_pid = None
+
+    def __init__(self, settings):
+        super(AsyncioTransport, self).__init__(settings)
+        self.statistics = PoolStatistics()
+        self.max_connections_per_host = \
+            settings['http']['max_connections_per_host']
+        # Idle keep-alive connections and slot semaphores, by host
+        self._idle_connections = {}
+        self._host_semaphores = {}
+
+    @classmethod
+    def event_loop(cls):
+        """
+        Returns the event loop shared by all the transports,
+        starting it on the first call
+        """
+        if cls._loop_pid != os.getpid():
+            # Only the forking thread survives, so no one holds the lock
+            cls._loop_lock = threading.Lock()
+            cls._loop = None
+            cls._loop_thread = None
+            cls._loop_pid = os.getpid()
+        with cls._loop_lock:
+            if cls._loop is None:
+                cls._loop = asyncio.new_event_loop()
+                cls._loop_thread = threading.Thread(
+                    target=cls._loop.run_forever,
+                    name='woodpecker-asyncio-transport'
+                )
+                cls._loop_thread.daemon = True
+                cls._loop_thread.start()
+        return cls._loop
+
+    def pool_statistics(self):
+        return self.statistics
+
+    def _exchange(self, wire_request, wire_headers):
+        future = asyncio.run_coroutine_threadsafe(
+            self.exchange_async(wire_request, wire_headers),
+            self.event_loop()
+        )
+        return wait_future(future)
+
+    def _host_semaphore(self, key):
+        semaphore = self._host_semaphores.get(key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_connections_per_host)
+            self._host_semaphores[key] = semaphore
+        return semaphore
+
+    async def exchange_async(self, wire_request, wire_headers):
+        key = wire_request.key
+        semaphore = None
+        if self.max_connections_per_host > 0:
+            semaphore = self._host_semaphore(key)
+            dbl_start = monotonic()
+            await semaphore.acquire()
+            self.statistics.record_wait(monotonic() - dbl_start)
+        try:
+            return await asyncio.wait_for(
+                self._round_trip(key,
+                                 wire_request.method,
+                                 wire_request.host,
+                                 wire_request.target,
+                                 wire_headers,
+                                 wire_request.body,
+                                 wire_request.verify),
+                wire_request.timeout
+            )
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+    async def _open_connection(self, key, verify):
+        str_scheme, str_host, int_port = key
+        if str_scheme == 'http+unix':
+            return await asyncio.open_unix_connection(str_host)
+        ssl_context = None
+        if str_scheme == 'https':
+            ssl_context = ssl.create_default_context()
+            if not verify:
+                ssl_context.check_hostname = False
+                ssl_context.verify_mode = ssl.CERT_NONE
+        return await asyncio.open_connection(str_host, int_port,
+                                             ssl=ssl_context)
+
+    async def _round_trip(self, key, method, host, target, headers, body,
+                          verify):
+        bytes_request = serialize_request(method, host, target, headers, body)
+        idle_connections = self._idle_connections.setdefault(key, [])
+        bool_reused = len(idle_connections) > 0
+        while True:
+            if bool_reused and len(idle_connections) > 0:
+                reader, writer = idle_connections.pop()
+            else:
+                bool_reused = False
+                reader, writer = await self._open_connection(key, verify)
+            self.statistics.record_connection(bool_reused)
+
+            parser = ResponseParser()
+            parser.expect(method)
+            responses = []
+            bool_received = False
+            try:
+                writer.write(bytes_request)
+                await writer.drain()
+                while len(responses) == 0:
+                    data = await reader.read(65536)
+                    if not data:
+                        responses = parser.feed_eof()
+                        if len(responses) == 0:
+                            raise IOError('Connection closed by the server')
+                        writer.close()
+                        return responses[0]
+                    bool_received = True
+                    responses = parser.feed(data)
+            except (IOError, OSError):
+                writer.close()
+                # A stale keep-alive connection is retried on a new one
+                if bool_reused and not bool_received:
+                    bool_reused = False
+                    continue
+                raise
+            except BaseException:
+                # Timed out or cancelled in the middle of the response
+                writer.close()
+                raise
+
+            if responses[0].keep_alive():
+                idle_connections.append((reader, writer))
+            else:
+                writer.close()
+            return responses[0]
+
+    def close(self):
+        connections = [
+            writer
+            for idle_connections in self._idle_connections.values()
+            for _, writer in idle_connections
+        ]
+        self._idle_connections = {}
+        if self._loop is not None and self._loop_pid == os.getpid():
+            for writer in connections:
+                self._loop.call_soon_threadsafe(writer.close)
@@ -0,0 +1,504 @@
+import abc
+import base64
+import contextlib
+import datetime
+import json
+import socket
+import sys
+
+import requests
+import requests.cookies
+import six
+
+from woodpecker.misc.functions import monotonic
+
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 30
+
+
+def wait_future(future):
+    """
+    Waits for a concurrent future completed by another thread.
+    Under gevent only the calling greenlet waits, while the others
+    keep running, so peckers need no monkey patching to run concurrently
+    """
+    gevent = sys.modules.get('gevent')
+    if gevent is None or future.done():
+        return future.result()
+
+    import gevent.hub
+    watcher = gevent.get_hub().loop.async_()
+    waiter = gevent.hub.Waiter()
+    watcher.start(waiter.switch, None)
+    state = {'waiting': True}
+
+    def _wake_up(_):
+        # The watcher may be already closed if the greenlet has been killed
+        if state['waiting']:
+            watcher.send()
+    try:
+        future.add_done_callback(_wake_up)
+        waiter.get()
+    finally:
+        state['waiting'] = False
+        watcher.close()
+    return future.result()
+
+
+@contextlib.contextmanager
+def transport_errors():
+    # Socket errors are raised as the requests ones, as sequences expect
+    try:
+        yield
+    except socket.timeout as error:
+        raise requests.exceptions.Timeout(error)
+    except (IOError, OSError) as error:
+        raise requests.exceptions.ConnectionError(error)
+
+
+def connection_key(url_parts):
+    """
+    Returns the (scheme, host, port) tuple identifying the connections
+    to the URL. For http+unix URLs the host is the (percent-encoded)
+    path of the socket and the port is None
+    """
+    if url_parts.scheme == 'http+unix':
+        return ('http+unix',
+                six.moves.urllib.parse.unquote(url_parts.netloc),
+                None)
+    return (url_parts.scheme,
+            url_parts.hostname,
+            url_parts.port or (443 if url_parts.scheme == 'https' else 80))
+
+
+def dispatch_hooks(hooks, response):
+    # Same semantics of requests: a hook may replace the response
+    for hook in (hooks or {}).get('response', []):
+        obj_result = hook(response)
+        if obj_result is not None:
+            response = obj_result
+    return response
+
+
+class Headers(dict):
+    """
+    Plain dict of headers with case-insensitive lookups.
+    The lower case index is only built on the first lookup by a name
+    not matching the stored one
+    """
+    def __init__(self, *args, **kwargs):
+        super(Headers, self).__init__(*args, **kwargs)
+        self._lower_keys = None
+
+    def _lower_key(self, key):
+        if self._lower_keys is None:
+            self._lower_keys = dict(
+                (str_key.lower(), str_key) for str_key in self.keys()
+            )
+        return self._lower_keys.get(key.lower(), key)
+
+    def __getitem__(self, key):
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        return dict.__getitem__(self, self._lower_key(key))
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or \
+            dict.__contains__(self, self._lower_key(key))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    @classmethod
+    def from_list(cls, headers):
+        # Repeated headers are joined (as requests does)
+        obj_headers = cls()
+        for name, value in headers:
+            if dict.__contains__(obj_headers, name):
+                value = ', '.join((dict.__getitem__(obj_headers, name),
+                                   value))
+            dict.__setitem__(obj_headers, name, value)
+        return obj_headers
+
+
+class CookieHeaders(object):
+    """
+    Exposes the (name, value) response headers as the message read by the
+    cookie jars (get_all on Python 3, getheaders on Python 2)
+    """
+    def __init__(self, headers):
+        self.headers = headers
+
+    def get_all(self, name, default=None):
+        str_name = name.lower()
+        list_values = [value for header_name, value in self.headers
+                       if header_name.lower() == str_name]
+        return list_values or default
+
+    def getheaders(self, name):
+        return self.get_all(name, [])
+
+
+class TransportRequest(object):
+    def __init__(self, method, url, headers, body):
+        self.method = method
+        self.url = url
+        self.headers = headers
+        self.body = body
+
+
+class WireRequest(object):
+    """
+    A single hop of a request sent by a WireTransport
+    """
+    def __init__(self, method, url, headers, body, timeout=None,
+                 verify=True, cookies=None, allow_redirects=True,
+                 hooks=None):
+        self.method = method
+        self.url = url
+        self.headers = headers
+        self.body = body
+        self.timeout = timeout
+        self.verify = verify
+        self.cookies = cookies
+        self.allow_redirects = allow_redirects
+        self.hooks = hooks
+
+        self.url_parts = six.moves.urllib.parse.urlsplit(url)
+        self.key = connection_key(self.url_parts)
+        self.target = self.url_parts.path or '/'
+        if self.url_parts.query:
+            self.target = '?'.join((self.target, self.url_parts.query))
+
+    @property
+    def host(self):
+        # Requests on Unix sockets have no meaningful Host header
+        if self.url_parts.scheme == 'http+unix':
+            return 'localhost'
+        return self.url_parts.netloc
+
+    def redirected(self, status_code, location):
+        """
+        Returns the request of the next hop, following the given redirect
+        """
+        str_method = self.method
+        body = self.body
+        headers = self.headers
+        # As browsers do, the method becomes GET (but on 307 and 308)
+        if status_code in (301, 302, 303) and str_method != 'HEAD':
+            str_method = 'GET'
+            body = None
+            headers = dict(
+                (name, value)
+                for name, value in six.iteritems(headers)
+                if name.lower() not in ('content-type', 'content-length')
+            )
+        return WireRequest(str_method,
+                           six.moves.urllib.parse.urljoin(self.url, location),
+                           headers,
+                           body,
+                           timeout=self.timeout,
+                           verify=self.verify,
+                           cookies=self.cookies,
+                           allow_redirects=self.allow_redirects,
+                           hooks=self.hooks)
+
+
+class TransportResponse(object):
+    """
+    Lean response, exposing the subset of the requests Response interface
+    used by the sequences and their hooks
+    """
+    def __init__(self, request, status_code, reason, headers, content, url,
+                 elapsed, history=None):
+        self.request = request
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        self.url = url
+        self.elapsed = datetime.timedelta(seconds=elapsed)
+        self.history = history or []
+        self.encoding = self._encoding_from_headers()
+
+    def __repr__(self):
+        return '<Response [{status}]>'.format(status=self.status_code)
+
+    def _encoding_from_headers(self):
+        str_content_type = self.headers.get('Content-Type', '')
+        for param in str_content_type.split(';')[1:]:
+            str_name, _, str_value = param.strip().partition('=')
+            if str_name.lower() == 'charset':
+                return str_value.strip('"\' ')
+        return 'utf-8'
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, 'replace')
+
+    def json(self, **kwargs):
+        return json.loads(self.text, **kwargs)
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 500:
+            str_kind = 'Client Error'
+        elif 500 <= self.status_code < 600:
+            str_kind = 'Server Error'
+        else:
+            return
+        raise requests.exceptions.HTTPError(
+            '{status} {kind}: {reason} for url: {url}'.format(
+                status=self.status_code,
+                kind=str_kind,
+                reason=self.reason,
+                url=self.url
+            ), response=self)
+
+
+class PendingRequest(object):
+    """
+    Request to be sent later by the async pool
+    (same interface of grequests AsyncRequest)
+    """
+    def __init__(self, transport, method, url, **kwargs):
+        self.transport = transport
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+        self.response = None
+
+    def send(self, **kwargs):
+        merged_kwargs = dict(self.kwargs)
+        merged_kwargs.update(kwargs)
+        try:
+            self.response = self.transport.request(self.method,
+                                                   self.url,
+                                                   **merged_kwargs)
+        except Exception as error:
+            self.exception = error
+        return self
+
+
+class BaseTransport(object):
+    """
+    Engine actually sending the HTTP requests of a pecker
+    """
+    __metaclass__ = abc.ABCMeta
+
+    # Transports able to pipeline requests implement send_pipelined(),
+    # the ones able to multiplex them implement send_multiplexed()
+    supports_pipelining = False
+    supports_multiplexing = False
+
+    def __init__(self, settings):
+        self.settings = settings
+
+    @abc.abstractmethod
+    def request(self, method, url, **kwargs):
+        """
+        Sends the request, runs the response hooks and returns the response.
+        Accepts the same keyword arguments of requests.request
+        """
+        pass
+
+    def prepare_async(self, method, url, **kwargs):
+        """
+        Returns a request to be sent later by the async greenlet pool
+        """
+        return PendingRequest(self, method, url, **kwargs)
+
+    @abc.abstractmethod
+    def set_header(self, header_name, header_value):
+        pass
+
+    @abc.abstractmethod
+    def set_cookie(self, cookie_name, cookie_value, **kwargs):
+        pass
+
+    def pool_statistics(self):
+        """
+        Returns the PoolStatistics of the transport, if available
+        """
+        return None
+
+    def close(self):
+        pass
+
+
+class WireTransport(BaseTransport):
+    """
+    Base of the transports speaking HTTP on their own, without requests.
+    It builds the request parts, handles default headers, cookies and
+    redirects and builds the lean responses: subclasses only implement
+    the round trip of _exchange()
+    """
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self, settings):
+        super(WireTransport, self).__init__(settings)
+        self.headers = {}
+        # Same jar as the requests sessions: Set-Cookie responses are
+        # scoped by host, path and expiry
+        self.cookies = requests.cookies.RequestsCookieJar()
+
+    def set_header(self, header_name, header_value):
+        self.headers[header_name] = header_value
+
+    def set_cookie(self, cookie_name, cookie_value, **kwargs):
+        self.cookies.set(cookie_name, cookie_value, **kwargs)
+
+    @abc.abstractmethod
+    def _exchange(self, wire_request, wire_headers):
+        """
+        Sends one request and returns the ParsedResponse
+        (the redirects are followed by the caller)
+
+        :param wire_request: the WireRequest to be sent
+        :param wire_headers: list of (name, value) tuples
+        """
+        pass
+
+    def build_body(self, headers, data=None, json_body=None, files=None):
+        if files:
+            raise ValueError(
+                '{transport} does not support file uploads'.format(
+                    transport=self.__class__.__name__
+                )
+            )
+        if json_body is not None:
+            headers.setdefault('Content-Type', 'application/json')
+            return json.dumps(json_body).encode('utf-8')
+        if data is None:
+            return None
+        if isinstance(data, dict) or isinstance(data, list):
+            headers.setdefault('Content-Type',
+                               'application/x-www-form-urlencoded')
+            return six.moves.urllib.parse.urlencode(data).encode('utf-8')
+        if isinstance(data, six.text_type):
+            return data.encode('utf-8')
+        return data
+
+    def build_headers(self, headers=None, auth=None):
+        request_headers = {
+            'Accept': '*/*',
+            'Accept-Encoding': 'identity',
+            'Connection': 'keep-alive'
+        }
+        request_headers.update(self.headers)
+        request_headers.update(headers or {})
+        if auth is not None:
+            request_headers['Authorization'] = 'Basic {token}'.format(
+                token=base64.b64encode(
+                    ':'.join(auth).encode('latin-1')
+                ).decode('ascii')
+            )
+        return request_headers
+
+    def prepare(self, method, url, **kwargs):
+        """
+        Builds the WireRequest from the requests-like arguments
+        """
+        str_url = url
+        if kwargs.get('params'):
+            str_url = '{url}{separator}{query}'.format(
+                url=url,
+                separator='&' if '?' in url else '?',
+                query=six.moves.urllib.parse.urlencode(kwargs['params'])
+            )
+        request_headers = self.build_headers(kwargs.get('headers'),
+                                             kwargs.get('auth'))
+        body = self.build_body(request_headers,
+                               data=kwargs.get('data'),
+                               json_body=kwargs.get('json'),
+                               files=kwargs.get('files'))
+        timeout = kwargs.get('timeout')
+        if isinstance(timeout, tuple):
+            timeout = sum(timeout)
+        return WireRequest(method.upper(),
+                           str_url,
+                           request_headers,
+                           body,
+                           timeout=timeout,
+                           verify=kwargs.get('verify', True),
+                           cookies=kwargs.get('cookies'),
+                           allow_redirects=kwargs.get('allow_redirects', True),
+                           hooks=kwargs.get('hooks'))
+
+    def wire_headers(self, wire_request):
+        # Cookies are read at each hop, since redirects may set them
+        headers = list(six.iteritems(wire_request.headers))
+        obj_jar = self.cookies
+        if wire_request.cookies:
+            obj_jar = requests.cookies.merge_cookies(self.cookies.copy(),
+                                                     wire_request.cookies)
+        str_cookie = requests.cookies.get_cookie_header(obj_jar,
+                                                        wire_request)
+        if str_cookie:
+            headers.append(('Cookie', str_cookie))
+        return headers
+
+    def build_response(self, wire_request, parsed_response, elapsed,
+                       history=None):
+        self.cookies.extract_cookies(
+            requests.cookies.MockResponse(
+                CookieHeaders(parsed_response.headers)
+            ),
+            requests.cookies.MockRequest(wire_request)
+        )
+        return TransportResponse(
+            TransportRequest(wire_request.method,
+                             wire_request.url,
+                             wire_request.headers,
+                             wire_request.body),
+            parsed_response.status_code,
+            parsed_response.reason,
+            Headers.from_list(parsed_response.headers),
+            parsed_response.body,
+            wire_request.url,
+            elapsed,
+            history=history
+        )
+
+    def send_hop(self, wire_request, history=None):
+        dbl_start = monotonic()
+        with transport_errors():
+            parsed_response = self._exchange(wire_request,
+                                             self.wire_headers(wire_request))
+        return self.build_response(wire_request,
+                                   parsed_response,
+                                   monotonic() - dbl_start,
+                                   history=history)
+
+    def follow_redirects(self, wire_request, response):
+        """
+        Follows the redirects (if allowed) and returns the final response
+        """
+        while wire_request.allow_redirects and \
+                response.status_code in REDIRECT_STATUSES:
+            str_location = response.headers.get('Location')
+            if str_location is None:
+                break
+            if len(response.history) >= MAX_REDIRECTS:
+                raise requests.exceptions.TooManyRedirects(
+                    'Exceeded {max} redirects'.format(max=MAX_REDIRECTS),
+                    response=response
+                )
+            wire_request = wire_request.redirected(response.status_code,
+                                                   str_location)
+            response = self.send_hop(wire_request,
+                                     history=response.history + [response])
+        return response
+
+    def request(self, method, url, **kwargs):
+        wire_request = self.prepare(method, url, **kwargs)
+        response = self.follow_redirects(wire_request,
+                                         self.send_hop(wire_request))
+        return dispatch_hooks(wire_request.hooks, response)
@@ -0,0 +1,232 @@
+import collections
+
+import six
+
+
+# Statuses that never carry a body
+BODYLESS_STATUSES = (204, 304)
+
+
+def serialize_request(method, host, target, headers, body=None):
+    """
+    Serializes an HTTP/1.1 request into bytes
+
+    :param method: the HTTP method
+    :param host: the value of the Host header
+    :param target: the request target (path and query string)
+    :param headers: list of (name, value) tuples or dict
+    :param body: the request body as bytes (optional)
+    """
+    if isinstance(headers, dict):
+        headers = six.iteritems(headers)
+    lines = ['{method} {target} HTTP/1.1'.format(method=method,
+                                                 target=target or '/'),
+             'Host: {host}'.format(host=host)]
+    bool_has_length = False
+    for name, value in headers:
+        if name.lower() == 'host':
+            continue
+        if name.lower() == 'content-length':
+            bool_has_length = True
+        lines.append('{name}: {value}'.format(name=name, value=value))
+    if body is not None and not bool_has_length:
+        lines.append('Content-Length: {length}'.format(length=len(body)))
+    head = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+    if body:
+        return head + body
+    return head
+
+
+class ParsedResponse(object):
+    def __init__(self, version, status_code, reason, headers, body):
+        self.version = version
+        self.status_code = status_code
+        self.reason = reason
+        # List of (name, value) tuples, as received
+        self.headers = headers
+        self.body = body
+
+    def __repr__(self):
+        return '{classname} - {status} {reason}'.format(
+            classname=self.__class__.__name__,
+            status=self.status_code,
+            reason=self.reason
+        )
+
+    def keep_alive(self):
+        for name, value in self.headers:
+            if name.lower() == 'connection':
+                return value.lower() != 'close'
+        return self.version != 'HTTP/1.0'
+
+
+class ResponseParser(object):
+    """
+    Incremental (I/O independent) HTTP/1.1 response parser.
+    It only parses the status line, the headers and the body framing
+    (Content-Length, chunked or until connection close).
+
+    Since pipelined responses come back in order, the method of each
+    request must be announced with expect() before its response is fed
+    (responses to HEAD requests have no body)
+    """
+    _HEAD = 0
+    _LENGTH = 1
+    _CHUNK_SIZE = 2
+    _CHUNK_DATA = 3
+    _TRAILER = 4
+    _UNTIL_CLOSE = 5
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._methods = collections.deque()
+        self._state = ResponseParser._HEAD
+        self._current = None
+        self._body = None
+        self._remaining = 0
+        self.bytes_received = 0
+
+    def expect(self, method):
+        self._methods.append(method.upper())
+
+    def pending(self):
+        """Returns the number of expected responses not parsed yet"""
+        return len(self._methods)
+
+    def feed(self, data):
+        """
+        Feeds received bytes to the parser
+
+        :return: the list of responses completed by the given data
+        """
+        self.bytes_received += len(data)
+        self._buffer.extend(data)
+        completed = []
+        while True:
+            response = self._step()
+            if response is None:
+                break
+            completed.append(response)
+        return completed
+
+    def feed_eof(self):
+        """
+        Signals that the connection was closed by the server
+
+        :return: the list of responses completed by the connection close
+        """
+        if self._state == ResponseParser._UNTIL_CLOSE:
+            self._body.extend(self._buffer)
+            del self._buffer[:]
+            return [self._complete()]
+        if self._state != ResponseParser._HEAD or len(self._buffer) > 0:
+            raise IOError('Connection closed in the middle of a response')
+        return []
+
+    def _complete(self):
+        response = self._current
+        response.body = bytes(self._body)
+        self._current = None
+        self._body = None
+        self._state = ResponseParser._HEAD
+        return response
+
+    def _step(self):
+        # Parses the buffer until a response is completed
+        # or more data is needed
+        while True:
+            if self._state == ResponseParser._HEAD:
+                if not self._parse_head():
+                    return None
+            elif self._state == ResponseParser._LENGTH:
+                int_size = min(self._remaining, len(self._buffer))
+                self._body.extend(self._buffer[:int_size])
+                del self._buffer[:int_size]
+                self._remaining -= int_size
+                if self._remaining == 0:
+                    return self._complete()
+                return None
+            elif self._state == ResponseParser._CHUNK_SIZE:
+                int_end = self._buffer.find(b'\r\n')
+                if int_end < 0:
+                    return None
+                # Chunk extensions (after ';') are ignored
+                int_size = int(
+                    bytes(self._buffer[:int_end]).split(b';')[0], 16
+                )
+                del self._buffer[:int_end + 2]
+                if int_size == 0:
+                    self._state = ResponseParser._TRAILER
+                else:
+                    self._remaining = int_size
+                    self._state = ResponseParser._CHUNK_DATA
+            elif self._state == ResponseParser._CHUNK_DATA:
+                # Chunk data is followed by CRLF
+                if len(self._buffer) < self._remaining + 2:
+                    return None
+                self._body.extend(self._buffer[:self._remaining])
+                del self._buffer[:self._remaining + 2]
+                self._state = ResponseParser._CHUNK_SIZE
+            elif self._state == ResponseParser._TRAILER:
+                int_end = self._buffer.find(b'\r\n')
+                if int_end < 0:
+                    return None
+                del self._buffer[:int_end + 2]
+                if int_end == 0:
+                    return self._complete()
+            else:
+                self._body.extend(self._buffer)
+                del self._buffer[:]
+                return None
+
+    def _parse_head(self):
+        """
+        Parses the status line and the headers, if fully buffered
+
+        :return: whether a head was parsed
+        """
+        int_end = self._buffer.find(b'\r\n\r\n')
+        if int_end < 0:
+            return False
+        lines = bytes(self._buffer[:int_end]).decode('latin-1').split('\r\n')
+        del self._buffer[:int_end + 4]
+
+        status_parts = lines[0].split(' ', 2)
+        str_version = status_parts[0]
+        int_status = int(status_parts[1])
+        str_reason = status_parts[2] if len(status_parts) > 2 else ''
+        headers = []
+        int_length = None
+        bool_chunked = False
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            name = name.strip()
+            value = value.strip()
+            headers.append((name, value))
+            str_lower_name = name.lower()
+            if str_lower_name == 'content-length':
+                int_length = int(value)
+            elif str_lower_name == 'transfer-encoding':
+                bool_chunked = 'chunked' in value.lower()
+
+        # Interim responses (100 Continue) are skipped altogether
+        if 100 <= int_status < 200:
+            return True
+
+        str_method = self._methods.popleft() if len(self._methods) > 0 \
+            else 'GET'
+        self._current = ParsedResponse(str_version, int_status, str_reason,
+                                       headers, None)
+        self._body = bytearray()
+        if str_method == 'HEAD' or int_status in BODYLESS_STATUSES:
+            # Completed right away, as an empty body of known length
+            self._remaining = 0
+            self._state = ResponseParser._LENGTH
+        elif bool_chunked:
+            self._state = ResponseParser._CHUNK_SIZE
+        elif int_length is not None:
+            self._remaining = int_length
+            self._state = ResponseParser._LENGTH
+        else:
+            self._state = ResponseParser._UNTIL_CLOSE
+        return True
@@ -0,0 +1,387 @@
+import collections
+import importlib
+import socket
+import ssl
+
+import six
+
+from woodpecker.io.pooladapter import PoolStatistics
+from woodpecker.io.transports.basetransport import WireTransport, \
+    dispatch_hooks, transport_errors
+from woodpecker.io.transports.http11 import ParsedResponse
+from woodpecker.misc.functions import monotonic
+
+
+# Connection-specific headers, forbidden in HTTP/2
+CONNECTION_HEADERS = ('connection', 'keep-alive', 'proxy-connection',
+                      'transfer-encoding', 'upgrade', 'host')
+
+
+class _Stream(object):
+    def __init__(self, body=None):
+        self.status_code = None
+        self.headers = []
+        self.body = bytearray()
+        self.ended = False
+        self.error = None
+        self.end_time = None
+        # Request body still to be sent (flow control permitting)
+        self.pending_body = memoryview(body) if body else None
+
+
+class Http2Connection(object):
+    """
+    A client HTTP/2 connection (h2c with prior knowledge on plain sockets,
+    ALPN negotiated on TLS), driven synchronously over its socket
+    """
+    def __init__(self, sock, receive_buffer_size=65536):
+        import h2.config
+        import h2.connection
+        import h2.settings
+
+        self.sock = sock
+        self.receive_buffer_size = receive_buffer_size
+        self.h2 = h2.connection.H2Connection(
+            config=h2.config.H2Configuration(client_side=True,
+                                             header_encoding='utf-8')
+        )
+        # Server push is disabled, pushed resources would never be used
+        self.h2.local_settings = h2.settings.Settings(
+            client=True,
+            initial_values={h2.settings.SettingCodes.ENABLE_PUSH: 0}
+        )
+        self.streams = {}
+        self.closed = False
+        self.h2.initiate_connection()
+        self.flush()
+
+    def flush(self):
+        data = self.h2.data_to_send()
+        if data:
+            self.sock.sendall(data)
+
+    def open_stream(self, headers, body=None, weight=16):
+        """
+        Sends the headers of a new request (the body is sent as flow
+        control allows)
+
+        :return: the stream id
+        """
+        int_stream_id = self.h2.get_next_available_stream_id()
+        self.h2.send_headers(int_stream_id, headers,
+                             end_stream=not body,
+                             priority_weight=weight)
+        self.streams[int_stream_id] = _Stream(body)
+        self._send_pending_bodies()
+        self.flush()
+        return int_stream_id
+
+    def _send_pending_bodies(self):
+        for int_stream_id, stream in six.iteritems(self.streams):
+            while stream.pending_body is not None:
+                int_size = min(
+                    self.h2.local_flow_control_window(int_stream_id),
+                    self.h2.max_outbound_frame_size,
+                    len(stream.pending_body)
+                )
+                if int_size <= 0:
+                    break
+                bool_last = int_size == len(stream.pending_body)
+                self.h2.send_data(int_stream_id,
+                                  stream.pending_body[:int_size].tobytes(),
+                                  end_stream=bool_last)
+                stream.pending_body = None if bool_last \
+                    else stream.pending_body[int_size:]
+
+    def wait(self, stream_ids):
+        """
+        Receives until all the given streams have ended
+        """
+        import h2.errors
+        import h2.events
+
+        while not all(self.streams[int_stream_id].ended
+                      for int_stream_id in stream_ids):
+            data = self.sock.recv(self.receive_buffer_size)
+            if not data:
+                self.closed = True
+                raise IOError('Connection closed by the server')
+            for event in self.h2.receive_data(data):
+                stream = self.streams.get(getattr(event, 'stream_id', None))
+                if isinstance(event, h2.events.PushedStreamReceived):
+                    # Pushed anyway, refused
+                    self.h2.reset_stream(
+                        event.pushed_stream_id,
+                        error_code=h2.errors.ErrorCodes.REFUSED_STREAM
+                    )
+                elif isinstance(event, h2.events.DataReceived) and \
+                        stream is None:
+                    # Data of untracked (e.g. already reset) streams is
+                    # still acknowledged, not to stall the flow control
+                    self.h2.acknowledge_received_data(
+                        event.flow_controlled_length, event.stream_id
+                    )
+                elif isinstance(event, h2.events.ConnectionTerminated):
+                    self.closed = True
+                    raise IOError(
+                        'Connection terminated by the server (error code '
+                        '{code})'.format(code=event.error_code)
+                    )
+                elif stream is None:
+                    # Other events of untracked streams are ignored
+                    continue
+                elif isinstance(event, h2.events.ResponseReceived):
+                    for name, value in event.headers:
+                        if name == ':status':
+                            stream.status_code = int(value)
+                        elif not name.startswith(':'):
+                            stream.headers.append((name, value))
+                elif isinstance(event, h2.events.DataReceived):
+                    stream.body.extend(event.data)
+                    self.h2.acknowledge_received_data(
+                        event.flow_controlled_length, event.stream_id
+                    )
+                elif isinstance(event, h2.events.StreamEnded):
+                    stream.ended = True
+                    stream.end_time = monotonic()
+                elif isinstance(event, h2.events.StreamReset):
+                    stream.ended = True
+                    stream.error = IOError(
+                        'Stream reset by the server (error code '
+                        '{code})'.format(code=event.error_code)
+                    )
+            self._send_pending_bodies()
+            self.flush()
+
+    def pop_response(self, stream_id):
+        """
+        Removes the ended stream and returns its ParsedResponse
+        """
+        stream = self.streams.pop(stream_id)
+        if stream.error is not None:
+            raise stream.error
+        return ParsedResponse(
+            'HTTP/2',
+            stream.status_code,
+            six.moves.http_client.responses.get(stream.status_code, ''),
+            stream.headers,
+            bytes(stream.body)
+        ), stream.end_time
+
+    def close(self):
+        try:
+            self.h2.close_connection()
+            self.flush()
+        except Exception:
+            pass
+        self.sock.close()
+        self.closed = True
+
+
+class Http2Transport(WireTransport):
+    """
+    HTTP/2 transport multiplexing the requests to the same host
+    over a single connection. Async requests (as the with_resources ones)
+    are sent together by send_multiplexed, each stream weighted
+    by the kind of resource, as browsers do.
+
+    It requires the h2 library
+    (installed with the woodpecker[http2] extra)
+    """
+    supports_multiplexing = True
+
+    # Stream weights by resource extension (other resources get 16)
+    resource_weights = {
+        '.css': 220,
+        '.js': 183,
+        '.woff': 147,
+        '.woff2': 147,
+        '.png': 32,
+        '.jpg': 32,
+        '.jpeg': 32,
+        '.gif': 32,
+        '.svg': 32,
+        '.webp': 32,
+        '.ico': 16
+    }
+    # Weight of the requests sent on their own (e.g. the main page)
+    document_weight = 256
+
+    def __init__(self, settings):
+        # Fail early if the optional dependency is missing
+        importlib.import_module('h2')
+
+        super(Http2Transport, self).__init__(settings)
+        self.statistics = PoolStatistics()
+        # Idle connections, by host
+        self._idle_connections = {}
+
+    def pool_statistics(self):
+        return self.statistics
+
+    def stream_weight(self, url):
+        str_path = six.moves.urllib.parse.urlsplit(url).path.lower()
+        for str_extension, int_weight in six.iteritems(self.resource_weights):
+            if str_path.endswith(str_extension):
+                return int_weight
+        return 16
+
+    def _connect(self, key, timeout, verify):
+        str_scheme, str_host, int_port = key
+        if str_scheme == 'http+unix':
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            sock.connect(str_host)
+        else:
+            sock = socket.create_connection((str_host, int_port), timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if str_scheme == 'https':
+            ssl_context = ssl.create_default_context()
+            ssl_context.set_alpn_protocols(['h2'])
+            if not verify:
+                ssl_context.check_hostname = False
+                ssl_context.verify_mode = ssl.CERT_NONE
+            sock = ssl_context.wrap_socket(sock, server_hostname=str_host)
+            if sock.selected_alpn_protocol() != 'h2':
+                sock.close()
+                raise IOError(
+                    'Server {host} does not support HTTP/2'.format(
+                        host=str_host
+                    )
+                )
+        return Http2Connection(sock)
+
+    def _acquire(self, key, timeout, verify):
+        # Each caller takes a connection of its own, so that concurrent
+        # greenlets never interleave on the same one
+        idle_connections = self._idle_connections.setdefault(key, [])
+        while len(idle_connections) > 0:
+            connection = idle_connections.pop()
+            if not connection.closed:
+                connection.sock.settimeout(timeout)
+                self.statistics.record_connection(True)
+                return connection
+        self.statistics.record_connection(False)
+        return self._connect(key, timeout, verify)
+
+    def _release(self, key, connection):
+        if connection.closed or len(connection.streams) > 0:
+            connection.close()
+        else:
+            self._idle_connections.setdefault(key, []).append(connection)
+
+    @staticmethod
+    def _h2_headers(wire_request, wire_headers):
+        headers = [
+            (':method', wire_request.method),
+            (':authority', wire_request.host),
+            (':scheme', 'https' if wire_request.key[0] == 'https'
+                        else 'http'),
+            (':path', wire_request.target)
+        ]
+        for name, value in wire_headers:
+            str_name = name.lower()
+            if str_name not in CONNECTION_HEADERS:
+                headers.append((str_name, str(value)))
+        if wire_request.body:
+            headers.append(('content-length', str(len(wire_request.body))))
+        return headers
+
+    def _exchange(self, wire_request, wire_headers):
+        connection = self._acquire(wire_request.key,
+                                   wire_request.timeout,
+                                   wire_request.verify)
+        try:
+            int_stream_id = connection.open_stream(
+                self._h2_headers(wire_request, wire_headers),
+                wire_request.body,
+                weight=self.document_weight
+            )
+            connection.wait([int_stream_id])
+            parsed_response, _ = connection.pop_response(int_stream_id)
+        except BaseException:
+            connection.close()
+            raise
+        self._release(wire_request.key, connection)
+        return parsed_response
+
+    def send_multiplexed(self, pending_requests):
+        """
+        Sends the pending requests concurrently, as streams multiplexed
+        over one connection per host, then runs their hooks in order.
+        As for the async pool, the response or the exception is set
+        on each pending request
+        """
+        requests_by_host = collections.OrderedDict()
+        for pending_request in pending_requests:
+            try:
+                wire_request = self.prepare(pending_request.method,
+                                            pending_request.url,
+                                            **pending_request.kwargs)
+            except Exception as error:
+                pending_request.exception = error
+                continue
+            requests_by_host.setdefault(wire_request.key, []).append(
+                (pending_request, wire_request)
+            )
+
+        for key, batch in six.iteritems(requests_by_host):
+            self._send_streams(key, batch)
+
+    def _send_streams(self, key, batch):
+        dbl_start = monotonic()
+        results = []
+        try:
+            with transport_errors():
+                connection = self._acquire(key,
+                                           batch[0][1].timeout,
+                                           batch[0][1].verify)
+                try:
+                    stream_ids = [
+                        connection.open_stream(
+                            self._h2_headers(wire_request,
+                                             self.wire_headers(wire_request)),
+                            wire_request.body,
+                            weight=self.stream_weight(wire_request.url)
+                        )
+                        for _, wire_request in batch
+                    ]
+                    connection.wait(stream_ids)
+                    for int_stream_id in stream_ids:
+                        try:
+                            results.append(
+                                connection.pop_response(int_stream_id)
+                            )
+                        except IOError as error:
+                            results.append((error, None))
+                except BaseException:
+                    connection.close()
+                    raise
+                self._release(key, connection)
+        except Exception as error:
+            for pending_request, _ in batch:
+                pending_request.exception = error
+            return
+
+        for (pending_request, wire_request), (parsed_response, dbl_end) in \
+                zip(batch, results):
+            try:
+                if isinstance(parsed_response, Exception):
+                    with transport_errors():
+                        raise parsed_response
+                response = self.follow_redirects(
+                    wire_request,
+                    self.build_response(wire_request,
+                                        parsed_response,
+                                        dbl_end - dbl_start)
+                )
+                pending_request.response = dispatch_hooks(wire_request.hooks,
+                                                          response)
+            except Exception as error:
+                pending_request.exception = error
+
+    def close(self):
+        for idle_connections in self._idle_connections.values():
+            for connection in idle_connections:
+                connection.close()
+        self._idle_connections = {}
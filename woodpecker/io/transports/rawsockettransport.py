@@ -0,0 +1,269 @@
+import collections
+import select
+import socket
+import ssl
+
+import requests
+
+from woodpecker.io.pooladapter import PoolStatistics
+from woodpecker.io.transports.basetransport import WireTransport, \
+    dispatch_hooks, transport_errors
+from woodpecker.io.transports.http11 import ResponseParser, serialize_request
+from woodpecker.misc.functions import monotonic
+
+
+# Methods whose requests can be sent again when left unanswered
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS',
+                                'TRACE'))
+
+
+class RawSocketTransport(WireTransport):
+    """
+    Minimal HTTP/1.1 client writing pre-serialized requests straight
+    to keep-alive sockets, meant for API endpoints at high request rates.
+
+    Serialized requests are cached, so that repeated requests are
+    written as they are. Responses are parsed only as far as the status
+    line, the headers and the body framing.
+
+    Requests can be pipelined (see send_pipelined) and http+unix URLs
+    (with the percent-encoded socket path as host) are sent
+    over Unix domain sockets
+    """
+    supports_pipelining = True
+
+    # Maximum number of serialized requests cached by each transport
+    max_cached_requests = 256
+
+    def __init__(self, settings):
+        super(RawSocketTransport, self).__init__(settings)
+        self.statistics = PoolStatistics()
+        self.receive_buffer_size = 65536
+        # Idle keep-alive sockets, by host
+        self._idle_sockets = {}
+        self._serialized_requests = {}
+
+    def pool_statistics(self):
+        return self.statistics
+
+    def serialize(self, wire_request, wire_headers):
+        key = (wire_request.method, wire_request.url, tuple(wire_headers),
+               wire_request.body)
+        bytes_request = self._serialized_requests.get(key)
+        if bytes_request is None:
+            if len(self._serialized_requests) >= self.max_cached_requests:
+                self._serialized_requests.clear()
+            bytes_request = serialize_request(wire_request.method,
+                                              wire_request.host,
+                                              wire_request.target,
+                                              wire_headers,
+                                              wire_request.body)
+            self._serialized_requests[key] = bytes_request
+        return bytes_request
+
+    def _connect(self, key, timeout, verify):
+        str_scheme, str_host, int_port = key
+        if str_scheme == 'http+unix':
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            try:
+                sock.connect(str_host)
+            except (IOError, OSError):
+                sock.close()
+                raise
+            return sock
+
+        sock = socket.create_connection((str_host, int_port), timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if str_scheme == 'https':
+            ssl_context = ssl.create_default_context()
+            if not verify:
+                ssl_context.check_hostname = False
+                ssl_context.verify_mode = ssl.CERT_NONE
+            sock = ssl_context.wrap_socket(sock, server_hostname=str_host)
+        return sock
+
+    def _receive(self, sock, parser):
+        """
+        Receives until at least one response is complete
+
+        :return: the completed responses and whether the socket is open
+        """
+        responses = []
+        while len(responses) == 0:
+            data = sock.recv(self.receive_buffer_size)
+            if not data:
+                return parser.feed_eof(), False
+            responses = parser.feed(data)
+        return responses, True
+
+    @staticmethod
+    def _is_dropped(sock):
+        # An idle keep-alive socket is only readable
+        # once closed by the server
+        try:
+            return len(select.select([sock], [], [], 0)[0]) > 0
+        except (IOError, OSError, ValueError):
+            return True
+
+    def _exchange(self, wire_request, wire_headers):
+        result = self._exchange_batch([wire_request], [wire_headers])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result[0]
+
+    def _exchange_batch(self, wire_requests, wire_headers):
+        """
+        Writes all the requests (to the same host) at once and reads
+        their responses in order. Requests left unanswered when the server
+        closes the connection are sent again on a new one, as long as
+        their method is idempotent
+
+        :return: a list of (ParsedResponse, completion time) tuples,
+                 or of the errors of the requests not sent again
+        """
+        key = wire_requests[0].key
+        timeout = wire_requests[0].timeout
+        idle_sockets = self._idle_sockets.setdefault(key, [])
+        results = [None] * len(wire_requests)
+        # Indexes of the requests still unanswered
+        pending = list(range(len(wire_requests)))
+        bool_resent = False
+        bool_reused = len(idle_sockets) > 0
+        while len(pending) > 0:
+            if bool_resent:
+                # The server may have processed the unanswered requests
+                for int_index in pending:
+                    str_method = wire_requests[int_index].method
+                    if str_method not in IDEMPOTENT_METHODS:
+                        results[int_index] = IOError(
+                            'Connection closed before the response, '
+                            '{method} request not sent again'.format(
+                                method=str_method
+                            )
+                        )
+                pending = [int_index for int_index in pending
+                           if results[int_index] is None]
+                if len(pending) == 0:
+                    break
+
+            sock = None
+            while bool_reused and len(idle_sockets) > 0:
+                sock = idle_sockets.pop()
+                if not self._is_dropped(sock):
+                    break
+                sock.close()
+                sock = None
+            if sock is None:
+                bool_reused = False
+                sock = self._connect(key, timeout, wire_requests[0].verify)
+            self.statistics.record_connection(bool_reused)
+
+            parser = ResponseParser()
+            for int_index in pending:
+                parser.expect(wire_requests[int_index].method)
+            int_answered = 0
+            bool_open = True
+            bool_keep_alive = True
+            try:
+                if bool_reused:
+                    sock.settimeout(timeout)
+                sock.sendall(b''.join(
+                    self.serialize(wire_requests[int_index],
+                                   wire_headers[int_index])
+                    for int_index in pending
+                ))
+                while bool_open and bool_keep_alive and \
+                        int_answered < len(pending):
+                    responses, bool_open = self._receive(sock, parser)
+                    for response in responses:
+                        results[pending[int_answered]] = \
+                            (response, monotonic())
+                        int_answered += 1
+                        bool_keep_alive = response.keep_alive()
+                        if not bool_keep_alive:
+                            break
+                    if not bool_open and int_answered == 0:
+                        raise IOError('Connection closed by the server')
+            except socket.timeout:
+                sock.close()
+                raise
+            except (IOError, OSError):
+                sock.close()
+                # A stale keep-alive socket is retried on a new one
+                if bool_reused and parser.bytes_received == 0:
+                    bool_reused = False
+                    bool_resent = True
+                    continue
+                raise
+
+            pending = pending[int_answered:]
+            bool_resent = True
+            if bool_open and bool_keep_alive:
+                idle_sockets.append(sock)
+            else:
+                sock.close()
+                bool_reused = False
+        return results
+
+    def send_pipelined(self, pending_requests, depth):
+        """
+        Sends the pending requests pipelining up to depth of them on each
+        connection, then runs their hooks in order. As for the async pool,
+        the response or the exception is set on each pending request
+        """
+        batches = collections.OrderedDict()
+        for pending_request in pending_requests:
+            try:
+                wire_request = self.prepare(pending_request.method,
+                                            pending_request.url,
+                                            **pending_request.kwargs)
+            except Exception as error:
+                pending_request.exception = error
+                continue
+            batches.setdefault(wire_request.key, []).append(
+                (pending_request, wire_request)
+            )
+
+        for requests_by_host in batches.values():
+            for int_start in range(0, len(requests_by_host), depth):
+                self._send_batch(requests_by_host[int_start:int_start + depth])
+
+    def _send_batch(self, batch):
+        wire_requests = [wire_request for _, wire_request in batch]
+        dbl_start = monotonic()
+        try:
+            with transport_errors():
+                results = self._exchange_batch(
+                    wire_requests,
+                    [self.wire_headers(wire_request)
+                     for wire_request in wire_requests]
+                )
+        except Exception as error:
+            for pending_request, _ in batch:
+                pending_request.exception = error
+            return
+
+        for (pending_request, wire_request), result in zip(batch, results):
+            if isinstance(result, Exception):
+                pending_request.exception = \
+                    requests.exceptions.ConnectionError(result)
+                continue
+            parsed_response, dbl_end = result
+            try:
+                response = self.follow_redirects(
+                    wire_request,
+                    self.build_response(wire_request,
+                                        parsed_response,
+                                        dbl_end - dbl_start)
+                )
+                pending_request.response = dispatch_hooks(wire_request.hooks,
+                                                          response)
+            except Exception as error:
+                pending_request.exception = error
+
+    def close(self):
+        for idle_sockets in self._idle_sockets.values():
+            for sock in idle_sockets:
+                sock.close()
+        self._idle_sockets = {}
@@ -0,0 +1,39 @@
+import grequests
+import requests
+
+from woodpecker.io.pooladapter import mount_pool_adapter, pool_statistics
+from woodpecker.io.transports.basetransport import BaseTransport
+
+
+class RequestsTransport(BaseTransport):
+    """
+    Transport based on a requests session, with the async requests
+    sent through grequests (and gevent monkey patching)
+    """
+    def __init__(self, settings, session=None):
+        super(RequestsTransport, self).__init__(settings)
+        if session is None:
+            session = requests.Session()
+            mount_pool_adapter(session, settings)
+        self.session = session
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def prepare_async(self, method, url, **kwargs):
+        return grequests.AsyncRequest(method,
+                                      url,
+                                      session=self.session,
+                                      **kwargs)
+
+    def set_header(self, header_name, header_value):
+        self.session.headers.update({header_name: header_value})
+
+    def set_cookie(self, cookie_name, cookie_value, **kwargs):
+        self.session.cookies.set(cookie_name, cookie_value, **kwargs)
+
+    def pool_statistics(self):
+        return pool_statistics(self.session)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,65 @@
+import datetime
+import time
+
+from woodpecker.misc.functions import cooperative_sleep, monotonic, \
+    perf_counter_ns
+
+
+def _wall_clock_ns():
+    if hasattr(time, 'time_ns'):
+        return time.time_ns()
+    return int(time.time() * 1000000000)
+
+
+class Clock(object):
+    """
+    Clock used by sequences for timestamps and waits.
+
+    Timestamps are integer nanoseconds since the epoch, read from the
+    monotonic perf_counter_ns and anchored to the wall clock only once
+    per run (worker processes inherit the anchor of their parent),
+    so that they never jump with the system clock adjustments and their
+    differences are exact durations
+    """
+    # Wall clock and counter readings taken together
+    _anchor = (_wall_clock_ns(), perf_counter_ns())
+
+    @staticmethod
+    def to_datetime(timestamp_ns):
+        """
+        Converts a timestamp in nanoseconds to a (local) datetime
+        """
+        return datetime.datetime.fromtimestamp(timestamp_ns / 1e9)
+
+    def timestamp_ns(self):
+        int_wall_anchor, int_counter_anchor = self._anchor
+        return int_wall_anchor + perf_counter_ns() - int_counter_anchor
+
+    def now(self):
+        return self.to_datetime(self.timestamp_ns())
+
+    def monotonic(self):
+        return monotonic()
+
+    def sleep(self, seconds):
+        cooperative_sleep(seconds)
+
+
+class VirtualClock(Clock):
+    """
+    Clock that never sleeps: waits advance a simulated offset instead,
+    which is added to every reading. Timestamps and stopwatches thus
+    account for the waits without actually waiting
+    """
+    def __init__(self):
+        self.offset = 0.0
+
+    def timestamp_ns(self):
+        return super(VirtualClock, self).timestamp_ns() + \
+            int(self.offset * 1000000000)
+
+    def monotonic(self):
+        return monotonic() + self.offset
+
+    def sleep(self, seconds):
+        self.offset += seconds
@@ -3,16 +3,119 @@ import itertools
 import urllib
 import datetime
 import re
+import sys
+import time
+
+
+# Monotonic clock (falls back to wall clock where not available)
+monotonic = getattr(time, 'monotonic', time.time)
+
+
+def _perf_counter_ns():
+    return int(monotonic() * 1000000000)
+
+
+# Monotonic integer nanoseconds (computed from seconds before Python 3.7)
+perf_counter_ns = getattr(time, 'perf_counter_ns', _perf_counter_ns)
+
+
+def cooperative_sleep(seconds):
+    """
+    Sleeps yielding control to the other greenlets if gevent is in use,
+    so that a waiting pecker never blocks the whole OS thread
+    """
+    gevent = sys.modules.get('gevent')
+    if gevent is not None:
+        gevent.sleep(seconds)
+    else:
+        time.sleep(seconds)
+
+
+def patch_gevent():
+    """
+    Monkey-patches the standard library (except threads and select)
+    with gevent, so that the peckers of the greenlet spawners yield
+    on blocking I/O.
+
+    It must be called by the entry point of the test run,
+    before requests, ssl or the sequences are imported
+    """
+    from gevent import monkey
+    monkey.patch_all(thread=False, select=False)
 
 
 def import_sequence(sequence_file, sequence_class):
+    class_object = import_sequence_class(sequence_file, sequence_class)
+    return class_object()
+
+
+def import_sequence_class(sequence_file, sequence_class):
     sequence_module = sequence_file.replace('.py', '')
     module = importlib.import_module(
         '.{module}'.format(module=sequence_module),
         'sequences'
     )
-    class_object = getattr(module, sequence_class)
-    return class_object()
+    return getattr(module, sequence_class)
+
+
+def import_spawner(spawning_mode):
+    spawner_modules = {
+        'greenlets': ('greenletspawner', 'GreenletSpawner'),
+        'processes': ('processspawner', 'ProcessSpawner'),
+        'prefork': ('preforkspawner', 'PreforkSpawner')
+    }
+    try:
+        spawner_module, spawner_class = spawner_modules[spawning_mode]
+    except KeyError:
+        raise ValueError(
+            'Spawning mode "{mode}" is not supported'.format(
+                mode=spawning_mode
+            )
+        )
+    module = importlib.import_module(
+        '.{module}'.format(module=spawner_module),
+        'woodpecker.spawners'
+    )
+    return getattr(module, spawner_class)
+
+
+def import_transport(transport_name):
+    transport_modules = {
+        'requests': ('requeststransport', 'RequestsTransport'),
+        'asyncio': ('asynciotransport', 'AsyncioTransport'),
+        'raw': ('rawsockettransport', 'RawSocketTransport'),
+        'http2': ('http2transport', 'Http2Transport')
+    }
+    try:
+        transport_module, transport_class = transport_modules[transport_name]
+    except KeyError:
+        raise ValueError(
+            'HTTP transport "{transport}" is not supported'.format(
+                transport=transport_name
+            )
+        )
+    if transport_name == 'asyncio' and sys.version_info < (3, 5):
+        raise ValueError('The asyncio transport needs Python 3.5 or later')
+    # Transport modules are imported only when used, so that the requests
+    # one does not monkey patch the process when another one is chosen
+    module = importlib.import_module(
+        '.{module}'.format(module=transport_module),
+        'woodpecker.io.transports'
+    )
+    return getattr(module, transport_class)
+
+
+def merge_defaults(settings, defaults):
+    """
+    Adds to settings all the keys of defaults it does not already define,
+    recursing into sections. Values already set are never overwritten
+    """
+    for key, value in defaults.items():
+        if key not in settings:
+            settings[key] = value
+        elif isinstance(value, dict) and isinstance(settings[key], dict):
+            merge_defaults(settings[key], value)
+    return settings
 
 
 def split_by_element(iterable, splitters):
@@ -0,0 +1,138 @@
+import array
+
+
+class HdrHistogram(object):
+    """
+    High Dynamic Range histogram of integer values: values between
+    lowest_value and highest_value are counted in log-linear buckets,
+    keeping the given number of significant figures, in fixed memory
+    (values out of range are clamped).
+
+    Indexing follows the HdrHistogram of Gil Tene, without its
+    serialization and concurrency features
+    """
+    def __init__(self,
+                 lowest_value=1,
+                 highest_value=3600 * 1000 * 1000,
+                 significant_figures=2):
+        if lowest_value < 1 or highest_value < 2 * lowest_value:
+            raise ValueError(
+                'Invalid histogram range {lowest} - {highest}'.format(
+                    lowest=lowest_value, highest=highest_value
+                )
+            )
+        if not 1 <= significant_figures <= 5:
+            raise ValueError(
+                'Significant figures must be between 1 and 5, '
+                'got {figures}'.format(figures=significant_figures)
+            )
+        self.lowest_value = lowest_value
+        self.highest_value = highest_value
+        self.significant_figures = significant_figures
+
+        int_largest_single_unit = 2 * 10 ** significant_figures
+        self._unit_magnitude = lowest_value.bit_length() - 1
+        self._sub_bucket_half_count_magnitude = \
+            (int_largest_single_unit - 1).bit_length() - 1
+        self._sub_bucket_count = \
+            1 << (self._sub_bucket_half_count_magnitude + 1)
+        self._sub_bucket_half_count = self._sub_bucket_count >> 1
+        self._sub_bucket_mask = \
+            (self._sub_bucket_count - 1) << self._unit_magnitude
+
+        # Buckets needed to cover the highest value
+        int_smallest_untrackable = \
+            self._sub_bucket_count << self._unit_magnitude
+        self._bucket_count = 1
+        while int_smallest_untrackable <= highest_value:
+            int_smallest_untrackable <<= 1
+            self._bucket_count += 1
+
+        self._counts_length = \
+            (self._bucket_count + 1) * self._sub_bucket_half_count
+        self._counts = array.array('q', [0]) * self._counts_length
+        self.total_count = 0
+        self.min_value = None
+        self.max_value = None
+        self._sum = 0
+
+    def __len__(self):
+        return self.total_count
+
+    def _counts_index(self, value):
+        int_bucket = (value | self._sub_bucket_mask).bit_length() - \
+            self._unit_magnitude - self._sub_bucket_half_count_magnitude - 1
+        int_sub_bucket = value >> (int_bucket + self._unit_magnitude)
+        return ((int_bucket + 1) << self._sub_bucket_half_count_magnitude) + \
+            int_sub_bucket - self._sub_bucket_half_count
+
+    def _highest_equivalent_value(self, index):
+        int_bucket = (index >> self._sub_bucket_half_count_magnitude) - 1
+        int_sub_bucket = (index & (self._sub_bucket_half_count - 1)) + \
+            self._sub_bucket_half_count
+        if int_bucket < 0:
+            int_sub_bucket -= self._sub_bucket_half_count
+            int_bucket = 0
+        int_shift = int_bucket + self._unit_magnitude
+        return (int_sub_bucket << int_shift) + (1 << int_shift) - 1
+
+    def record(self, value, count=1):
+        value = int(min(max(value, self.lowest_value), self.highest_value))
+        self._counts[self._counts_index(value)] += count
+        self.total_count += count
+        self._sum += value * count
+        if self.min_value is None or value < self.min_value:
+            self.min_value = value
+        if self.max_value is None or value > self.max_value:
+            self.max_value = value
+
+    def mean(self):
+        if self.total_count == 0:
+            return None
+        return float(self._sum) / self.total_count
+
+    def value_at_percentile(self, percentile):
+        """
+        Returns the (highest equivalent) value at the given percentile
+        (e.g. 99.9), or None if nothing was recorded
+        """
+        if self.total_count == 0:
+            return None
+        return self.values_at_percentiles((percentile,))[percentile]
+
+    def values_at_percentiles(self, percentiles):
+        """
+        Returns a dict of the values at the given percentiles,
+        scanning the counts only once
+        """
+        if self.total_count == 0:
+            return dict((percentile, None) for percentile in percentiles)
+        targets = sorted(
+            (max(int(round(min(percentile, 100.0) / 100.0 *
+                           self.total_count)), 1), percentile)
+            for percentile in percentiles
+        )
+        values = {}
+        int_cumulative = 0
+        int_target = 0
+        for int_index, int_count in enumerate(self._counts):
+            if int_count == 0:
+                continue
+            int_cumulative += int_count
+            while int_target < len(targets) and \
+                    int_cumulative >= targets[int_target][0]:
+                values[targets[int_target][1]] = min(
+                    self._highest_equivalent_value(int_index),
+                    self.max_value
+                )
+                int_target += 1
+            if int_target == len(targets):
+                break
+        return values
+
+    def reset(self):
+        self._counts = array.array('q', [0]) * self._counts_length
+        self.total_count = 0
+        self.min_value = None
+        self.max_value = None
+        self._sum = 0
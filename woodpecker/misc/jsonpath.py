@@ -0,0 +1,109 @@
+import re
+
+import six
+
+
+class JsonPath(object):
+    """
+    Compiled JSONPath expression, supporting the subset used to extract
+    values from API responses:
+
+    - $ (the root, optional)
+    - .name and ['name'] (child member)
+    - [index] (array item, negative indexes count from the end)
+    - .* and [*] (all the children)
+    - ..name (all the descendant members with the given name)
+
+    e.g. $.books[0].title, $..title, $['author']['name']
+    """
+    _token_pattern = re.compile(
+        r'(?P<descendant>\.\.)(?P<descendant_name>[\w\-]+|\*)'
+        r'|\.(?P<name>[\w\-]+|\*)'
+        r'|\[\s*(?P<index>-?\d+)\s*\]'
+        r'|\[\s*(?P<quote>[\'"])(?P<key>.*?)(?P=quote)\s*\]'
+        r'|\[\s*(?P<wildcard>\*)\s*\]'
+    )
+
+    __slots__ = ('expression', 'steps')
+
+    def __init__(self, expression):
+        self.expression = expression
+        str_path = expression.strip()
+        if str_path.startswith('$'):
+            str_path = str_path[1:]
+        elif str_path and str_path[0] not in '.[':
+            str_path = '.' + str_path
+
+        # Each step is a (kind, argument) tuple
+        steps = []
+        int_position = 0
+        while int_position < len(str_path):
+            match = self._token_pattern.match(str_path, int_position)
+            if match is None:
+                raise ValueError(
+                    'Invalid JSONPath "{expression}" at position '
+                    '{position}'.format(expression=expression,
+                                        position=int_position)
+                )
+            if match.group('descendant') is not None:
+                steps.append(('descendant', match.group('descendant_name')))
+            elif match.group('name') is not None:
+                if match.group('name') == '*':
+                    steps.append(('wildcard', None))
+                else:
+                    steps.append(('member', match.group('name')))
+            elif match.group('index') is not None:
+                steps.append(('index', int(match.group('index'))))
+            elif match.group('quote') is not None:
+                steps.append(('member', match.group('key')))
+            else:
+                steps.append(('wildcard', None))
+            int_position = match.end()
+        self.steps = tuple(steps)
+
+    def __repr__(self):
+        return 'JsonPath({expression!r})'.format(expression=self.expression)
+
+    @staticmethod
+    def _children(node):
+        if isinstance(node, dict):
+            return list(six.itervalues(node))
+        elif isinstance(node, list):
+            return node
+        return []
+
+    @classmethod
+    def _descendants(cls, node, name):
+        # Yields the matching members in document order
+        if isinstance(node, dict):
+            for key, value in six.iteritems(node):
+                if name == '*' or key == name:
+                    yield value
+                for descendant in cls._descendants(value, name):
+                    yield descendant
+        elif isinstance(node, list):
+            for item in node:
+                for descendant in cls._descendants(item, name):
+                    yield descendant
+
+    def find(self, document):
+        """
+        Returns the list of the values matched in the (parsed) document
+        """
+        nodes = [document]
+        for str_kind, argument in self.steps:
+            matched = []
+            for node in nodes:
+                if str_kind == 'member':
+                    if isinstance(node, dict) and argument in node:
+                        matched.append(node[argument])
+                elif str_kind == 'index':
+                    if isinstance(node, list) and \
+                            -len(node) <= argument < len(node):
+                        matched.append(node[argument])
+                elif str_kind == 'wildcard':
+                    matched.extend(self._children(node))
+                else:
+                    matched.extend(self._descendants(node, argument))
+            nodes = matched
+        return nodes
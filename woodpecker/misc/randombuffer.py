@@ -0,0 +1,85 @@
+import array
+import math
+import os
+import random
+import weakref
+
+
+# Buffers reseeded in forked children, so that worker processes
+# never draw the same samples as their parent (and their siblings)
+_buffers = weakref.WeakSet()
+
+
+def _reseed_buffers():
+    for random_buffer in list(_buffers):
+        random_buffer.reseed()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reseed_buffers)
+
+
+class RandomBuffer(object):
+    """
+    Pool of pre-sampled standard random variates, refilled in bulk
+    when exhausted. Think times are drawn by scaling these samples,
+    instead of calling the random module for every single wait
+    """
+    # Without fork hooks, forks are detected when drawing
+    _check_pid = not hasattr(os, 'register_at_fork')
+
+    def __init__(self, size=4096, seed=None):
+        self._size = size
+        self._random = random.Random(seed)
+        self._pid = os.getpid()
+        _buffers.add(self)
+
+        # Samples and read position, by distribution
+        self._samples = {}
+        self._positions = {}
+
+        # Generators of the standard variates, by distribution
+        self._generators = {
+            'uniform': self._random.random,
+            'normal': lambda: self._random.gauss(0.0, 1.0),
+            'exponential': lambda: self._random.expovariate(1.0)
+        }
+
+    def reseed(self):
+        """
+        Reseeds the generator from the OS entropy and drops the samples
+        left, as done in forked child processes
+        """
+        self._random.seed()
+        self._samples = {}
+        self._positions = {}
+        self._pid = os.getpid()
+
+    def _refill(self, distribution):
+        generator = self._generators[distribution]
+        self._samples[distribution] = array.array(
+            'd', (generator() for _ in range(self._size))
+        )
+        self._positions[distribution] = 0
+
+    def _next(self, distribution):
+        if self._check_pid and os.getpid() != self._pid:
+            self.reseed()
+        int_position = self._positions.get(distribution, self._size)
+        if int_position >= self._size:
+            self._refill(distribution)
+            int_position = 0
+        self._positions[distribution] = int_position + 1
+        return self._samples[distribution][int_position]
+
+    def uniform(self, low, high):
+        return low + (high - low) * self._next('uniform')
+
+    def gauss(self, mean, std):
+        return mean + std * self._next('normal')
+
+    def exponential(self, mean):
+        return mean * self._next('exponential')
+
+    def lognormal(self, mu, sigma):
+        return math.exp(mu + sigma * self._next('normal'))
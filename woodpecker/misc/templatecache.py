@@ -0,0 +1,110 @@
+from string import Template
+
+import six
+
+
+class CompiledTemplate(object):
+    """
+    Template split once into its literal and placeholder parts.
+    Substitution has the same semantics of string.Template.safe_substitute,
+    without scanning the source string again
+    """
+    __slots__ = ('source', '_parts')
+
+    def __init__(self, source):
+        self.source = source
+        # Literals are strings, placeholders are (name, original) tuples
+        parts = []
+        int_position = 0
+        for match in Template.pattern.finditer(source):
+            if match.start() > int_position:
+                parts.append(source[int_position:match.start()])
+            str_name = match.group('named') or match.group('braced')
+            if match.group('escaped') is not None:
+                parts.append(Template.delimiter)
+            elif str_name is not None:
+                parts.append((str_name, match.group()))
+            else:
+                parts.append(match.group())
+            int_position = match.end()
+        if int_position < len(source):
+            parts.append(source[int_position:])
+        self._parts = tuple(parts)
+
+    def substitute(self, mapping):
+        pieces = []
+        for part in self._parts:
+            if isinstance(part, tuple):
+                str_name, str_original = part
+                if str_name in mapping:
+                    pieces.append('%s' % (mapping[str_name],))
+                else:
+                    pieces.append(str_original)
+            else:
+                pieces.append(part)
+        return ''.join(pieces)
+
+
+class TemplateCache(object):
+    """
+    Cache of compiled templates, keyed by their source string.
+    Strings without placeholders are never compiled and are returned
+    as they are
+    """
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self._templates = {}
+
+    def __len__(self):
+        return len(self._templates)
+
+    def compile(self, source):
+        """
+        Returns the CompiledTemplate of the source string,
+        or None if it has no placeholders
+        """
+        try:
+            return self._templates[source]
+        except KeyError:
+            pass
+        if Template.delimiter not in source:
+            template = None
+        else:
+            template = CompiledTemplate(source)
+        # Generated sequences may have a lot of unique strings,
+        # so the cache is simply emptied when full
+        if len(self._templates) >= self.max_size:
+            self._templates.clear()
+        self._templates[source] = template
+        return template
+
+    def render(self, source, mapping):
+        if Template.delimiter not in source:
+            return source
+        return self.compile(source).substitute(mapping)
+
+    def render_structure(self, structure, mapping):
+        """
+        Substitutes the placeholders in all the string values of a
+        structure of dicts, lists and tuples (as a JSON body).
+        Parts without placeholders are returned as they are, not copied
+        """
+        if isinstance(structure, six.string_types):
+            return self.render(structure, mapping)
+        elif isinstance(structure, dict):
+            rendered = None
+            for key, value in six.iteritems(structure):
+                rendered_value = self.render_structure(value, mapping)
+                if rendered_value is not value:
+                    if rendered is None:
+                        rendered = dict(structure)
+                    rendered[key] = rendered_value
+            return structure if rendered is None else rendered
+        elif isinstance(structure, (list, tuple)):
+            rendered_items = [self.render_structure(item, mapping)
+                              for item in structure]
+            if all(rendered_item is item for rendered_item, item
+                   in zip(rendered_items, structure)):
+                return structure
+            return type(structure)(rendered_items)
+        return structure
@@ -0,0 +1,198 @@
+import abc
+import array
+
+
+class ProfileElement(object):
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self, duration):
+        if duration < 0:
+            raise ValueError('Profile elements cannot have negative duration')
+        self.duration = duration
+
+    def __repr__(self):
+        return '{classname} - {duration} s'.format(
+            classname=self.__class__.__name__,
+            duration=self.duration
+        )
+
+    @abc.abstractmethod
+    def level(self, start_level, elapsed):
+        """Returns the load level after elapsed seconds from element start"""
+        pass
+
+    def end_level(self, start_level):
+        """Returns the load level left when the element ends"""
+        return start_level
+
+
+class RampUp(ProfileElement):
+    def __init__(self, duration, target):
+        super(RampUp, self).__init__(duration)
+        self.target = target
+
+    def level(self, start_level, elapsed):
+        if self.duration == 0:
+            return self.target
+        return start_level + \
+            (self.target - start_level) * elapsed / float(self.duration)
+
+    def end_level(self, start_level):
+        return self.target
+
+
+class RampDown(RampUp):
+    def __init__(self, duration, target=0):
+        super(RampDown, self).__init__(duration, target)
+
+
+class Hold(ProfileElement):
+    def level(self, start_level, elapsed):
+        return start_level
+
+
+class Step(ProfileElement):
+    def __init__(self, duration, target):
+        super(Step, self).__init__(duration)
+        self.target = target
+
+    def level(self, start_level, elapsed):
+        return self.target
+
+    def end_level(self, start_level):
+        return self.target
+
+
+class Spike(ProfileElement):
+    def __init__(self, duration, peak):
+        super(Spike, self).__init__(duration)
+        self.peak = peak
+
+    def level(self, start_level, elapsed):
+        return self.peak
+
+
+class LoadProfile(object):
+    """
+    Load profile built by combination of basic ramp elements.
+    The profile describes either the number of active peckers
+    or the arrival rate (iterations per second) over time.
+
+    Usage:
+        LoadProfile().ramp_up(60, 100).hold(3600).ramp_down(60)
+    """
+    def __init__(self, elements=None, start_level=0, kind='peckers'):
+        if kind not in ('peckers', 'rate'):
+            raise ValueError(
+                'Load profile kind "{kind}" is not supported'.format(
+                    kind=kind
+                )
+            )
+        self.elements = list(elements or [])
+        self.start_level = start_level
+        self.kind = kind
+
+    def __repr__(self):
+        return '{classname} - {kind} - {duration} s'.format(
+            classname=self.__class__.__name__,
+            kind=self.kind,
+            duration=self.duration()
+        )
+
+    def add(self, element):
+        if not isinstance(element, ProfileElement):
+            raise TypeError('Only profile elements can be added to a profile')
+        self.elements.append(element)
+        return self
+
+    def ramp_up(self, duration, target):
+        return self.add(RampUp(duration, target))
+
+    def hold(self, duration):
+        return self.add(Hold(duration))
+
+    def step(self, duration, target):
+        return self.add(Step(duration, target))
+
+    def spike(self, duration, peak):
+        return self.add(Spike(duration, peak))
+
+    def ramp_down(self, duration, target=0):
+        return self.add(RampDown(duration, target))
+
+    def duration(self):
+        return sum(element.duration for element in self.elements)
+
+    def compile(self, resolution=1.0):
+        """
+        Evaluates the whole profile once, one value per tick
+
+        :param resolution: tick length in seconds
+        :return: a CompiledProfile instance
+        """
+        if resolution <= 0:
+            raise ValueError('Profile resolution must be greater than zero')
+
+        # Peckers are whole numbers, rates are not
+        if self.kind == 'peckers':
+            values = array.array('I')
+        else:
+            values = array.array('d')
+
+        dbl_level = self.start_level
+        for element in self.elements:
+            int_ticks = int(round(element.duration / float(resolution)))
+            for tick in range(int_ticks):
+                dbl_value = element.level(dbl_level, tick * resolution)
+                if dbl_value < 0:
+                    raise ValueError(
+                        'Load profile levels cannot be negative, got '
+                        '{value} in {element}'.format(value=dbl_value,
+                                                      element=element)
+                    )
+                if self.kind == 'peckers':
+                    values.append(int(round(dbl_value)))
+                else:
+                    values.append(float(dbl_value))
+            dbl_level = element.end_level(dbl_level)
+        return CompiledProfile(values, resolution, self.kind)
+
+
+class CompiledProfile(object):
+    """
+    Precomputed load profile timeline, read in O(1) per tick
+    """
+    def __init__(self, values, resolution, kind):
+        self.values = values
+        self.resolution = resolution
+        self.kind = kind
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return '{classname} - {kind} - {ticks} ticks of {resolution} s'.format(
+            classname=self.__class__.__name__,
+            kind=self.kind,
+            ticks=len(self.values),
+            resolution=self.resolution
+        )
+
+    def duration(self):
+        return len(self.values) * self.resolution
+
+    def tick(self, elapsed):
+        return int(elapsed / self.resolution)
+
+    def at(self, elapsed):
+        """
+        Returns the target level after the given elapsed seconds,
+        or None if the profile is over
+        """
+        int_tick = int(elapsed / self.resolution)
+        if 0 <= int_tick < len(self.values):
+            return self.values[int_tick]
+        return None
+
+    def max(self):
+        return max(self.values) if len(self.values) > 0 else 0
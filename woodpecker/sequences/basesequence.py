@@ -1,17 +1,21 @@
 import abc
-import datetime
 import logging
+import math
 import random
 import sys
-import time
-from string import Template
 
 import coloredlogs
 import msgpack
 import six
 import verboselogs
 
+from woodpecker.io.logrecords import END_STOPWATCH_EVENT, \
+    START_STOPWATCH_EVENT, schemas
 from woodpecker.io.variablejar import VariableJar
+from woodpecker.misc.clock import Clock, VirtualClock
+from woodpecker.misc.functions import merge_defaults
+from woodpecker.misc.randombuffer import RandomBuffer
+from woodpecker.misc.templatecache import TemplateCache
 from woodpecker.settings.basesequencesettings import BaseSequenceSettings
 from woodpecker.settings.coresettings import CoreSettings
 
@@ -19,6 +23,12 @@ from woodpecker.settings.coresettings import CoreSettings
 class BaseSequence(object):
     __metaclass__ = abc.ABCMeta
 
+    # Pre-sampled random variates for think times, shared by all peckers
+    _random = RandomBuffer()
+
+    # Compiled templates of the injected strings, shared by all peckers
+    _templates = TemplateCache()
+
     def __init__(self,
                  settings=None,
                  log_queue=six.moves.queue.Queue(),
@@ -26,9 +36,16 @@ class BaseSequence(object):
                  stopwatches=None,
                  debug=False,
                  inline_log_sinks=(sys.stdout,)):
-        # Settings
+        # Settings (defaults never override the given values)
         self.settings = settings or BaseSequence.default_settings()
-        self.settings.merge(CoreSettings())
+        merge_defaults(self.settings, BaseSequence.default_settings())
+        merge_defaults(self.settings, CoreSettings())
+
+        # Clock (a virtual one skips the waits but accounts for them)
+        if self.settings['timing']['virtual_clock']:
+            self.clock = VirtualClock()
+        else:
+            self.clock = Clock()
 
         # Variables
         self.variables = variables
@@ -68,56 +85,149 @@ class BaseSequence(object):
         pass
 
     # Think times
-    def think_time(self,
-                   amount,
-                   kind='fixed',
-                   **kwargs):
+    def _think_time_amount(self, amount, kind='fixed', **kwargs):
         # Determine the amount of time to wait from the type of think time
-        if kind == 'fixed':
-            dbl_amount_final = amount
-        elif kind == 'gaussian':
+        if kind == 'gaussian':
             dbl_std = kwargs.get('std', 0.5 * amount)
-            dbl_amount_final = round(abs(random.gauss(amount, dbl_std)), 3)
+            dbl_amount_final = abs(self._random.gauss(amount, dbl_std))
+        elif kind == 'uniform':
+            dbl_spread = kwargs.get('spread', 0.5 * amount)
+            dbl_amount_final = self._random.uniform(
+                kwargs.get('min', amount - dbl_spread),
+                kwargs.get('max', amount + dbl_spread)
+            )
+        elif kind == 'exponential':
+            dbl_amount_final = self._random.exponential(amount)
+        elif kind == 'lognormal':
+            # Mu is chosen so that the mean of the distribution is the amount
+            dbl_sigma = kwargs.get('sigma', 0.5)
+            dbl_amount_final = self._random.lognormal(
+                math.log(amount) - 0.5 * dbl_sigma ** 2, dbl_sigma
+            ) if amount > 0 else 0.0
         else:
             dbl_amount_final = amount
 
+        # Clamp the think time to the maximum allowed (0 means no limit)
+        dbl_max_think_time = self.settings['timing']['max_think_time']
+        if 0 < dbl_max_think_time < dbl_amount_final:
+            dbl_amount_final = dbl_max_think_time
+        return round(max(dbl_amount_final, 0.0), 3)
+
+    def think_time(self,
+                   amount,
+                   kind='fixed',
+                   **kwargs):
+        """
+        Waits for the given amount of seconds, yielding to the other
+        peckers when running under gevent.
+
+        :param amount: the (mean) amount of seconds to wait
+        :param kind: fixed, gaussian (std), uniform (spread or min and max),
+                     exponential or lognormal (sigma)
+        :param kwargs: distribution parameters
+        """
+        if self.settings['timing']['skip_think_time']:
+            self._inline_logger.debug('Think time skipped')
+            return
+
+        dbl_amount_final = self._think_time_amount(amount, kind, **kwargs)
+
         # Now, wait
-        time.sleep(dbl_amount_final)
+        self.clock.sleep(dbl_amount_final)
+        self._inline_logger.debug('Think time: {amount} s ({kind})'.format(
+            amount=dbl_amount_final,
+            kind=kind
+        ))
+
+    def think_time_async(self,
+                         amount,
+                         kind='fixed',
+                         **kwargs):
+        """
+        Same as think_time, but returns an awaitable to be used
+        in steps running on an asyncio event loop
+        """
+        import asyncio
+
+        if self.settings['timing']['skip_think_time']:
+            self._inline_logger.debug('Think time skipped')
+            return asyncio.sleep(0)
+
+        dbl_amount_final = self._think_time_amount(amount, kind, **kwargs)
         self._inline_logger.debug('Think time: {amount} s ({kind})'.format(
             amount=dbl_amount_final,
             kind=kind
         ))
+        if isinstance(self.clock, VirtualClock):
+            self.clock.sleep(dbl_amount_final)
+            return asyncio.sleep(0)
+        return asyncio.sleep(dbl_amount_final)
+
+    def settings_think_time(self, name):
+        """
+        Waits for the think time defined in the timing section of settings
+
+        :param name: the name of the setting (e.g. think_time_after_setup)
+        """
+        dbl_amount = self.settings['timing'][name]
+        if dbl_amount > 0:
+            self.think_time(dbl_amount)
 
     def log(self, message_type, log_message):
-        mix_message = {
-            'message_type': message_type,
-            'timestamp': str(datetime.datetime.now()),
-            'pecker_id': self.variables.get_pecker_id(),
-            'sequence': self.variables.get_current_sequence(),
-            'iteration': self.variables.get_current_iteration(),
-            'message_content': log_message
-        }
+        if self.settings['logging']['use_compact_logs']:
+            mix_message = schemas.compact(
+                message_type,
+                self.clock.timestamp_ns(),
+                self.variables.get_pecker_id(),
+                self.variables.get_current_sequence(),
+                self.variables.get_current_iteration(),
+                log_message
+            )
+        else:
+            mix_message = {
+                'message_type': message_type,
+                'timestamp': self.clock.timestamp_ns(),
+                'pecker_id': self.variables.get_pecker_id(),
+                'sequence': self.variables.get_current_sequence(),
+                'iteration': self.variables.get_current_iteration(),
+                'message_content': log_message
+            }
+        self._put_log_record(mix_message)
+
+    def log_values(self, schema, values):
+        """
+        Logs a record of a registered schema (see logrecords) from its
+        values in schema order, without building the message dicts
+        when compact logs are used
+        """
+        if not self.settings['logging']['use_compact_logs']:
+            self.log(schema.message_type, schema.content(values))
+            return
+        self._put_log_record((
+            schema.tag,
+            self.clock.timestamp_ns(),
+            self.variables.get_pecker_id(),
+            self.variables.get_current_sequence(),
+            self.variables.get_current_iteration()
+        ) + tuple(values))
+
+    def _put_log_record(self, mix_message):
         if self.settings['logging']['use_compressed_logs']:
             mix_message = msgpack.packb(mix_message)
+        # Marked as done by the LogCollector, once written to the sinks
         self._log_queue.put(mix_message)
-        self._log_queue.task_done()
 
     def log_inline(self, message, level=logging.INFO):
         self._inline_logger.log(level, message)
 
     def start_stopwatch(self, name):
-        str_start_timestamp = str(datetime.datetime.now())
+        # Timestamps in nanoseconds (see Clock)
+        int_start_timestamp = self.clock.timestamp_ns()
         self._stopwatches[name] = {
-            'start': str_start_timestamp,
+            'start': int_start_timestamp,
             'end': None
         }
-        self.log('event', {
-            'event_type': 'start_stopwatch',
-            'event_content': {
-                'stopwatch_name': name,
-                'timestamp': str_start_timestamp
-            }
-        })
+        self.log_values(START_STOPWATCH_EVENT, (name, int_start_timestamp))
         self._inline_logger.debug(
             'Stopwatch "{stopwatch}" started'.format(
                 stopwatch=name
@@ -125,15 +235,13 @@ class BaseSequence(object):
 
     def end_stopwatch(self, name):
         try:
-            str_end_timestamp = str(datetime.datetime.now())
-            self._stopwatches[name]['end'] = str_end_timestamp
-            self.log('event', {
-                'event_type': 'end_stopwatch',
-                'event_content': {
-                    'stopwatch_name': name,
-                    'timestamp': str_end_timestamp
-                }
-            })
+            int_end_timestamp = self.clock.timestamp_ns()
+            self._stopwatches[name]['end'] = int_end_timestamp
+            self.log_values(END_STOPWATCH_EVENT, (
+                name,
+                int_end_timestamp,
+                int_end_timestamp - self._stopwatches[name]['start']
+            ))
             self._inline_logger.debug(
                 'Stopwatch "{stopwatch}" ended'.format(
                     stopwatch=name
@@ -154,9 +262,49 @@ class BaseSequence(object):
             raise KeyError(str_error_message)
 
     def _inject_variables(self, text):
-        return Template(text).safe_substitute(self.variables.dump())
+        return self._templates.render(text, self.variables.dump())
+
+    def _inject_variables_structure(self, structure):
+        """
+        Injects the variables in all the string values of a structure
+        of dicts, lists and tuples (dict keys are left untouched)
+        """
+        return self._templates.render_structure(structure,
+                                                self.variables.dump())
+
+    def _pacing_interval(self):
+        dbl_min_interval = self.settings['timing']['iteration_pacing']
+        dbl_max_interval = self.settings['timing']['iteration_pacing_max']
+        if dbl_max_interval > dbl_min_interval:
+            return random.uniform(dbl_min_interval, dbl_max_interval)
+        return dbl_min_interval
+
+    def _wait_pacing(self, iteration_start):
+        # Pacing is measured between iteration starts, so only the time
+        # not already spent by the steps is waited
+        dbl_interval = self._pacing_interval()
+        if dbl_interval <= 0:
+            return
+        dbl_remainder = iteration_start + dbl_interval - self.clock.monotonic()
+        if dbl_remainder > 0:
+            self.clock.sleep(dbl_remainder)
+            self._inline_logger.debug(
+                'Pacing: waited {remainder:.3f} s '
+                'to keep a {interval:.3f} s interval'.format(
+                    remainder=dbl_remainder,
+                    interval=dbl_interval
+                ))
+        else:
+            self._inline_logger.warning(
+                'Pacing interval of {interval:.3f} s '
+                'exceeded by {excess:.3f} s'.format(
+                    interval=dbl_interval,
+                    excess=-dbl_remainder
+                ))
 
     def run_steps(self):
+        dbl_iteration_start = self.clock.monotonic()
+
         # If each sequence is treated as a stopwatch, add the sequence itself
         # to the list of active stopwatches
         self._inline_logger.debug('Sequence started')
@@ -168,10 +316,12 @@ class BaseSequence(object):
         # Run the setup hooks
         for hook in self._setup_hooks:
             hook()
+        self.settings_think_time('think_time_after_setup')
 
         self.steps()
 
         # Run teardown hooks
+        self.settings_think_time('think_time_before_teardown')
         for hook in self._teardown_hooks:
             hook()
 
@@ -183,6 +333,9 @@ class BaseSequence(object):
             ))
         self._inline_logger.debug('Sequence ended')
 
+        # Wait for the remainder of the pacing interval, if any
+        self._wait_pacing(dbl_iteration_start)
+
         return self.settings, \
             self.variables, \
             self._stopwatches
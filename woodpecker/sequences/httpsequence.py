@@ -1,21 +1,40 @@
 import abc
+import collections
+import itertools
+import random
 import re
 import sys
 
-import gevent
-import grequests
+import gevent.pool
 import requests
 import six
 
+from woodpecker.io.logrecords import HTTP_REQUEST_STEP
+from woodpecker.io.responseview import ResponseView
 from woodpecker.io.variablejar import VariableJar
+from woodpecker.misc.functions import import_transport, merge_defaults
+from woodpecker.misc.jsonpath import JsonPath
 from woodpecker.sequences.basesequence import BaseSequence
 from woodpecker.settings.httpsequencesettings import HttpSequenceSettings
-from woodpecker.settings.coresettings import CoreSettings
+from woodpecker.settings.trackedsection import TrackedSection
+
+
+# Snapshot of the default request arguments taken from the settings
+RequestProfile = collections.namedtuple('RequestProfile', (
+    'headers',
+    'allow_redirects',
+    'verify',
+    'proxies',
+    'timeout'
+))
 
 
 class HttpSequence(BaseSequence):
     __metaclass__ = abc.ABCMeta
 
+    # The urllib3 InsecureRequestWarning is disabled once per process
+    _ssl_warnings_disabled = False
+
     def __init__(self,
                  settings=None,
                  log_queue=six.moves.queue.Queue(),
@@ -33,51 +52,108 @@ class HttpSequence(BaseSequence):
                                            inline_log_sinks=inline_log_sinks)
 
         # Settings (automatically extended by the class settings)
-        self.settings.merge(HttpSequence.default_settings())
+        merge_defaults(self.settings, HttpSequence.default_settings())
 
-        # Instantiates new session and last response variables in VariableJar
-        if not self.variables.is_set('__http_session'):
-            self.variables.set('__http_session', requests.Session())
+        # Instantiates new transport and last response variables in VariableJar
+        if not self.variables.is_set('__http_transport'):
+            transport_class = import_transport(
+                self.settings['http']['transport']
+            )
+            self.variables.set('__http_transport',
+                               transport_class(self.settings))
         if not self.variables.is_set('__last_response'):
             self.variables.set('__last_response', None)
 
+        # Default request arguments, built on the first request and rebuilt
+        # when the HTTP settings change (in place) later on
+        self._http_settings = TrackedSection.track(self.settings['http'])
+        self._request_profile = None
+        self._request_profile_changes = None
+
         # Add property to check if async pool is active
         self._async_request_pool_active = False
         self._async_request_pool = []
 
+        # Bounded greenlet pool sending the async requests,
+        # kept for the whole lifetime of the pecker
+        self._async_greenlet_pool = gevent.pool.Pool(
+            self.settings['http']['max_async_concurrent_requests'] or None
+        )
+
         # Add async request hooks to teardown hooks
         self._teardown_hooks.append(self._async_wait_hook)
+        self._teardown_hooks.append(self._pool_statistics_hook)
+
+    def request_profile(self):
+        """
+        Returns the default request arguments, read from the HTTP settings.
+        The snapshot is kept until the HTTP settings section changes
+        """
+        http_settings = self._http_settings
+        if self._request_profile is None or \
+                http_settings.changes != self._request_profile_changes:
+            self._request_profile_changes = http_settings.changes
+            self._request_profile = RequestProfile(
+                headers=(('User-Agent', http_settings['user_agent']),),
+                allow_redirects=http_settings['allow_redirects'],
+                verify=not http_settings['ignore_ssl_errors'],
+                # Unset proxies are left out, not to override the
+                # environment ones
+                proxies=tuple(
+                    (str_scheme, http_settings[str_setting])
+                    for str_scheme, str_setting in (('http', 'http_proxy'),
+                                                    ('https', 'https_proxy'))
+                    if http_settings[str_setting]
+                ),
+                timeout=http_settings['default_timeout']
+            )
+        return self._request_profile
+
+    def refresh_request_profile(self):
+        """
+        Forces the default request arguments to be read again
+        """
+        self._request_profile = None
+
+    @classmethod
+    def _disable_ssl_warnings(cls):
+        if not cls._ssl_warnings_disabled:
+            requests.packages.urllib3.disable_warnings()
+            HttpSequence._ssl_warnings_disabled = True
 
     def _patch_kwargs(self, args):
-        # Request headers
-        args['headers'] = args.get(
-            'headers', {'User-Agent': self.settings['http']['user_agent']})
+        profile = self.request_profile()
+
+        # Request headers (new dicts, since they are updated later on)
+        if 'headers' not in args:
+            args['headers'] = dict(profile.headers)
 
         # Option to follow redirects or not
-        args['allow_redirects'] = args.get(
-            'allow_redirects', self.settings['http']['allow_redirects'])
+        if 'allow_redirects' not in args:
+            args['allow_redirects'] = profile.allow_redirects
 
         # Option to verify SSL certificates
-        args['verify'] = args.get(
-            'verify', not self.settings['http']['ignore_ssl_errors'])
+        if 'verify' not in args:
+            args['verify'] = profile.verify
 
         # Proxy settings
-        args['proxies'] = args.get(
-            'proxies',
-            {
-                'http-proxy': self.settings['http']['http_proxy'],
-                'https-proxy': self.settings['http']['https_proxy']
-            }
-        )
+        if 'proxies' not in args:
+            args['proxies'] = dict(profile.proxies)
 
         # Default timeout
-        args['timeout'] = args.get(
-            'timeout', self.settings['http']['default_timeout'])
+        if 'timeout' not in args:
+            args['timeout'] = profile.timeout
 
         # If the Ignore SSL errors option is set to true,
         # disables the urllib InsecureRequestWarning message
         if not args['verify']:
-            requests.packages.urllib3.disable_warnings()
+            self._disable_ssl_warnings()
+
+    def _inject_request_variables(self, args):
+        # Injects variables in headers, query parameters and bodies
+        for str_key in ('headers', 'params', 'data', 'json'):
+            if args.get(str_key) is not None:
+                args[str_key] = self._inject_variables_structure(args[str_key])
 
     def start_async_pool(self):
         """
@@ -92,29 +168,79 @@ class HttpSequence(BaseSequence):
         End the async requests pool and flushes all the added async requests
         """
         self._async_request_pool_active = False
-        grequests.map(self._async_request_pool,
-                      size=self.settings['http'][
-                          'max_async_concurrent_requests'],
-                      exception_handler=self._async_exception_handler)
+        pending_requests = self._async_request_pool
         self._async_request_pool = []
+
+        # If the transport can, multiplex or pipeline the requests
+        # on few connections
+        obj_transport = self.variables.get('__http_transport')
+        int_depth = self.settings['http']['pipelining_depth']
+        if obj_transport.supports_multiplexing or \
+                (int_depth > 1 and obj_transport.supports_pipelining):
+            if obj_transport.supports_multiplexing:
+                obj_transport.send_multiplexed(pending_requests)
+            else:
+                obj_transport.send_pipelined(pending_requests, int_depth)
+            for async_request in pending_requests:
+                exception = getattr(async_request, 'exception', None)
+                if exception is not None:
+                    self._async_exception_handler(async_request, exception)
+            self._inline_logger.debug('Async requests pool ended')
+            return
+
+        # Responses are handled by their hooks as soon as they complete,
+        # so there is no need to keep them all
+        for _ in self._async_greenlet_pool.imap_unordered(
+                self._send_async_request, pending_requests):
+            pass
         self._inline_logger.debug('Async requests pool ended')
 
+    def _send_async_request(self, async_request, raise_errors=True):
+        async_request.send()
+        # The exception attribute is only set when the request fails
+        exception = getattr(async_request, 'exception', None)
+        if exception is not None:
+            self._async_exception_handler(async_request,
+                                          exception,
+                                          raise_errors=raise_errors)
+
     def _async_wait_hook(self):
         # Wait for active Greenlets to complete
-        # (but only if there are Greenlets to wait)
-        if len(self._async_request_pool) > 0:
-            gevent.joinall(self._async_request_pool)
-            self._async_request_pool = []
+        self._async_greenlet_pool.join()
+
+    def connection_pool_statistics(self):
+        """
+        Returns the connection pool counters (hits, misses, waits,
+        wait time) of the pecker transport, or None if not available
+        """
+        statistics = self.variables.get('__http_transport').pool_statistics()
+        if statistics is None:
+            return None
+        return statistics.as_dict()
+
+    def _pool_statistics_hook(self):
+        # Log the pool counters of the current iteration, then reset them
+        statistics = self.variables.get('__http_transport').pool_statistics()
+        if statistics is None:
+            return
+        self.log('event', {
+            'event_type': 'connection_pool_statistics',
+            'event_content': statistics.as_dict()
+        })
+        self._inline_logger.debug(
+            'Connection pool: {hits} hits, {misses} misses, {waits} waits '
+            '({wait_time:.3f} s waited)'.format(**statistics.as_dict())
+        )
+        statistics.reset()
 
     def set_header(self, header_name, header_value):
-        session = self.variables.get('__http_session')
-        session.headers.update({header_name, header_value})
-        self.variables.set('__http_session', session)
+        self.variables.get('__http_transport').set_header(header_name,
+                                                          header_value)
 
     def set_cookie(self, cookie_name, cookie_value, **kwargs):
-        session = self.variables.get('__http_session')
-        session.cookies.set(cookie_name, cookie_value, **kwargs)
-        self.variables.set('__http_session', session)
+        self.variables.get('__http_transport').set_cookie(cookie_name,
+                                                          cookie_value,
+                                                          **kwargs)
 
     def http_request(self,
                      url,
@@ -153,13 +279,14 @@ class HttpSequence(BaseSequence):
             self._request_log_hook(is_async=False)
         )
 
-        # Automatically replaces parameters in URL
+        # Automatically replaces parameters in URL, headers and body
         url = self._inject_variables(url)
+        self._inject_request_variables(kwargs)
 
         # Execute the request
-        obj_session = self.variables.get('__http_session')
+        obj_transport = self.variables.get('__http_transport')
         try:
-            obj_last_response = obj_session.request(method, url, **kwargs)
+            obj_last_response = obj_transport.request(method, url, **kwargs)
             if not is_resource:
                 obj_last_response.raise_for_status()
             self.variables.set('__last_response', obj_last_response)
@@ -194,8 +321,6 @@ class HttpSequence(BaseSequence):
                 }
             })
             raise error
-        finally:
-            self.variables.set('__http_session', obj_session)
 
     def get(self,
             url,
@@ -360,30 +485,28 @@ class HttpSequence(BaseSequence):
                     size=len(response.content)
                 ))
 
-            # Log the result of the request
-            self.log('step', {
-                'step_type': 'http_request',
-                'active_stopwatches': list(self._stopwatches.keys()),
-                'step_content': {
-                    'url': response.request.url,
-                    'method': response.request.method,
-                    'body': response.request.body,
-                    # Conversion from CaseInsensitive dict to normal dict
-                    'headers': dict(response.request.headers),
-                    'response_url': response.url,
-                    'response_status': ' '.join((str(response.status_code),
-                                                 response.reason)),
-                    'response_size': len(response.content),
-                    'elapsed': response.elapsed.total_seconds() * 1000,
-                    'async': is_async
-                }
-            })
+            # Log the result of the request (values in schema order)
+            self.log_values(HTTP_REQUEST_STEP, (
+                list(self._stopwatches.keys()),
+                response.request.url,
+                response.request.method,
+                response.request.body,
+                # Conversion from CaseInsensitive dict to normal dict
+                # (records are serialized, or handed to other processes,
+                # as soon as logged, so a copy is needed anyway)
+                dict(response.request.headers),
+                response.url,
+                ' '.join((str(response.status_code), response.reason)),
+                len(response.content),
+                response.elapsed.total_seconds() * 1000,
+                is_async
+            ))
 
             if is_async and not is_resource and not response.ok:
                 response.raise_for_status()
         return _request_log_hook_gen
 
-    def _async_exception_handler(self, request, exception):
+    def _async_exception_handler(self, request, exception, raise_errors=True):
         if not request.kwargs.get('is_resource', False):
             self._inline_logger.error(str(exception))
             self.log('event', {
@@ -396,7 +519,8 @@ class HttpSequence(BaseSequence):
                     'error': str(exception)
                 }
             })
-            raise exception
+            if raise_errors:
+                raise exception
 
     def async_http_request(self,
                            url,
@@ -422,8 +546,9 @@ class HttpSequence(BaseSequence):
         # Add specific header for async request (XHR)
         kwargs['headers'].update({'X-Requested-With': 'XMLHttpRequest'})
 
-        # Automatically replaces parameters in URL
+        # Automatically replaces parameters in URL, headers and body
         url = self._inject_variables(url)
+        self._inject_request_variables(kwargs)
 
         # Add async response log hook to existing hooks
         response_hooks = response_hooks or []
@@ -435,24 +560,18 @@ class HttpSequence(BaseSequence):
         )
 
         # Create base request
-        obj_session = self.variables.get('__http_session')
-        obj_async_request = grequests.AsyncRequest(method,
-                                                   url,
-                                                   session=obj_session,
-                                                   **kwargs)
+        obj_transport = self.variables.get('__http_transport')
+        obj_async_request = obj_transport.prepare_async(method, url, **kwargs)
 
         # If async pool is active, add the quest to the pool
         if self._async_request_pool_active:
             self._async_request_pool.append(obj_async_request)
         else:
             # If async pool is not active, send the request immediately
-            async_greenlet = grequests.send(
-                obj_async_request,
-                pool=grequests.Pool(
-                    self.settings['http']['max_async_concurrent_requests']
-                )
-            )
-            self._async_request_pool.append(async_greenlet)
+            # (errors are logged, since there is no one to raise them to)
+            self._async_greenlet_pool.spawn(self._send_async_request,
+                                            obj_async_request,
+                                            raise_errors=False)
 
     def async_get(self,
                   url,
@@ -585,7 +704,7 @@ class HttpSequence(BaseSequence):
 
     def assert_body_has_text(self, target):
         def _assert_hook(response, **kwargs):
-            if target not in response.content.decode(response.encoding):
+            if target not in ResponseView.of(response).text:
                 raise AssertionError(
                     'Cannot find "{target}" in response body'.format(
                         target=target
@@ -628,9 +747,11 @@ class HttpSequence(BaseSequence):
         return _assert_hook
 
     def assert_body_has_regex(self, regex):
+        compiled_regex = re.compile(regex)
+        regex = compiled_regex.pattern
+
         def _assert_hook(response, **kwargs):
-            if re.search(regex,
-                         response.content.decode(response.encoding)) is None:
+            if compiled_regex.search(ResponseView.of(response).text) is None:
                 raise AssertionError(
                     'Cannot match regex "{regex}" in response body'.format(
                         regex=regex
@@ -666,34 +787,87 @@ class HttpSequence(BaseSequence):
         return _assert_hook
 
     # Variables retrieval
+    @staticmethod
+    def _check_instances(instances):
+        if isinstance(instances, six.integer_types) and instances < 1:
+            raise ValueError(
+                'Instances are counted from 1, got {instances}'.format(
+                    instances=instances
+                )
+            )
+
+    @staticmethod
+    def _pick_instances(matches, instances):
+        """
+        Picks the requested instances from an iterator of matches,
+        consuming it only as far as needed
+
+        :return: the list of the picked matches
+        """
+        if instances == 'first':
+            return list(itertools.islice(matches, 1))
+        elif isinstance(instances, six.integer_types):
+            return list(itertools.islice(matches, instances - 1, instances))
+        matches = list(matches)
+        if instances == 'random' and len(matches) > 0:
+            return [random.choice(matches)]
+        elif instances == 'last':
+            return matches[-1:]
+        return matches
+
+    def _save_parameter(self, name, parameter):
+        self.variables.set(name, parameter)
+        self._inline_logger.debug(
+            'Saved parameter "{name}": "{value}"'.format(
+                name=name,
+                value=parameter
+            )
+        )
+
+    @staticmethod
+    def _regex_item(match):
+        # Same item re.findall would return for the match
+        int_groups = match.re.groups
+        if int_groups == 0:
+            return match.group(0)
+        elif int_groups == 1:
+            return match.group(1)
+        return match.groups()
+
     def var_from_regex(self,
                        name,
                        regex,
                        target='body',
                        instances='first',
                        group=0):
+        """
+        Saves a variable from the response with a regular expression.
+        The regex is compiled once, when the hook is created.
+
+        :param name: the name of the variable
+        :param regex: the regular expression (string or compiled)
+        :param target: url, body, headers or all
+        :param instances: first, last, random, an ordinal number
+                          (1 is the first match) or all (any other value),
+                          to save the list of all the matches
+        :param group: the capturing group to save,
+                      if the regex has more than one
+        """
+        compiled_regex = re.compile(regex)
+        regex = compiled_regex.pattern
+        self._check_instances(instances)
+
         def _param_hook(response, **kwargs):
-            # Find the target of regex
-            targets = {
-                'url': response.url,
-                'body': response.content.decode(response.encoding),
-                'headers': '\n'.join(
-                    [': '.join((str(key), str(value)))
-                     for key, value in six.iteritems(response.headers)]
-                ),
-                'all': '\n'.join((
-                    response.url,
-                    '\n'.join(
-                        [': '.join((str(key), str(value)))
-                         for key, value in six.iteritems(response.headers)]
-                    ),
-                    response.content.decode(response.encoding)
-                ))
-            }
-            target_string = targets.get(target, response.content)
+            # Find the target of regex (built only once per response)
+            target_string = ResponseView.of(response).target(target)
+
+            # Only scan as far as needed
+            matches = self._pick_instances(
+                compiled_regex.finditer(target_string), instances
+            )
 
             # If match is not found, raise exception, else save the parameter
-            if re.search(regex, target_string) is None:
+            if len(matches) == 0:
                 raise IOError(
                     'Cannot save the parameter "{name}", '
                     'no match found for regex "{regex}" in {target}'.format(
@@ -703,23 +877,209 @@ class HttpSequence(BaseSequence):
                     )
                 )
             else:
-                matches = re.findall(regex, target_string)
-                if instances == 'first' or len(matches) == 1:
-                    parameter = matches[0]
+                if len(matches) == 1:
+                    parameter = self._regex_item(matches[0])
                     # Check for capturing groups, if more are present
                     if isinstance(parameter, tuple):
                         parameter = parameter[group]
                 else:
-                    parameter = matches
-                self.variables.set(name, parameter)
-                self._inline_logger.debug(
-                    'Saved parameter "{name}": "{value}"'.format(
+                    parameter = [self._regex_item(match)
+                                 for match in matches]
+                self._save_parameter(name, parameter)
+        return _param_hook
+
+    @staticmethod
+    def _boundary_matches(haystack, left, right):
+        # Generates the (start, end) indexes of the text between boundaries
+        int_position = haystack.find(left)
+        while int_position >= 0:
+            int_start = int_position + len(left)
+            int_end = haystack.find(right, int_start)
+            if int_end < 0:
+                return
+            yield int_start, int_end
+            int_position = haystack.find(left, int_end + len(right))
+
+    def var_from_boundaries(self,
+                            name,
+                            left,
+                            right,
+                            target='body',
+                            instances='first'):
+        """
+        Saves a variable with the text between a left and a right boundary
+        (as LoadRunner does). The body is searched as raw bytes,
+        so that only the extracted text is decoded.
+
+        :param name: the name of the variable
+        :param left: the left boundary
+        :param right: the right boundary
+        :param target: url, body, headers or all
+        :param instances: first, last, random, an ordinal number
+                          (1 is the first match) or all (any other value),
+                          to save the list of all the matches
+        """
+        self._check_instances(instances)
+        # Boundaries encoded by response encoding
+        encoded_boundaries = {}
+
+        def _param_hook(response, **kwargs):
+            view = ResponseView.of(response)
+            if target == 'body':
+                str_encoding = view.encoding
+                if str_encoding not in encoded_boundaries:
+                    encoded_boundaries[str_encoding] = (
+                        left.encode(str_encoding),
+                        right.encode(str_encoding)
+                    )
+                haystack = response.content
+                needles = encoded_boundaries[str_encoding]
+            else:
+                str_encoding = None
+                haystack = view.target(target)
+                needles = (left, right)
+
+            matches = self._pick_instances(
+                self._boundary_matches(haystack, *needles), instances
+            )
+            if len(matches) == 0:
+                raise IOError(
+                    'Cannot save the parameter "{name}", no match found '
+                    'between "{left}" and "{right}" in {target}'.format(
+                        name=name,
+                        left=left,
+                        right=right,
+                        target=target
+                    )
+                )
+
+            values = [haystack[int_start:int_end] for int_start, int_end
+                      in matches]
+            if str_encoding is not None:
+                values = [value.decode(str_encoding) for value in values]
+            self._save_parameter(name,
+                                 values[0] if len(values) == 1 else values)
+        return _param_hook
+
+    @classmethod
+    def _compiled_selector(cls, kind, expression):
+        """
+        Returns the compiled json, css or xpath selector,
+        compiling it only once per sequence class
+        """
+        # Looked up in the class own dict, so that subclasses
+        # never share the selectors of their parent
+        selectors = cls.__dict__.get('_selectors')
+        if selectors is None:
+            selectors = {}
+            cls._selectors = selectors
+        selector = selectors.get((kind, expression))
+        if selector is None:
+            if kind == 'json':
+                selector = JsonPath(expression)
+            elif kind == 'css':
+                import lxml.cssselect
+
+                selector = lxml.cssselect.CSSSelector(expression)
+            else:
+                import lxml.etree
+
+                selector = lxml.etree.XPath(expression)
+            selectors[(kind, expression)] = selector
+        return selector
+
+    @staticmethod
+    def _node_value(node, attribute=None):
+        # Elements are saved as their text (or attribute value),
+        # other values (JSON values, XPath strings and numbers) as they are
+        if hasattr(node, 'text_content'):
+            if attribute is not None:
+                return node.get(attribute)
+            return node.text_content()
+        elif isinstance(node, six.string_types):
+            # Plain string, not keeping a reference to the tree
+            return six.text_type(node)
+        return node
+
+    def _selector_hook(self, name, kind, expression, instances,
+                       attribute=None):
+        self._check_instances(instances)
+        selector = self._compiled_selector(kind, expression)
+
+        def _param_hook(response, **kwargs):
+            # The body is parsed only once per response
+            view = ResponseView.of(response)
+            if kind == 'json':
+                nodes = selector.find(view.json())
+            else:
+                nodes = selector(view.html_tree())
+                # XPath functions (as count) return a single value
+                if not isinstance(nodes, list):
+                    nodes = [nodes]
+
+            matches = self._pick_instances(iter(nodes), instances)
+            if len(matches) == 0:
+                raise IOError(
+                    'Cannot save the parameter "{name}", no match found '
+                    'for {kind} selector "{expression}"'.format(
                         name=name,
-                        value=parameter
+                        kind=kind,
+                        expression=expression
                     )
                 )
+            values = [self._node_value(node, attribute) for node in matches]
+            self._save_parameter(name,
+                                 values[0] if len(values) == 1 else values)
         return _param_hook
 
+    def var_from_json(self, name, path, instances='first'):
+        """
+        Saves a variable with the value found at the given JSONPath
+        of a JSON body (e.g. $.books[0].title or $..title)
+
+        :param name: the name of the variable
+        :param path: the JSONPath (see JsonPath for the supported syntax)
+        :param instances: first, last, random, an ordinal number
+                          (1 is the first match) or all (any other value),
+                          to save the list of all the matches
+        """
+        return self._selector_hook(name, 'json', path, instances)
+
+    def var_from_css(self, name, selector, attribute=None, instances='first'):
+        """
+        Saves a variable with the text (or the attribute value)
+        of the elements of an HTML body matched by a CSS selector.
+
+        It requires the lxml and cssselect libraries
+        (installed with the woodpecker[html] extra)
+
+        :param name: the name of the variable
+        :param selector: the CSS selector
+        :param attribute: the attribute to be saved instead of the text
+        :param instances: first, last, random, an ordinal number
+                          (1 is the first match) or all (any other value),
+                          to save the list of all the matches
+        """
+        return self._selector_hook(name, 'css', selector, instances,
+                                   attribute)
+
+    def var_from_xpath(self, name, xpath, instances='first'):
+        """
+        Saves a variable with the result of an XPath expression
+        on an HTML body: elements are saved as their text,
+        attributes, strings and numbers as they are.
+
+        It requires the lxml library
+        (installed with the woodpecker[html] extra)
+
+        :param name: the name of the variable
+        :param xpath: the XPath expression
+        :param instances: first, last, random, an ordinal number
+                          (1 is the first match) or all (any other value),
+                          to save the list of all the matches
+        """
+        return self._selector_hook(name, 'xpath', xpath, instances)
+
     @staticmethod
     def default_settings():
         return HttpSequenceSettings()
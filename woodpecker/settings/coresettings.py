@@ -9,11 +9,14 @@ class CoreSettings(ConfigObj):
             {
                 'timing': {
                     'skip_think_time': False,
+                    'virtual_clock': False,
                     'max_think_time': 5.0,
                     'think_time_after_setup': 0.0,
                     'think_time_between_sequences': 0.0,
                     'think_time_before_teardown': 0.0,
-                    'think_time_between_iterations': 0.0
+                    'think_time_between_iterations': 0.0,
+                    'iteration_pacing': 0.0,
+                    'iteration_pacing_max': 0.0
                 },
                 'network': {
                     'controller_port': 7877,
@@ -22,9 +25,11 @@ class CoreSettings(ConfigObj):
                 'logging': {
                     'max_entries_before_flush': 10,
                     'max_interval_before_flush': 30.0,
+                    'max_pending_entries': 100000,
                     'results_file': 'results.sqlite',
                     'sysmonitor_polling_interval': 5.0,
                     'use_compressed_logs': True,
+                    'use_compact_logs': True,
                     'inline_log_format':
                         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
                 },
@@ -32,6 +37,17 @@ class CoreSettings(ConfigObj):
                     'spawning_mode': 'threads',
                     'pecker_handling_mode': 'passive',
                     'pecker_status_active_polling_interval': 0.1,
+                    'pecker_spawn_interval': 0.0,
+                    'worker_processes': 0,
+                    'max_arrival_lag': 0.05,
+                    'profile_resolution': 1.0,
+                    'preloaded_modules': [
+                        'requests',
+                        'grequests',
+                        'gevent',
+                        'msgpack',
+                        'coloredlogs'
+                    ],
                     'spawners': [
                         'localhost'
                     ]
@@ -49,11 +65,15 @@ class CoreSettings(ConfigObj):
         return ConfigObj({
             'timing': {
                 'skip_think_time': 'boolean(default=False)',
+                'virtual_clock': 'boolean(default=False)',
                 'max_think_time': 'float(min=0.0, default=5.0)',
                 'think_time_after_setup': 'float(min=0.0, default=0.0)',
                 'think_time_between_sequences': 'float(min=0.0, default=0.0)',
                 'think_time_before_teardown': 'float(min=0.0, default=0.0)',
-                'think_time_between_iterations': 'float(min=0.0, default=0.0)'
+                'think_time_between_iterations':
+                    'float(min=0.0, default=0.0)',
+                'iteration_pacing': 'float(min=0.0, default=0.0)',
+                'iteration_pacing_max': 'float(min=0.0, default=0.0)'
             },
             'network': {
                 'controller_port': 'integer(min=1, max=65535 default=7878)',
@@ -62,20 +82,30 @@ class CoreSettings(ConfigObj):
             'logging': {
                 'max_entries_before_flush': 'integer(min=0, default=30)',
                 'max_interval_before_flush': 'float(min=0.0, default=30.0)',
+                'max_pending_entries': 'integer(min=0, default=100000)',
                 'results_file': "string(default='results.sqlite')",
                 'sysmonitor_polling_interval': 'float(min=0.0, default=5.0)',
                 'use_compressed_logs': 'boolean(default=True)',
+                'use_compact_logs': 'boolean(default=True)',
                 'inline_log_format':
                     "string(default='%(asctime)s - %(name)s - "
                     "%(levelname)s - %(message)s')"
             },
             'spawning': {
                 'spawning_mode': "option('threads', 'processes', "
-                                 "'greenlets', default='threads')",
+                                 "'greenlets', 'prefork', "
+                                 "default='threads')",
                 'pecker_handling_mode': "option('passive', 'active', "
                                         "default='passive')",
                 'pecker_status_active_polling_interval':
                     'float(min=0.0, default=0.1)',
+                'pecker_spawn_interval': 'float(min=0.0, default=0.0)',
+                'worker_processes': 'integer(min=0, default=0)',
+                'max_arrival_lag': 'float(min=0.0, default=0.05)',
+                'profile_resolution': 'float(min=0.001, default=1.0)',
+                'preloaded_modules':
+                    "string_list(default=list('requests', 'grequests', "
+                    "'gevent', 'msgpack', 'coloredlogs'))",
                 'spawners': "string_list(min=1, default=['localhost'])"
             }
         }, interpolation=False)
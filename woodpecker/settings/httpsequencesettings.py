@@ -13,7 +13,11 @@ class HttpSequenceSettings(ConfigObj):
                     'http_proxy': None,
                     'https_proxy': None,
                     'default_timeout': 5.0,
-                    'max_async_concurrent_requests': 10
+                    'max_async_concurrent_requests': 10,
+                    'max_pooled_hosts': 10,
+                    'max_connections_per_host': 6,
+                    'transport': 'requests',
+                    'pipelining_depth': 1
                 }
             },
                 interpolation=False,
@@ -33,6 +37,11 @@ class HttpSequenceSettings(ConfigObj):
                 'http_proxy': 'string',
                 'https_proxy': 'string',
                 'default_timeout': 'float(min=0.0, default=5.0)',
-                'max_async_concurrent_requests': 'integer(min=0, default=10)'
+                'max_async_concurrent_requests': 'integer(min=0, default=10)',
+                'max_pooled_hosts': 'integer(min=1, default=10)',
+                'max_connections_per_host': 'integer(min=0, default=6)',
+                'transport': "option('requests', 'asyncio', 'raw', 'http2', "
+                             "default='requests')",
+                'pipelining_depth': 'integer(min=1, default=1)'
             }
         }, interpolation=False)
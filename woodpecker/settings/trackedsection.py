@@ -0,0 +1,39 @@
+from configobj import Section
+
+
+class TrackedSection(Section):
+    """
+    Settings section counting its changes, so that the values derived from
+    it can be cached until the counter moves
+    """
+    @classmethod
+    def track(cls, section):
+        """
+        Turns an existing section into a TrackedSection (in place, keeping
+        the references to it valid) and returns it
+        """
+        if not isinstance(section, cls):
+            section.__class__ = cls
+            section.changes = 0
+        return section
+
+    def __setitem__(self, key, value, unrepr=False):
+        super(TrackedSection, self).__setitem__(key, value, unrepr)
+        self.changes += 1
+
+    def __delitem__(self, key):
+        super(TrackedSection, self).__delitem__(key)
+        self.changes += 1
+
+    def clear(self):
+        super(TrackedSection, self).clear()
+        self.changes += 1
+
+    def rename(self, oldkey, newkey):
+        super(TrackedSection, self).rename(oldkey, newkey)
+        self.changes += 1
+
+    def restore_default(self, key):
+        default = super(TrackedSection, self).restore_default(key)
+        self.changes += 1
+        return default
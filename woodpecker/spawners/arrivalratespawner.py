@@ -0,0 +1,202 @@
+import random
+import sys
+
+import gevent
+import gevent.queue
+
+from woodpecker.misc.functions import monotonic
+from woodpecker.profiles.loadprofile import LoadProfile
+from woodpecker.spawners.greenletspawner import GreenletSpawner
+
+
+class ArrivalRateSpawner(GreenletSpawner):
+    """
+    Open-model spawner: starts the iterations at a target arrival rate,
+    regardless of how long the previous iterations take to complete.
+
+    The iterations are run by a pool of pre-warmed peckers. When no pecker
+    is idle at the scheduled start time, the arrival is counted as missed,
+    so that the report shows when the spawner could not keep up
+    with the schedule.
+
+    Arrival kinds:
+        - constant: evenly spaced arrivals at the given rate
+        - poisson: exponentially distributed inter-arrival times
+        - steps: the rate is a list of (duration, rate) tuples,
+                 each run with evenly spaced arrivals
+        - profile: the rate is a rate LoadProfile (or its compiled form),
+                   read tick by tick with evenly spaced arrivals
+    """
+    def __init__(self,
+                 sequences,
+                 rate,
+                 arrival_kind='constant',
+                 peckers=1,
+                 iterations=None,
+                 duration=None,
+                 settings=None,
+                 sequence_settings=None,
+                 log_queue=None,
+                 log_sinks=None,
+                 spawner_id=None,
+                 first_pecker=0,
+                 debug=False,
+                 inline_log_sinks=(sys.stdout,)):
+        super(ArrivalRateSpawner, self).__init__(
+            sequences,
+            peckers=peckers,
+            iterations=iterations,
+            duration=duration,
+            settings=settings,
+            sequence_settings=sequence_settings,
+            log_queue=log_queue,
+            log_sinks=log_sinks,
+            spawner_id=spawner_id,
+            first_pecker=first_pecker,
+            debug=debug,
+            inline_log_sinks=inline_log_sinks
+        )
+
+        if arrival_kind not in ('constant', 'poisson', 'steps', 'profile'):
+            raise ValueError(
+                'Arrival kind "{kind}" is not supported'.format(
+                    kind=arrival_kind
+                )
+            )
+
+        # Target arrival rate (arrivals per second)
+        if isinstance(rate, LoadProfile):
+            rate = rate.compile(
+                self.settings['spawning']['profile_resolution']
+            )
+        self.rate = rate
+        self.arrival_kind = arrival_kind
+
+        # Pre-warmed idle peckers
+        self._idle_peckers = gevent.queue.Queue()
+
+        # Schedule adherence report
+        self.report = {
+            'scheduled': 0,
+            'started': 0,
+            'missed': 0,
+            'late': 0,
+            'max_lag': 0.0
+        }
+
+    def arrival_offsets(self):
+        """
+        Generates the scheduled start times of the iterations,
+        in seconds from the beginning of the run
+        """
+        dbl_offset = 0.0
+        if self.arrival_kind in ('constant', 'poisson') and self.rate <= 0:
+            # A zero rate has no arrivals at all
+            return
+        elif self.arrival_kind == 'constant':
+            while True:
+                yield dbl_offset
+                dbl_offset += 1.0 / self.rate
+        elif self.arrival_kind == 'poisson':
+            while True:
+                dbl_offset += random.expovariate(self.rate)
+                yield dbl_offset
+        elif self.arrival_kind == 'profile':
+            dbl_rate = self.rate.at(dbl_offset)
+            while dbl_rate is not None:
+                if dbl_rate > 0:
+                    yield dbl_offset
+                    dbl_offset += 1.0 / dbl_rate
+                else:
+                    # Skip idle ticks altogether
+                    dbl_offset = (self.rate.tick(dbl_offset) + 1) * \
+                        self.rate.resolution
+                dbl_rate = self.rate.at(dbl_offset)
+        else:
+            dbl_step_start = 0.0
+            for dbl_step_duration, dbl_step_rate in self.rate:
+                dbl_step_end = dbl_step_start + dbl_step_duration
+                # Idle steps (zero rate) are skipped to their end
+                if dbl_step_rate > 0:
+                    dbl_offset = dbl_step_start
+                    while dbl_offset < dbl_step_end:
+                        yield dbl_offset
+                        dbl_offset += 1.0 / dbl_step_rate
+                dbl_step_start = dbl_step_end
+
+    def _run_arrival(self, pecker, iteration):
+        try:
+            self._run_iteration(pecker, iteration)
+        finally:
+            self._idle_peckers.put(pecker)
+
+    def run(self):
+        self._running = True
+        self._start_time = monotonic()
+        self._start_log_collector()
+        try:
+            self._run_schedule()
+        finally:
+            self._running = False
+            self._stop_log_collector()
+
+    def _run_schedule(self):
+        # Pre-warm the peckers, so that sessions and sequences
+        # are not built inside the measured schedule
+        for index in self.pecker_indexes():
+            self._idle_peckers.put(self._new_pecker(self.pecker_id(index)))
+        self._inline_logger.debug(
+            'Pre-warmed {peckers} peckers, starting {kind} arrivals'.format(
+                peckers=self.peckers,
+                kind=self.arrival_kind
+            )
+        )
+
+        dbl_max_lag = self.settings['spawning']['max_arrival_lag']
+        dbl_schedule_start = monotonic()
+        for iteration, dbl_offset in enumerate(self.arrival_offsets()):
+            if not self._running:
+                break
+            if self.iterations is not None and iteration >= self.iterations:
+                break
+            if self.duration is not None and dbl_offset >= self.duration:
+                break
+
+            # Offsets are absolute, so that delays never accumulate
+            dbl_delay = dbl_schedule_start + dbl_offset - monotonic()
+            if dbl_delay > 0:
+                gevent.sleep(dbl_delay)
+            self.report['scheduled'] += 1
+
+            try:
+                pecker = self._idle_peckers.get_nowait()
+            except gevent.queue.Empty:
+                self.report['missed'] += 1
+                continue
+
+            dbl_lag = monotonic() - dbl_schedule_start - dbl_offset
+            if dbl_lag > dbl_max_lag:
+                self.report['late'] += 1
+            self.report['max_lag'] = max(self.report['max_lag'], dbl_lag)
+            self.report['started'] += 1
+            self._group.spawn(self._run_arrival, pecker, iteration)
+
+        self._group.join()
+        self._running = False
+
+        self.log('event', {
+            'event_type': 'arrival_rate_report',
+            'event_content': dict(self.report)
+        })
+        if self.report['missed'] > 0 or self.report['late'] > 0:
+            self._inline_logger.warning(
+                'Arrival schedule not kept: {missed} of {scheduled} '
+                'arrivals missed for lack of idle peckers, {late} started '
+                'late (max lag {max_lag:.3f} s)'.format(**self.report)
+            )
+        else:
+            self._inline_logger.debug(
+                'Arrival schedule kept: {started} iterations started'.format(
+                    **self.report
+                )
+            )
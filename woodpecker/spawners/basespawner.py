@@ -0,0 +1,238 @@
+import abc
+import logging
+import sys
+import uuid
+
+import gevent.queue
+import msgpack
+import six
+
+from woodpecker.io.aggregator import StreamingAggregator
+from woodpecker.io.logcollector import LogCollector
+from woodpecker.io.logrecords import schemas
+from woodpecker.io.sinks.sqlitesink import SqliteSink
+from woodpecker.io.variablejar import VariableJar
+from woodpecker.misc.clock import Clock
+from woodpecker.misc.functions import monotonic
+from woodpecker.settings.coresettings import CoreSettings
+
+
+class BaseSpawner(object):
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self,
+                 sequences,
+                 peckers=1,
+                 iterations=None,
+                 duration=None,
+                 settings=None,
+                 sequence_settings=None,
+                 log_queue=None,
+                 log_sinks=None,
+                 spawner_id=None,
+                 first_pecker=0,
+                 debug=False,
+                 inline_log_sinks=(sys.stdout,)):
+        # Sequence classes run (in order) by each pecker at every iteration,
+        # or (sequence_file, sequence_class) tuples (see PreforkSpawner).
+        # A single sequence can be given on its own
+        if not isinstance(sequences, (list, tuple)) or \
+                self._is_sequence_spec(sequences):
+            sequences = (sequences,)
+        self._sequences = tuple(sequences)
+
+        # Load parameters
+        self.peckers = peckers
+        self.iterations = iterations
+        self.duration = duration
+
+        # Spawner settings
+        self.settings = settings or CoreSettings()
+
+        # Settings passed to every sequence instance
+        self._sequence_settings = sequence_settings
+
+        # Log queue shared by all the peckers of the spawner.
+        # A queue passed by the caller is drained by the caller, otherwise
+        # the spawner owns the queue and a collector writing it to the log
+        # sinks (the results file by default) and to the live statistics
+        # of the aggregator while running. The owned queue is bounded,
+        # so that peckers wait for the sinks falling behind,
+        # and cooperative, so that a full queue lets the collector run
+        if log_queue is None:
+            self.log_queue = gevent.queue.JoinableQueue(
+                maxsize=self.settings['logging']['max_pending_entries'] or None
+            )
+            if log_sinks is None:
+                log_sinks = (SqliteSink(self.settings),)
+            self.aggregator = StreamingAggregator()
+            self.log_collector = LogCollector(self.log_queue,
+                                              log_sinks,
+                                              self.settings,
+                                              aggregator=self.aggregator)
+        else:
+            self.log_queue = log_queue
+            self.log_collector = None
+            self.aggregator = None
+
+        # Unique spawner ID, used as prefix for pecker IDs
+        self.spawner_id = spawner_id or str(uuid.uuid4())
+
+        # Index of the first pecker (used when peckers are sharded)
+        self.first_pecker = first_pecker
+
+        # Clock of the spawner records (see Clock for the timestamps)
+        self.clock = Clock()
+
+        # Running status
+        self._running = False
+        self._start_time = None
+        self._debug = debug
+
+        # Inline logger
+        self._inline_logger = logging.getLogger(self.__class__.__name__)
+        if debug:
+            self._inline_logger.setLevel(logging.DEBUG)
+        else:
+            self._inline_logger.setLevel(logging.WARNING)
+
+        for obj_log_sink in inline_log_sinks:
+            obj_inline_handler = logging.StreamHandler(obj_log_sink)
+            obj_inline_handler.setFormatter(
+                logging.Formatter(
+                    self.settings['logging']['inline_log_format']
+                )
+            )
+            self._inline_logger.addHandler(obj_inline_handler)
+
+    @staticmethod
+    def _is_sequence_spec(sequences):
+        return isinstance(sequences, tuple) and len(sequences) == 2 and \
+            all(isinstance(item, six.string_types) for item in sequences)
+
+    @abc.abstractmethod
+    def run(self):
+        """Starts all the peckers and waits for their completion"""
+        pass
+
+    def stop(self):
+        """
+        Asks all the peckers to stop after the current iteration
+        """
+        self._running = False
+        self._inline_logger.debug('Spawner stop requested')
+
+    def is_running(self):
+        return self._running
+
+    def _start_log_collector(self):
+        if self.log_collector is not None:
+            self.log_collector.start()
+
+    def _stop_log_collector(self):
+        # Flushes the records still queued and closes the sinks
+        if self.log_collector is not None:
+            self.log_collector.stop()
+
+    def log(self, message_type, log_message):
+        if self.settings['logging']['use_compact_logs']:
+            mix_message = schemas.compact(message_type,
+                                          self.clock.timestamp_ns(),
+                                          None,
+                                          None,
+                                          None,
+                                          log_message)
+        else:
+            mix_message = {
+                'message_type': message_type,
+                'timestamp': self.clock.timestamp_ns(),
+                'pecker_id': None,
+                'sequence': None,
+                'iteration': None,
+                'message_content': log_message
+            }
+        if self.settings['logging']['use_compressed_logs']:
+            mix_message = msgpack.packb(mix_message)
+        self.log_queue.put(mix_message)
+
+    def pecker_id(self, index):
+        return '{spawner_id}-{index}'.format(
+            spawner_id=self.spawner_id,
+            index=index
+        )
+
+    def pecker_indexes(self):
+        return range(self.first_pecker, self.first_pecker + self.peckers)
+
+    def _should_continue(self, iteration):
+        if not self._running:
+            return False
+        if self.iterations is not None and iteration >= self.iterations:
+            return False
+        if self.duration is not None and \
+                monotonic() - self._start_time >= self.duration:
+            return False
+        return True
+
+    def _new_pecker(self, pecker_id):
+        # Each pecker owns its own variable jar,
+        # so that sessions and parameters are never shared
+        variables = VariableJar()
+        variables.set_pecker_id(pecker_id)
+        return [
+            sequence_class(settings=self._sequence_settings,
+                           log_queue=self.log_queue,
+                           variables=variables,
+                           debug=self._debug,
+                           inline_log_sinks=tuple())
+            for sequence_class in self._sequences
+        ]
+
+    def _run_iteration(self, pecker, iteration):
+        for index, sequence in enumerate(pecker):
+            if index > 0:
+                sequence.settings_think_time('think_time_between_sequences')
+            sequence.variables.set_current_iteration(iteration)
+            sequence.variables.set_current_sequence(
+                sequence.__class__.__name__
+            )
+            try:
+                sequence.run_steps()
+            except Exception as error:
+                # A failed sequence ends the iteration,
+                # but the pecker goes on with the next one
+                str_error_message = \
+                    'Pecker {pecker_id} - iteration {iteration} ' \
+                    'failed: {error}'.format(
+                        pecker_id=sequence.variables.get_pecker_id(),
+                        iteration=iteration,
+                        error=str(error)
+                    )
+                self._inline_logger.error(str_error_message)
+                sequence.log('event', {
+                    'event_type': 'error',
+                    'event_content': {
+                        'message': str_error_message
+                    }
+                })
+                return False
+        return True
+
+    def _run_pecker(self, pecker_id):
+        pecker = self._new_pecker(pecker_id)
+        self._inline_logger.debug(
+            'Pecker {pecker_id} started'.format(pecker_id=pecker_id)
+        )
+        iteration = 0
+        while self._should_continue(iteration):
+            if iteration > 0:
+                pecker[0].settings_think_time('think_time_between_iterations')
+            self._run_iteration(pecker, iteration)
+            iteration += 1
+        self._inline_logger.debug(
+            'Pecker {pecker_id} ended after {iterations} iterations'.format(
+                pecker_id=pecker_id,
+                iterations=iteration
+            )
+        )
+        return iteration
@@ -0,0 +1,85 @@
+import sys
+
+import gevent
+import gevent.pool
+
+from woodpecker.misc.functions import monotonic
+from woodpecker.spawners.basespawner import BaseSpawner
+
+
+class GreenletSpawner(BaseSpawner):
+    """
+    Runs all the peckers as greenlets inside the current process.
+    Each pecker owns its own variable jar (and hence its own HTTP session)
+    and cooperatively yields on network I/O and think times.
+    Libraries not aware of gevent only yield once the standard library
+    is patched (see patch_gevent)
+    """
+    def __init__(self,
+                 sequences,
+                 peckers=1,
+                 iterations=None,
+                 duration=None,
+                 settings=None,
+                 sequence_settings=None,
+                 log_queue=None,
+                 log_sinks=None,
+                 spawner_id=None,
+                 first_pecker=0,
+                 debug=False,
+                 inline_log_sinks=(sys.stdout,)):
+        super(GreenletSpawner, self).__init__(
+            sequences,
+            peckers=peckers,
+            iterations=iterations,
+            duration=duration,
+            settings=settings,
+            sequence_settings=sequence_settings,
+            log_queue=log_queue,
+            log_sinks=log_sinks,
+            spawner_id=spawner_id,
+            first_pecker=first_pecker,
+            debug=debug,
+            inline_log_sinks=inline_log_sinks
+        )
+
+        # Group of active pecker greenlets
+        self._group = gevent.pool.Group()
+
+    def run(self):
+        self._running = True
+        self._start_time = monotonic()
+        self._start_log_collector()
+        self._inline_logger.debug(
+            'Spawning {peckers} peckers as greenlets'.format(
+                peckers=self.peckers
+            )
+        )
+
+        try:
+            dbl_spawn_interval = \
+                self.settings['spawning']['pecker_spawn_interval']
+            for index in self.pecker_indexes():
+                if not self._running:
+                    break
+                self._group.spawn(self._run_pecker, self.pecker_id(index))
+                # Always yield, so that already spawned peckers can start
+                gevent.sleep(dbl_spawn_interval)
+
+            self._group.join()
+        finally:
+            self._running = False
+            self._stop_log_collector()
+        self._inline_logger.debug('All peckers ended')
+
+    def stop(self, timeout=None):
+        """
+        Asks all the peckers to stop after the current iteration.
+        If a timeout is given, the peckers still running after it are killed
+
+        :param timeout: seconds to wait before killing the peckers
+        """
+        super(GreenletSpawner, self).stop()
+        if timeout is not None:
+            self._group.join(timeout=timeout)
+            self._group.kill()
@@ -0,0 +1,85 @@
+import gc
+import importlib
+import sys
+
+from woodpecker.misc.functions import import_sequence_class
+from woodpecker.spawners.processspawner import ProcessSpawner
+
+
+class PreforkSpawner(ProcessSpawner):
+    """
+    Imports the sequences and the heavy libraries once in the parent process,
+    freezes the garbage collector and then forks the workers, so that all
+    the preloaded objects are shared among the workers copy-on-write.
+
+    The sequences can be given either as classes or as
+    (sequence_file, sequence_class) tuples, resolved before forking
+    """
+    def __init__(self,
+                 sequences,
+                 peckers=1,
+                 iterations=None,
+                 duration=None,
+                 settings=None,
+                 sequence_settings=None,
+                 log_queue=None,
+                 log_sinks=None,
+                 spawner_id=None,
+                 first_pecker=0,
+                 debug=False,
+                 inline_log_sinks=(sys.stdout,)):
+        super(PreforkSpawner, self).__init__(
+            sequences,
+            peckers=peckers,
+            iterations=iterations,
+            duration=duration,
+            settings=settings,
+            sequence_settings=sequence_settings,
+            log_queue=log_queue,
+            log_sinks=log_sinks,
+            spawner_id=spawner_id,
+            first_pecker=first_pecker,
+            debug=debug,
+            inline_log_sinks=inline_log_sinks
+        )
+
+        # Preloaded modules, kept to be shared among workers
+        self.preloaded_modules = {}
+
+    def preload(self):
+        """
+        Imports the configured heavy modules and resolves the sequences
+        """
+        for module_name in self.settings['spawning']['preloaded_modules']:
+            if module_name not in self.preloaded_modules:
+                self.preloaded_modules[module_name] = \
+                    importlib.import_module(module_name)
+        self._sequences = tuple(
+            import_sequence_class(*sequence)
+            if isinstance(sequence, tuple) else sequence
+            for sequence in self._sequences
+        )
+        self._inline_logger.debug(
+            'Preloaded {modules} modules and {sequences} sequences'.format(
+                modules=len(self.preloaded_modules),
+                sequences=len(self._sequences)
+            )
+        )
+
+    def run(self):
+        # No collection runs from preloading to forking, since it would
+        # leave holes that allocations in the workers fill, dirtying
+        # (and copying) the shared pages. The workers enable it again
+        gc.disable()
+        try:
+            self.preload()
+
+            # Move all the surviving objects to the permanent generation,
+            # so that collections in the workers never touch them
+            if hasattr(gc, 'freeze'):
+                gc.freeze()
+            super(PreforkSpawner, self).run()
+        finally:
+            if hasattr(gc, 'unfreeze'):
+                gc.unfreeze()
+            gc.enable()
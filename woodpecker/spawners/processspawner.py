@@ -0,0 +1,220 @@
+import gc
+import multiprocessing
+import sys
+
+import gevent
+import psutil
+import six
+
+from woodpecker.io.logcollector import drain_queue
+from woodpecker.misc.functions import monotonic
+from woodpecker.spawners.basespawner import BaseSpawner
+from woodpecker.spawners.greenletspawner import GreenletSpawner
+
+
+class ProcessSpawner(BaseSpawner):
+    """
+    Forks one worker process per CPU core and shards the peckers among them.
+    Inside each worker the peckers run cooperatively as greenlets, while
+    their log records are shipped back in batches to a single collector
+    running in the parent process.
+
+    Workers are always forked, since they inherit the sequence classes
+    and the inline log sinks (which cannot be pickled): process spawners
+    are only available on POSIX systems
+    """
+    def __init__(self,
+                 sequences,
+                 peckers=1,
+                 iterations=None,
+                 duration=None,
+                 settings=None,
+                 sequence_settings=None,
+                 log_queue=None,
+                 log_sinks=None,
+                 spawner_id=None,
+                 first_pecker=0,
+                 debug=False,
+                 inline_log_sinks=(sys.stdout,)):
+        super(ProcessSpawner, self).__init__(
+            sequences,
+            peckers=peckers,
+            iterations=iterations,
+            duration=duration,
+            settings=settings,
+            sequence_settings=sequence_settings,
+            log_queue=log_queue,
+            log_sinks=log_sinks,
+            spawner_id=spawner_id,
+            first_pecker=first_pecker,
+            debug=debug,
+            inline_log_sinks=inline_log_sinks
+        )
+
+        # Keep inline sinks to pass them to the workers
+        self._inline_log_sinks = inline_log_sinks
+
+        # Inter-process communication objects
+        self._context = self._multiprocessing_context()
+        self._results_queue = self._context.Queue()
+        self._stop_event = self._context.Event()
+
+        # Worker processes
+        self._workers = []
+
+    def _multiprocessing_context(self):
+        try:
+            return multiprocessing.get_context('fork')
+        except AttributeError:
+            # Python 2 always forks (on POSIX systems)
+            return multiprocessing
+        except ValueError:
+            raise ValueError('Process spawners need the fork start method, '
+                             'only available on POSIX systems')
+
+    def worker_count(self):
+        int_workers = self.settings['spawning']['worker_processes'] or \
+            psutil.cpu_count() or 1
+        return max(1, min(int_workers, self.peckers))
+
+    def shards(self):
+        """
+        Splits the peckers among the workers in contiguous shards
+
+        :return: a list of (first_pecker, peckers) tuples, one per worker
+        """
+        int_workers = self.worker_count()
+        int_base, int_remainder = divmod(self.peckers, int_workers)
+        shards = []
+        int_first = self.first_pecker
+        for worker_index in range(int_workers):
+            int_size = int_base + (1 if worker_index < int_remainder else 0)
+            shards.append((int_first, int_size))
+            int_first += int_size
+        return shards
+
+    def _worker_target(self, first_pecker, peckers):
+        return _run_worker, (
+            self._sequences,
+            first_pecker,
+            peckers,
+            self.iterations,
+            self.duration,
+            self.settings,
+            self._sequence_settings,
+            self.spawner_id,
+            self._debug,
+            self._inline_log_sinks,
+            self._results_queue,
+            self._stop_event
+        )
+
+    def run(self):
+        self._running = True
+        self._start_time = monotonic()
+        self._stop_event.clear()
+
+        for first_pecker, peckers in self.shards():
+            target, args = self._worker_target(first_pecker, peckers)
+            worker = self._context.Process(target=target, args=args)
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+        self._inline_logger.debug(
+            'Started {workers} worker processes for {peckers} peckers'.format(
+                workers=len(self._workers),
+                peckers=self.peckers
+            )
+        )
+
+        # Started once the workers are forked, so that they never inherit
+        # the collector (and its open sinks)
+        self._start_log_collector()
+        try:
+            # Collect the log batches until all the workers have finished
+            self._collect()
+
+            for worker in self._workers:
+                worker.join()
+        finally:
+            self._workers = []
+            self._running = False
+            self._stop_log_collector()
+        self._inline_logger.debug('All worker processes ended')
+
+    def stop(self):
+        super(ProcessSpawner, self).stop()
+        self._stop_event.set()
+
+    def _collect(self):
+        int_pending = len(self._workers)
+        dbl_polling_interval = \
+            self.settings['spawning']['pecker_status_active_polling_interval']
+        while int_pending > 0:
+            # Checked before polling, so that the batches of workers
+            # just ended are not lost
+            bool_alive = any(worker.is_alive() for worker in self._workers)
+            try:
+                batch = self._results_queue.get_nowait()
+            except six.moves.queue.Empty:
+                # Stop waiting for workers died without saying goodbye
+                if not bool_alive:
+                    break
+                # Polled cooperatively, so that the log collector can run
+                gevent.sleep(dbl_polling_interval)
+                continue
+            # A None batch is sent by each worker when it ends
+            if batch is None:
+                int_pending -= 1
+                continue
+            for log_record in batch:
+                self.log_queue.put(log_record)
+
+
+def _run_worker(sequences,
+                first_pecker,
+                peckers,
+                iterations,
+                duration,
+                settings,
+                sequence_settings,
+                spawner_id,
+                debug,
+                inline_log_sinks,
+                results_queue,
+                stop_event):
+    # Disabled by the prefork parent before forking
+    gc.enable()
+    log_queue = six.moves.queue.Queue()
+    spawner = GreenletSpawner(sequences,
+                              peckers=peckers,
+                              iterations=iterations,
+                              duration=duration,
+                              settings=settings,
+                              sequence_settings=sequence_settings,
+                              log_queue=log_queue,
+                              spawner_id=spawner_id,
+                              first_pecker=first_pecker,
+                              debug=debug,
+                              inline_log_sinks=inline_log_sinks)
+    dbl_polling_interval = \
+        settings['spawning']['pecker_status_active_polling_interval']
+
+    def _forward_logs():
+        while True:
+            if stop_event.is_set():
+                spawner.stop()
+            batch = drain_queue(log_queue)
+            if len(batch) > 0:
+                results_queue.put(batch)
+            gevent.sleep(dbl_polling_interval)
+
+    forwarder = gevent.spawn(_forward_logs)
+    try:
+        spawner.run()
+    finally:
+        forwarder.kill()
+        batch = drain_queue(log_queue)
+        if len(batch) > 0:
+            results_queue.put(batch)
+        results_queue.put(None)
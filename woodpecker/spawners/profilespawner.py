@@ -0,0 +1,112 @@
+import sys
+
+import gevent
+
+from woodpecker.misc.functions import monotonic
+from woodpecker.profiles.loadprofile import LoadProfile
+from woodpecker.spawners.greenletspawner import GreenletSpawner
+
+
+class ProfileSpawner(GreenletSpawner):
+    """
+    Greenlet spawner that follows a load profile of active peckers.
+    The profile is compiled once before the run, then at every tick the
+    target number of peckers is read from the compiled timeline: missing
+    peckers are started, exceeding ones end after their current iteration
+    """
+    def __init__(self,
+                 sequences,
+                 profile,
+                 iterations=None,
+                 settings=None,
+                 sequence_settings=None,
+                 log_queue=None,
+                 log_sinks=None,
+                 spawner_id=None,
+                 first_pecker=0,
+                 debug=False,
+                 inline_log_sinks=(sys.stdout,)):
+        super(ProfileSpawner, self).__init__(
+            sequences,
+            iterations=iterations,
+            settings=settings,
+            sequence_settings=sequence_settings,
+            log_queue=log_queue,
+            log_sinks=log_sinks,
+            spawner_id=spawner_id,
+            first_pecker=first_pecker,
+            debug=debug,
+            inline_log_sinks=inline_log_sinks
+        )
+
+        if isinstance(profile, LoadProfile):
+            profile = profile.compile(
+                self.settings['spawning']['profile_resolution']
+            )
+        if profile.kind != 'peckers':
+            raise ValueError('Only pecker profiles can drive a '
+                             'ProfileSpawner, use an ArrivalRateSpawner '
+                             'for rate profiles')
+        self.profile = profile
+        self.peckers = profile.max()
+        self.duration = profile.duration()
+
+        # Current target of active peckers
+        self._target = 0
+
+        # Running pecker greenlets, by pecker index
+        self._active = {}
+
+    def _run_profiled_pecker(self, index):
+        pecker = self._new_pecker(self.pecker_id(index))
+        iteration = 0
+        while self._should_continue(iteration) and \
+                index - self.first_pecker < self._target:
+            if iteration > 0:
+                pecker[0].settings_think_time('think_time_between_iterations')
+            self._run_iteration(pecker, iteration)
+            iteration += 1
+
+    def run(self):
+        self._running = True
+        self._start_time = monotonic()
+        self._start_log_collector()
+        try:
+            self._follow_profile()
+        finally:
+            self._running = False
+            self._stop_log_collector()
+
+    def _follow_profile(self):
+        self._inline_logger.debug(
+            'Following load profile: {profile}'.format(profile=self.profile)
+        )
+
+        int_tick = 0
+        while self._running:
+            # Ticks index the compiled values directly
+            if int_tick >= len(self.profile):
+                break
+            int_target = self.profile.values[int_tick]
+
+            # The pecker set only changes when the target does
+            if int_target != self._target:
+                self._target = int_target
+                for index in range(self.first_pecker,
+                                   self.first_pecker + int_target):
+                    greenlet = self._active.get(index)
+                    if greenlet is None or greenlet.dead:
+                        self._active[index] = self._group.spawn(
+                            self._run_profiled_pecker, index
+                        )
+
+            int_tick += 1
+            dbl_delay = self._start_time + \
+                int_tick * self.profile.resolution - monotonic()
+            if dbl_delay > 0:
+                gevent.sleep(dbl_delay)
+
+        self._running = False
+        self._group.join()
+        self._active = {}
+        self._inline_logger.debug('Load profile completed')